@@ -755,7 +755,10 @@ router.post('/analyze/:batchId', protect, async (req, res) => {
     }
     // 2. Kirim data ke API Flask untuk dianalisis (semua fitur model)
     console.log(`Mengirim ${transactions.length} transaksi ke model AI...`);
-    const aiResponse = await axios.post('http://127.0.0.1:5000/predict', {
+    // Mode write-back: service Python menulis hasil ke DB secara bulk dan hanya
+    // mengembalikan ringkasan (butuh SINK_DATABASE_URL di service Python)
+    const writeBack = process.env.AI_WRITE_BACK === 'true';
+    const payload = {
       transactions: transactions.map(t => ({
         id: t.id,
         amount: t.amount,
@@ -768,7 +771,25 @@ router.post('/analyze/:batchId', protect, async (req, res) => {
         channel: t.channel || 'Unknown',
         device_type: t.device_type || 'Unknown',
       })),
-    });
+    };
+    if (writeBack) {
+      // Update dibatasi ke transaksi milik batch ini
+      payload.batchId = batchId;
+    }
+    // Hanya field yang dipakai untuk update DB yang diminta dari model (projection)
+    const aiResponse = await axios.post(
+      writeBack
+        ? 'http://127.0.0.1:5000/predict?sink=1'
+        : 'http://127.0.0.1:5000/predict?fields=id,isAnomaly,anomalyScore',
+      payload
+    );
+    if (writeBack) {
+      return res.status(200).json({
+        message: 'Analisis berhasil diselesaikan.',
+        batchId: batchId,
+        summary: aiResponse.data,
+      });
+    }
     const analysisResults = aiResponse.data;
     // 3. Update setiap transaksi di DB dengan hasil analisis
     for (const result of analysisResults) {
@@ -1,14 +1,20 @@
 # =========================
 # Import Library & Setup Logging
 # =========================
+import time
+_process_started = time.monotonic()
+
 import os
+import json
+import random
+import argparse
+import resource
 import logging
-import joblib
+import threading
 
 try:
-    from flask import Flask, request, jsonify
+    from flask import Flask, Response, g, request, jsonify, send_file, stream_with_context
     from flask_cors import CORS
-    from tensorflow import keras
     import numpy as np
     import pandas as pd
 except ImportError as e:
@@ -16,6 +22,31 @@ except ImportError as e:
     print("pip install flask flask-cors pandas numpy scikit-learn joblib")
     exit(1)
 
+from attribution import DEFAULT_TOP_K, feature_groups
+from arrowio import (ARROW_STREAM_TYPE, UnsupportedBodyError, accepts_arrow, columnar_body_format,
+                     encode_arrow_stream, read_frame)
+from batching import MicroBatcher
+from metrics import BATCH_SIZE_BUCKETS, CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsRegistry, StageTimer
+from pipeline import (DYNAMIC_THRESHOLD_PERCENTILE, REQUIRED_FEATURES, log_error_analysis,
+                      log_input_analysis, log_threshold_analysis, prepare_features,
+                      resolve_batch_threshold, sample_amount_adjustment, select_threshold,
+                      transform_features, update_error_distribution)
+from profiling import create_profiler, parse_modes, profiling_active
+from jobs import JobQueueFull, create_job_manager
+from registry import ModelRegistry
+from scorecache import create_score_cache, row_keys
+from shadow import create_shadow_scorer
+from sink import create_score_sink
+from serving import (default_threads_per_worker, limit_native_threads, limit_tensorflow_threads,
+                     serve)
+from score import count_input_rows, iter_input_chunks
+from userfeatures import DEFAULT_SNAPSHOT_INTERVAL, create_feature_store, uses_user_features
+from streaming import (ResultSpool, StreamingThreshold, encode_ndjson, iter_transaction_chunks,
+                       parse_chunk_size, parse_threshold_mode)
+
+# Breakdown waktu startup (detik sejak modul mulai di-import), dilaporkan di /health
+STARTUP = {'imports_seconds': round(time.monotonic() - _process_started, 4)}
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s [%(levelname)s] %(message)s',
@@ -29,24 +60,190 @@ app = Flask(__name__)
 CORS(app)
 
 # =========================
-# Load Model & Preprocessor
+# Load Model & Preprocessor (Model Registry dengan hot-reload)
 # =========================
 script_dir = os.path.dirname(os.path.abspath(__file__))
-model_path = os.path.join(script_dir, 'autoencoder_model.keras')
-preprocessor_path = os.path.join(script_dir, 'preprocessor_pipeline.joblib')
-try:
-    autoencoder = keras.models.load_model(model_path, compile=False)
-    logging.info("AutoEncoder berhasil dimuat.")
-except Exception as e:
-    logging.error(f"Gagal memuat model: {e}")
-    autoencoder = None
+registry = ModelRegistry(
+    os.environ.get('MODEL_DIR', script_dir),
+    poll_interval=float(os.environ.get('MODEL_RELOAD_INTERVAL', 5)))
+# Model dimuat setelah micro-batcher dan route siap (lihat start_model_loader)
+
+# =========================
+# Micro-batching untuk request /predict kecil yang datang bersamaan
+# =========================
+batcher = None
+if os.environ.get('MICROBATCH_ENABLED', '1').lower() not in ('0', 'false', 'no'):
+    batcher = MicroBatcher(
+        max_batch_size=int(os.environ.get('MICROBATCH_MAX_BATCH_SIZE', 512)),
+        max_wait_ms=float(os.environ.get('MICROBATCH_MAX_WAIT_MS', 2))).start()
+
+
+def score_matrix(bundle, X):
+    """Hitung reconstruction error, lewat micro-batcher jika aktif."""
+    # Request yang diprofil dijalankan di thread-nya sendiri agar inference ikut terukur
+    if batcher is not None and not profiling_active():
+        return batcher.submit(bundle.backend, X)
+    return bundle.backend.reconstruction_errors(X)
 
-try:
-    preprocessor = joblib.load(preprocessor_path)
-    logging.info("Preprocessor berhasil dimuat.")
-except Exception as e:
-    logging.error(f"Gagal memuat preprocessor: {e}")
-    preprocessor = None
+
+# =========================
+# Score cache: error per transaksi yang sudah pernah diskor (per model version)
+# =========================
+score_cache = create_score_cache()
+# Profiling on-demand hanya aktif jika PROFILE_SECRET diset
+profiler = create_profiler()
+job_manager = create_job_manager()
+# State perilaku per user; hanya dipakai jika model dilatih dengan fitur ini
+feature_store = create_feature_store()
+if feature_store is not None:
+    feature_store.start_snapshots(float(os.environ.get(
+        'FEATURE_STORE_SNAPSHOT_INTERVAL', DEFAULT_SNAPSHOT_INTERVAL)))
+
+# =========================
+# Metrics & Diagnostics
+# =========================
+# Analitik debug yang berat (statistik per fitur, dump sampel, percentile)
+# hanya dijalankan jika DIAGNOSTICS_MODE aktif, dengan sampling per request.
+DIAGNOSTICS_MODE = os.environ.get(
+    'DIAGNOSTICS_MODE', '0').lower() in ('1', 'true', 'yes', 'on')
+DIAGNOSTICS_SAMPLE_RATE = float(os.environ.get('DIAGNOSTICS_SAMPLE_RATE', 1.0))
+
+metrics = MetricsRegistry()
+STAGE_SECONDS = metrics.histogram(
+    'fraud_predict_stage_seconds', 'Latency per stage pipeline prediksi.', ('endpoint', 'stage'))
+BATCH_SIZE = metrics.histogram(
+    'fraud_predict_batch_size', 'Jumlah transaksi per request/chunk.', ('endpoint',), BATCH_SIZE_BUCKETS)
+ROWS_TOTAL = metrics.counter(
+    'fraud_predict_rows_total', 'Total transaksi yang diskor.', ('endpoint',))
+ANOMALIES_TOTAL = metrics.counter(
+    'fraud_predict_anomalies_total', 'Total transaksi yang ditandai anomali.', ('endpoint',))
+ANOMALY_RATE = metrics.gauge(
+    'fraud_predict_anomaly_rate', 'Rasio anomali pada request/chunk terakhir.', ('endpoint',))
+ERRORS_TOTAL = metrics.counter(
+    'fraud_predict_errors_total', 'Total error per jenis.', ('endpoint', 'kind'))
+MODEL_INFO = metrics.gauge(
+    'fraud_model_info', 'Versi model aktif (nilai selalu 1).', ('version', 'backend'))
+MICROBATCH_GAUGE = metrics.gauge(
+    'fraud_microbatch', 'Statistik micro-batcher.', ('stat',))
+SCORE_CACHE_TOTAL = metrics.counter(
+    'fraud_score_cache_lookups_total', 'Lookup score cache per hasil (hit/miss).', ('endpoint', 'result'))
+SCORE_CACHE_GAUGE = metrics.gauge(
+    'fraud_score_cache', 'Statistik score cache.', ('stat',))
+ERROR_DISTRIBUTION_GAUGE = metrics.gauge(
+    'fraud_error_distribution', 'Distribusi error global (sketch KLL): count dan dynamic threshold.', ('stat',))
+PROCESS_GAUGE = metrics.gauge(
+    'fraud_process', 'Statistik proses worker (peak RSS).', ('stat',))
+FEATURE_STORE_GAUGE = metrics.gauge(
+    'fraud_feature_store', 'Statistik feature store perilaku user.', ('stat',))
+# Model challenger yang menskor traffic /predict di background (env SHADOW_MODELS)
+shadow_scorer = create_shadow_scorer(metrics)
+# Write-back skor langsung ke database untuk /predict?sink=1 (env SINK_DATABASE_URL)
+score_sink = create_score_sink()
+SINK_ROWS_TOTAL = metrics.counter(
+    'fraud_sink_rows_total', 'Baris hasil write-back sink per hasil (updated/missing).', ('result',))
+
+
+def collect_runtime_metrics():
+    # ru_maxrss dalam KiB di Linux
+    PROCESS_GAUGE.set(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+                      stat='peak_rss_bytes')
+    bundle = registry.current()
+    if bundle is not None:
+        MODEL_INFO.clear()
+        MODEL_INFO.set(1, version=bundle.version, backend=bundle.backend.name)
+        if bundle.error_distribution is not None:
+            distribution = bundle.error_distribution.describe()
+            ERROR_DISTRIBUTION_GAUGE.set(distribution['count'], stat='count')
+            if distribution['value'] is not None:
+                ERROR_DISTRIBUTION_GAUGE.set(distribution['value'], stat='dynamic_threshold')
+    if batcher is not None:
+        stats = batcher.stats()
+        for stat in ('queue_depth', 'max_queue_depth', 'batches_total', 'requests_total',
+                     'rows_total', 'bypassed_total', 'avg_requests_per_batch', 'avg_rows_per_batch'):
+            MICROBATCH_GAUGE.set(stats[stat], stat=stat)
+    if score_cache is not None:
+        stats = score_cache.stats()
+        for stat in ('entries', 'max_entries', 'evictions', 'disk_hits', 'hit_rate'):
+            SCORE_CACHE_GAUGE.set(stats[stat], stat=stat)
+    if feature_store is not None:
+        stats = feature_store.stats()
+        for stat in ('users', 'max_users', 'evicted', 'seen_ids'):
+            FEATURE_STORE_GAUGE.set(stats[stat], stat=stat)
+
+
+metrics.add_collector(collect_runtime_metrics)
+
+
+def diagnostics_sampled():
+    return DIAGNOSTICS_MODE and random.random() < DIAGNOSTICS_SAMPLE_RATE
+
+
+def record_batch(endpoint, n_rows, n_anomalies):
+    BATCH_SIZE.observe(n_rows, endpoint=endpoint)
+    ROWS_TOTAL.inc(n_rows, endpoint=endpoint)
+    ANOMALIES_TOTAL.inc(n_anomalies, endpoint=endpoint)
+    ANOMALY_RATE.set(n_anomalies / n_rows if n_rows else 0.0, endpoint=endpoint)
+
+
+def error_response(message, status, kind, endpoint='predict'):
+    ERRORS_TOTAL.inc(endpoint=endpoint, kind=kind)
+    return jsonify({'error': message}), status
+
+
+def acquire_bundle():
+    """Ambil bundle model aktif untuk request ini (dipakai sampai request selesai)."""
+    bundle = registry.current()
+    if bundle is not None:
+        g.model_bundle = bundle
+    return bundle
+
+
+@app.after_request
+def add_model_version_header(response):
+    bundle = g.get('model_bundle') or registry.current()
+    if bundle is not None:
+        response.headers['X-Model-Version'] = bundle.version
+    return response
+
+# =========================
+# Startup: load model di background agar health check langsung menjawab
+# =========================
+model_loader = None
+
+
+def readiness_state():
+    if registry.current() is None:
+        return 'loading' if model_loader is not None and model_loader.is_alive() else 'failed'
+    return 'ready' if app.config.get('WARMED_UP', False) else 'warming_up'
+
+
+def startup_report():
+    bundle = registry.current()
+    return dict(STARTUP, model_load_breakdown=bundle.load_timings if bundle is not None else {})
+
+
+def load_model_and_warmup():
+    start = time.monotonic()
+    registry.load()
+    STARTUP['model_load_seconds'] = round(time.monotonic() - start, 4)
+    if shadow_scorer is not None:
+        # Sebelum warm-up agar request warm-up ikut memanaskan model shadow
+        shadow_scorer.load()
+    if registry.current() is not None:
+        try:
+            warmup()
+        except Exception as e:
+            logging.error(f"Warm-up gagal: {e}")
+    registry.start_watching()
+
+
+def start_model_loader():
+    global model_loader
+    if model_loader is None:
+        model_loader = threading.Thread(
+            target=load_model_and_warmup, name='model-loader', daemon=True)
+        model_loader.start()
+    return model_loader
 
 # =========================
 # Endpoint Health Check
@@ -55,328 +252,801 @@ except Exception as e:
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    model_status = "loaded" if autoencoder is not None else "not_loaded"
+    bundle = registry.current()
+    model_status = "loaded" if bundle is not None else "not_loaded"
     return jsonify({
         'status': 'healthy',
+        'liveness': 'alive',
+        'readiness': readiness_state(),
         'model_status': model_status,
+        'ready': readiness_state() == 'ready',
+        'model_version': bundle.version if bundle is not None else None,
+        'model_source': bundle.source if bundle is not None else None,
+        'inference_backend': bundle.backend.name if bundle is not None else None,
+        'startup': startup_report(),
+        'microbatch': batcher.stats() if batcher is not None else {'enabled': False},
+        'score_cache': score_cache.stats() if score_cache is not None else {'enabled': False},
+        'feature_store': feature_store.stats() if feature_store is not None else {'enabled': False},
+        'shadow': shadow_scorer.stats() if shadow_scorer is not None else {'enabled': False},
+        'sink': score_sink.stats() if score_sink is not None else {'enabled': False},
         'message': 'Fraud Detection AI Service is running'
     })
 
+
+@app.route('/health/live', methods=['GET'])
+def liveness_check():
+    """Liveness: proses hidup dan bisa menjawab, terlepas dari status model."""
+    return jsonify({'status': 'alive',
+                    'uptime_seconds': round(time.monotonic() - _process_started, 3)})
+
+
+@app.route('/health/ready', methods=['GET'])
+def readiness_check():
+    """Readiness: 200 hanya jika model sudah dimuat dan warm-up selesai."""
+    state = readiness_state()
+    body = {'status': state}
+    if state == 'failed':
+        body['error'] = registry.last_error
+    return jsonify(body), 200 if state == 'ready' else 503
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+
+@app.route('/model/version', methods=['GET'])
+def model_version():
+    bundle = registry.current()
+    if bundle is None:
+        return jsonify({'error': 'Model belum dimuat.', 'last_error': registry.last_error}), 503
+    return jsonify(dict(bundle.describe(), last_reload_error=registry.last_error))
+
 # =========================
-# Endpoint Prediksi Anomali
+# Penyusunan Response Prediksi
 # =========================
+RESULT_FIELDS = ['id', 'timestamp', 'merchant', 'location', 'amount', 'hour', 'user_id',
+                 'transaction_type', 'channel', 'device_type', 'isAnomaly', 'anomalyScore']
+RESULT_LAYOUTS = ('records', 'columnar')
 
 
-@app.route('/predict', methods=['POST'])
-def predict():
-    if autoencoder is None or preprocessor is None:
-        logging.error("Model atau preprocessor tidak tersedia")
-        return jsonify({'error': 'Model atau preprocessor tidak tersedia. Jalankan train.py terlebih dahulu.'}), 500
+def parse_fields(raw):
+    """Parse projection `fields` (comma separated string atau list). None = semua field."""
+    if raw is None or raw == '':
+        return list(RESULT_FIELDS)
+    if isinstance(raw, str):
+        raw = raw.split(',')
+    if not isinstance(raw, list):
+        raise ValueError('Parameter "fields" harus berupa string atau list.')
+    fields = [str(f).strip() for f in raw if str(f).strip()]
+    unknown = [f for f in fields if f not in RESULT_FIELDS]
+    if unknown:
+        raise ValueError(
+            f'Field tidak dikenal: {unknown}. Pilihan: {RESULT_FIELDS}')
+    # Hapus duplikat tapi pertahankan urutan permintaan
+    return list(dict.fromkeys(fields)) or list(RESULT_FIELDS)
+
 
+def parse_sink(raw):
+    """Mode sink (write-back ke database) diminta lewat `sink=1` / `"sink": true`."""
+    if isinstance(raw, bool):
+        return raw
+    return str(raw or '').lower() in ('1', 'true', 'yes')
+
+
+MAX_EXPLAIN_TOP_K = 10
+
+
+def parse_explain(raw):
+    """Jumlah fitur penyebab per transaksi anomali (`explain=3`, `true` = default); 0 = tanpa."""
+    if raw is None or raw is False or raw == '':
+        return 0
+    if raw is True or str(raw).lower() in ('true', 'yes'):
+        return DEFAULT_TOP_K
     try:
-        json_data = request.get_json()
-        logging.info(f"Received data: {json_data}")
+        k = int(raw)
+    except (TypeError, ValueError):
+        raise ValueError('Parameter "explain" harus berupa angka atau true/false.')
+    if not 0 <= k <= MAX_EXPLAIN_TOP_K:
+        raise ValueError(f'Parameter "explain" harus antara 0 dan {MAX_EXPLAIN_TOP_K}.')
+    return k
 
-        if not json_data:
-            logging.error("No JSON data received")
-            return jsonify({'error': 'No JSON data received'}), 400
 
-        if 'transactions' not in json_data:
-            logging.error("Missing 'transactions' field in JSON data")
-            return jsonify({'error': 'Format data tidak valid. Harus memiliki field "transactions".'}), 400
+def explain_anomalies(bundle, features, is_anomaly, k):
+    """Kolom `topFeatures`: top-k fitur penyebab untuk baris anomali, None untuk baris normal.
 
-        transactions = json_data['transactions']
-        logging.info(
-            f"Number of transactions received: {len(transactions) if isinstance(transactions, list) else 'Not a list'}")
+    Hanya baris anomali yang di-forward ulang (langsung ke backend, tanpa
+    micro-batcher) untuk mendapatkan squared error per kolom.
+    """
+    result = [None] * len(is_anomaly)
+    rows = np.flatnonzero(is_anomaly)
+    if len(rows) == 0:
+        return result
+    if isinstance(features, tuple):
+        X = bundle.encoder.expand(features[0][rows], features[1][rows])
+    else:
+        X = features[rows]
+    explanations = feature_groups(bundle).explain(bundle.backend.squared_errors(X), k)
+    for row, explanation in zip(rows.tolist(), explanations):
+        result[row] = explanation
+    return result
 
-        if not isinstance(transactions, list):
-            logging.error("'transactions' field is not a list")
-            return jsonify({'error': 'Field "transactions" harus berupa list.'}), 400
 
-        if len(transactions) == 0:
-            logging.error("Empty transactions list")
-            return jsonify({'error': 'Field "transactions" tidak boleh kosong.'}), 400
+def parse_layout(raw):
+    layout = (raw or 'records').lower()
+    if layout not in RESULT_LAYOUTS:
+        raise ValueError(
+            f'Parameter "layout" harus salah satu dari {list(RESULT_LAYOUTS)}.')
+    return layout
 
-        df = pd.DataFrame(transactions)
-        logging.info(f"DataFrame columns: {list(df.columns)}")
 
-        # =========================
-        # Tambahkan field yang hilang dengan nilai default jika tidak ada di data input
-        # =========================
-        if 'user_id' not in df.columns:
-            df['user_id'] = 0
-            logging.info("Added default user_id field (0)")
-        if 'hour' not in df.columns:
-            if 'timestamp' in df.columns:
+STRING_FIELDS = ('id', 'merchant', 'location', 'user_id', 'transaction_type', 'channel', 'device_type')
+
+
+def _str_column(df, name, default='', native=False):
+    if name not in df.columns:
+        return np.full(len(df), str(default), dtype=object)
+    # Mode native: konversi ke string dilakukan vektor oleh encode_arrow_stream
+    return df[name] if native else df[name].map(str)
+
+
+def build_result_columns(df, is_anomaly, errors, original_timestamps, fields, native=False):
+    """Bangun kolom hasil prediksi sekaligus (tanpa df.iloc per baris).
+
+    Hanya field yang diminta yang dikonversi, sehingga projection seperti
+    `id,isAnomaly,anomalyScore` tidak membayar biaya kolom lain. Dengan
+    `native=True` kolom dikembalikan sebagai array untuk response Arrow
+    (kolom STRING_FIELDS belum di-cast), selain itu sebagai list Python.
+    """
+    n = len(df)
+    builders = {
+        'id': lambda: (_str_column(df, 'id', native=native) if 'id' in df.columns
+                       else np.arange(n).astype(str).astype(object)),
+        # Dibangun eksplisit: .where(notna, None) menghasilkan NaN (JSON invalid) di pandas 3
+        'timestamp': lambda: (np.full(n, None, dtype=object) if original_timestamps is None else
+                              np.array([None if pd.isna(v) else str(v) for v in original_timestamps],
+                                       dtype=object)),
+        'merchant': lambda: _str_column(df, 'merchant', native=native),
+        'location': lambda: _str_column(df, 'location', native=native),
+        'amount': lambda: df['amount'].to_numpy(dtype=np.float64),
+        'hour': lambda: (df['hour'].to_numpy().astype(np.int64) if 'hour' in df.columns
+                         else np.full(n, 12, dtype=np.int64)),
+        'user_id': lambda: _str_column(df, 'user_id', 0, native),
+        'transaction_type': lambda: _str_column(df, 'transaction_type', native=native),
+        'channel': lambda: _str_column(df, 'channel', native=native),
+        'device_type': lambda: _str_column(df, 'device_type', native=native),
+        'isAnomaly': lambda: np.asarray(is_anomaly, dtype=bool),
+        'anomalyScore': lambda: np.asarray(errors, dtype=np.float64),
+    }
+    columns = {field: builders[field]() for field in fields}
+    if native:
+        return columns
+    return {field: values.tolist() for field, values in columns.items()}
+
+
+def format_results(columns, count, layout='records', model_version=None):
+    """Ubah kolom hasil menjadi list of records (default) atau layout columnar."""
+    if layout == 'columnar':
+        return {'count': count, 'modelVersion': model_version, 'columns': columns}
+    keys = list(columns.keys())
+    return [dict(zip(keys, row)) for row in zip(*columns.values())]
+
+# =========================
+# Scoring dengan Score Cache (dipakai /predict dan /predict/stream)
+# =========================
+# Penanda request warm-up internal (scoring read-only terhadap feature store)
+WARMUP_ENVIRON = 'fraud_detector.warmup'
+
+
+def add_user_features(df, bundle, timer):
+    """Tambahkan fitur perilaku user jika model memakainya. Return update untuk commit.
+
+    State store belum berubah; observasi baru di-commit setelah batch berhasil diskor.
+    """
+    if not uses_user_features(bundle):
+        return None
+    if feature_store is None:
+        raise RuntimeError('Model membutuhkan fitur perilaku user, tetapi FEATURE_STORE_ENABLED=0.')
+    if serve_workers > 1:
+        # Model dengan fitur user bisa masuk lewat hot-reload setelah serve multi-worker start
+        raise RuntimeError(USER_FEATURES_SERVE_ERROR)
+    with timer.stage('user_features'):
+        return feature_store.compute_features(df)[1]
+
+
+def score_features(df, bundle, timer, endpoint='predict', score=score_matrix, capture=None,
+                   observe=True):
+    """Preprocess + inference dengan score cache. Return (errors, index baris yang baru diskor).
+
+    Jika `capture` berupa dict, hasil encoding disimpan di capture['features']
+    (matrix, atau (numeric, codes) di jalur cache) untuk dipakai ulang shadow.
+    Key cache dihitung dari bentuk ringkas hasil encoder, sehingga hanya
+    transaksi yang miss yang di-expand ke matrix one-hot dan diskor.
+    Fitur perilaku user ikut masuk key, jadi transaksi identik dengan
+    histori user berbeda tidak berbagi skor. Dengan `observe=False`
+    (warm-up) batch diskor read-only tanpa meng-update feature store.
+    Baris yang bukan cache hit dipakai untuk update distribusi error global
+    setelah threshold batch diketahui (observe_errors).
+    """
+    update = add_user_features(df, bundle, timer)
+    errors, fresh = _score_encoded(df, bundle, timer, endpoint, score, capture)
+    if update is not None and observe:
+        feature_store.commit(update)
+    return errors, fresh
+
+
+def observe_errors(bundle, errors, fresh, threshold):
+    """Update distribusi error global dengan baris baru yang tidak ditandai anomali."""
+    update_error_distribution(bundle, errors[fresh], threshold)
+
+
+def _score_encoded(df, bundle, timer, endpoint, score, capture):
+    if score_cache is None or bundle.encoder is None:
+        with timer.stage('preprocess'):
+            X = transform_features(df, bundle)
+            logging.debug(f"Data shape after preprocessing: {X.shape}")
+        if capture is not None:
+            capture['features'] = X
+        with timer.stage('inference'):
+            errors = score(bundle, X)
+        return errors, np.arange(len(errors))
+
+    with timer.stage('preprocess'):
+        numeric, codes = bundle.encoder.encode(df)
+        keys = row_keys(numeric, codes, bundle.version)
+    if capture is not None:
+        capture['features'] = (numeric, codes)
+    with timer.stage('cache'):
+        errors, hit = score_cache.lookup(keys)
+    miss = np.flatnonzero(~hit)
+    with timer.stage('inference'):
+        if len(miss):
+            X = bundle.encoder.expand(numeric[miss], codes[miss])
+            errors[miss] = score(bundle, X)
+            score_cache.store([keys[i] for i in miss], errors[miss], bundle.version)
+    n_hits = len(keys) - len(miss)
+    SCORE_CACHE_TOTAL.inc(n_hits, endpoint=endpoint, result='hit')
+    SCORE_CACHE_TOTAL.inc(len(miss), endpoint=endpoint, result='miss')
+    return errors, miss
+
+
+# =========================
+# Endpoint Prediksi Anomali
+# =========================
+
+
+@app.route('/predict', methods=['POST'])
+def predict():
+    bundle = acquire_bundle()
+    if bundle is None:
+        logging.error("Model atau preprocessor tidak tersedia")
+        return error_response('Model atau preprocessor tidak tersedia. Jalankan train.py terlebih dahulu.', 500, 'model_unavailable')
+
+    timer = StageTimer(STAGE_SECONDS, endpoint='predict')
+    diagnostics = diagnostics_sampled()
+    try:
+        with timer.stage('parse'):
+            body_format = columnar_body_format(request.mimetype)
+            if body_format is not None:
                 try:
-                    temp_timestamps = pd.to_datetime(
-                        df['timestamp'], errors='coerce')
-                    if temp_timestamps.isna().any():
-                        logging.warning(
-                            "Some timestamps could not be parsed, using default hour for invalid entries")
-                    df['hour'] = temp_timestamps.dt.hour.fillna(12).astype(int)
-                    logging.info(
-                        f"Extracted hour from timestamp. Sample hours: {df['hour'].head().tolist()}")
-                except Exception as e:
-                    df['hour'] = 12
-                    logging.warning(
-                        f"Could not extract hour from timestamp ({e}), using default value 12")
+                    df = read_frame(request.get_data(), body_format)
+                    fields = parse_fields(request.args.get('fields'))
+                    layout = parse_layout(request.args.get('layout'))
+                    sink = parse_sink(request.args.get('sink'))
+                    batch_id = request.args.get('batch_id')
+                    explain = parse_explain(request.args.get('explain'))
+                except UnsupportedBodyError as e:
+                    return error_response(str(e), 415, 'unsupported_media_type')
+                except ValueError as e:
+                    logging.error(f"Invalid {body_format} request: {e}")
+                    return error_response(str(e), 400, 'validation')
+                logging.info(f"Number of transactions received ({body_format}): {len(df)}")
+                if len(df) == 0:
+                    return error_response('Body tidak berisi transaksi.', 400, 'validation')
             else:
-                df['hour'] = 12
+                json_data = request.get_json()
+                if diagnostics:
+                    logging.info(f"Received data: {json_data}")
+
+                if not json_data:
+                    logging.error("No JSON data received")
+                    return error_response('No JSON data received', 400, 'validation')
+
+                if 'transactions' not in json_data:
+                    logging.error("Missing 'transactions' field in JSON data")
+                    return error_response('Format data tidak valid. Harus memiliki field "transactions".', 400, 'validation')
+
+                transactions = json_data['transactions']
                 logging.info(
-                    "No timestamp field found, added default hour field (12)")
-        else:
-            df['hour'] = pd.to_numeric(
-                df['hour'], errors='coerce').fillna(12).astype(int)
-            df['hour'] = df['hour'].clip(0, 23)
-            logging.info(
-                f"Using provided hour values. Sample hours: {df['hour'].head().tolist()}")
-
-        # Add default values for all required fields if missing
-        if 'transaction_type' not in df.columns:
-            df['transaction_type'] = 'purchase'
-            logging.info("Added default transaction_type field (purchase)")
-        if 'channel' not in df.columns:
-            df['channel'] = 'mobile'
-            logging.info("Added default channel field (mobile)")
-        if 'merchant' not in df.columns:
-            df['merchant'] = 'Unknown'
-            logging.info("Added default merchant field (Unknown)")
-        if 'device_type' not in df.columns:
-            df['device_type'] = 'Android'
-            logging.info("Added default device_type field (Android)")
-        # =========================
-        # Handle missing values untuk field yang wajib (required) dan optional
-        # =========================
-        if 'location' not in df.columns:
-            df['location'] = 'Unknown'
-            logging.info("Added default location field (Unknown)")
+                    f"Number of transactions received: {len(transactions) if isinstance(transactions, list) else 'Not a list'}")
 
-        # Handle missing values untuk field optional
-        df['user_id'] = df['user_id'].fillna('Unknown')
-        df['transaction_type'] = df['transaction_type'].fillna('Unknown')
-        df['channel'] = df['channel'].fillna('Unknown')
-        df['device_type'] = df['device_type'].fillna('Unknown')
-        df['location'] = df['location'].fillna('Unknown')
+                if not isinstance(transactions, list):
+                    logging.error("'transactions' field is not a list")
+                    return error_response('Field "transactions" harus berupa list.', 400, 'validation')
 
-        # =========================
-        # Bersihkan dan konversi user_id ke format numerik jika memungkinkan
-        # (OneHotEncoder bisa handle string, tapi lebih baik konsisten)
-        # =========================
-        def convert_user_id(user_id):
-            if pd.isna(user_id) or user_id == '' or user_id is None:
-                return 0
-            try:
-                return int(float(str(user_id)))
-            except (ValueError, TypeError):
-                return str(user_id)
-        df['user_id'] = df['user_id'].apply(convert_user_id)
-        logging.info(
-            f"Processed user_id. Sample values: {df['user_id'].head().tolist()}")
+                if len(transactions) == 0:
+                    logging.error("Empty transactions list")
+                    return error_response('Field "transactions" tidak boleh kosong.', 400, 'validation')
 
-        # =========================
-        # Daftar fitur yang digunakan harus sama persis dengan saat training
-        # =========================
-        required_features = ['amount', 'hour', 'user_id',
-                             'transaction_type', 'channel', 'merchant', 'device_type', 'location']
-        missing_cols = set(required_features) - set(df.columns)
-        if missing_cols:
-            logging.error(f"Missing required columns: {missing_cols}")
-            return jsonify({'error': f"Data harus memiliki kolom: {list(missing_cols)}"}), 400
+                try:
+                    fields = parse_fields(
+                        request.args.get('fields', json_data.get('fields')))
+                    layout = parse_layout(
+                        request.args.get('layout', json_data.get('layout')))
+                    sink = parse_sink(request.args.get('sink', json_data.get('sink')))
+                    batch_id = request.args.get('batch_id', json_data.get('batchId'))
+                    explain = parse_explain(request.args.get('explain', json_data.get('explain')))
+                except ValueError as e:
+                    logging.error(f"Invalid response options: {e}")
+                    return error_response(str(e), 400, 'validation')
 
-        # =========================
-        # Analisis distribusi data asli sebelum preprocessing
-        # Untuk debugging: cek range, mean, std, dan unique values
-        # =========================
-        logging.info("=== ORIGINAL DATA ANALYSIS ===")
-        for feature in required_features:
-            if feature in ['amount', 'hour']:  # Numeric features
-                values = df[feature].astype(float)
-                logging.info(
-                    f"{feature} - min: {values.min():.2f}, max: {values.max():.2f}, mean: {values.mean():.2f}, std: {values.std():.2f}")
-            else:  # Categorical features
-                unique_vals = df[feature].unique()
-                logging.info(
-                    f"{feature} - unique values: {len(unique_vals)}, samples: {list(unique_vals[:5])}")
+                df = pd.DataFrame(transactions)
+            logging.debug(f"DataFrame columns: {list(df.columns)}")
+            if sink:
+                if score_sink is None:
+                    return error_response('Sink tidak aktif (SINK_DATABASE_URL tidak diset).', 400,
+                                          'sink_disabled')
+                if 'id' not in df.columns:
+                    return error_response('Mode sink membutuhkan field "id" pada setiap transaksi.',
+                                          400, 'validation')
 
-        # =========================
-        # Deteksi otomatis skala amount dan mata uang
-        # Jika amount sangat besar, lakukan scaling
-        # Jika amount kemungkinan USD, konversi ke IDR
-        # =========================
-        amount_mean = df['amount'].mean()
-        if amount_mean > 2000000:  # If average amount > 2M, likely needs scaling
-            logging.warning(
-                f"Amount values seem very large (mean: {amount_mean:.0f}). This might cause high reconstruction errors.")
-            logging.warning(
-                "Applying automatic scaling: dividing amount by 1000 to match training data scale.")
-            # Apply automatic scaling
-            df['amount'] = df['amount'] / 1000  # Scale down by 1000x
-            logging.info(
-                f"Applied automatic scaling. New amount mean: {df['amount'].mean():.2f}")
-        elif amount_mean > 1000000:  # Warning but no scaling for 1M-2M range
-            logging.warning(
-                f"Amount values are large (mean: {amount_mean:.0f}). Monitor for high reconstruction errors.")
-            logging.info(
-                "No automatic scaling applied (amount < 2M threshold).")
-        # Deteksi mata uang berdasarkan range amount
-        if amount_mean < 100000:  # Kemungkinan USD jika rata-rata < 100K
-            logging.warning(
-                f"Amount values appear to be in USD (mean: {amount_mean:.0f}). Converting to IDR.")
-            # Konversi USD ke IDR (kurs sekitar 16.000)
-            usd_to_idr_rate = 16000
-            df['amount'] = df['amount'] * usd_to_idr_rate
-            logging.info(
-                f"Converted USD to IDR. New amount mean: {df['amount'].mean():.0f} IDR")
-        elif amount_mean > 2000000:  # Warning jika > 2M IDR
-            logging.warning(
-                f"Amount values sangat besar (mean: {amount_mean:.0f}). Ini bisa menyebabkan kesalahan rekonstruksi yang tinggi.")
-            logging.info(
-                "Pertimbangkan untuk menyesuaikan threshold deteksi anomali.")
+        with timer.stage('feature_fill'):
+            try:
+                df = prepare_features(df)
+            except ValueError as e:
+                logging.error(f"Missing required columns: {e}")
+                return error_response(str(e), 400, 'validation')
+        if diagnostics:
+            log_input_analysis(df)
 
-        # =========================
         # Simpan timestamp asli untuk output (jika ada)
-        # =========================
         original_timestamps = df.get('timestamp', None)
 
-        # =========================
-        # Transformasi fitur sesuai pipeline training (preprocessing)
-        # =========================
-        try:
-            X_features = df[required_features]
+        if diagnostics:
+            X_features = df[REQUIRED_FEATURES]
             logging.info(
                 f"Data types before preprocessing: {X_features.dtypes.to_dict()}")
             logging.info(
                 f"Sample data before preprocessing:\n{X_features.head()}")
-            X = preprocessor.transform(X_features)
-            X = np.asarray(X).astype(np.float32)
-            logging.info(f"Data shape after preprocessing: {X.shape}")
+        capture = {} if shadow_scorer is not None or explain else None
+        observe = not request.environ.get(WARMUP_ENVIRON)
+        try:
+            errors, fresh = score_features(df, bundle, timer, capture=capture, observe=observe)
+            cache_hits = len(errors) - len(fresh)
         except Exception as e:
             logging.error(f"Preprocessing error: {str(e)}")
-            return jsonify({'error': f"Gagal memproses data dengan preprocessor: {str(e)}"}), 500
-
-        reconstructed = autoencoder.predict(X)
-        errors = np.mean(np.square(X - reconstructed), axis=1)
+            return error_response(f"Gagal memproses data dengan preprocessor: {str(e)}", 500, 'preprocessing')
+        if diagnostics:
+            log_error_analysis(transform_features(df, bundle), errors)
 
         # =========================
-        # Logging detail hasil preprocessing dan error rekonstruksi
-        # Untuk debugging dan analisis performa model
+        # Jika threshold terlalu ketat, otomatis switch ke dynamic threshold (percentile)
         # =========================
-        logging.info("=== DEBUGGING ANALYSIS ===")
-        logging.info(f"Input data shape: {X.shape}")
-        logging.info(f"First 5 samples of preprocessed data:\n{X[:5]}")
-        logging.info(f"Data range - min: {X.min():.6f}, max: {X.max():.6f}")
-
-        # Analysis of reconstruction errors
-        logging.info(f"Reconstruction errors statistics:")
-        logging.info(f"  Min: {errors.min():.6f}")
-        logging.info(f"  Max: {errors.max():.6f}")
-        logging.info(f"  Mean: {errors.mean():.6f}")
-        logging.info(f"  Median: {np.median(errors):.6f}")
-        logging.info(f"  Std: {errors.std():.6f}")
-        logging.info(f"  25th percentile: {np.percentile(errors, 25):.6f}")
-        logging.info(f"  75th percentile: {np.percentile(errors, 75):.6f}")
-        logging.info(f"  95th percentile: {np.percentile(errors, 95):.6f}")
-        logging.info(f"  99th percentile: {np.percentile(errors, 99):.6f}")
-
-        # Sample of individual errors
-        logging.info(f"First 10 reconstruction errors: {errors[:10]}")
+        with timer.stage('threshold'):
+            threshold = resolve_batch_threshold(errors, bundle)
+            is_anomaly = errors > threshold
+            if observe:
+                observe_errors(bundle, errors, fresh, threshold)
+        if diagnostics:
+            log_threshold_analysis(errors, threshold, is_anomaly)
+        record_batch('predict', len(errors), int(is_anomaly.sum()))
+        if capture and shadow_scorer is not None:
+            # Hanya dijadwalkan; hasil shadow tidak pernah masuk response
+            shadow_scorer.submit(bundle, df, capture['features'], errors, is_anomaly)
+
+        if sink:
+            # Hasil ditulis langsung ke database; response hanya ringkasan
+            with timer.stage('sink'):
+                try:
+                    summary = score_sink.write(df['id'].to_numpy(), is_anomaly, errors, batch_id)
+                except Exception as e:
+                    logging.error(f"Write-back sink gagal: {e}")
+                    return error_response(f'Gagal menulis hasil ke database: {e}', 502, 'sink')
+            SINK_ROWS_TOTAL.inc(summary['updated'], result='updated')
+            SINK_ROWS_TOTAL.inc(summary['missing'], result='missing')
+            logging.info(f"Sink: {summary['updated']}/{summary['unique_ids']} transaksi di-update "
+                         f"dalam {summary['seconds']:.3f} detik")
+            response = jsonify(dict(summary, modelVersion=bundle.version))
+            response.headers['Server-Timing'] = timer.server_timing()
+            return response
 
         # =========================
-        # Ambil threshold dari threshold.json (hasil training/validasi)
-        # Jika threshold terlalu ketat, otomatis switch ke dynamic threshold (percentile)
+        # Susun hasil prediksi secara vektor lalu return dalam format JSON
+        # (records atau columnar)
         # =========================
-        import json
-        threshold_path = os.path.join(script_dir, 'threshold.json')
+        top_features = None
+        if explain:
+            with timer.stage('explain'):
+                top_features = explain_anomalies(bundle, capture['features'], is_anomaly, explain)
+
+        with timer.stage('serialize'):
+            if accepts_arrow(request.accept_mimetypes):
+                columns = build_result_columns(
+                    df, is_anomaly, errors, original_timestamps, fields, native=True)
+                if top_features is not None:
+                    columns['topFeatures'] = top_features
+                response = Response(encode_arrow_stream(columns, {'modelVersion': bundle.version},
+                                                         STRING_FIELDS),
+                                    mimetype=ARROW_STREAM_TYPE)
+            else:
+                columns = build_result_columns(
+                    df, is_anomaly, errors, original_timestamps, fields)
+                if top_features is not None:
+                    columns['topFeatures'] = top_features
+                response = jsonify(format_results(
+                    columns, len(df), layout, bundle.version))
+        if score_cache is not None:
+            response.headers['X-Score-Cache-Hits'] = str(cache_hits)
+            response.headers['X-Score-Cache-Misses'] = str(len(df) - cache_hits)
+        response.headers['Server-Timing'] = timer.server_timing()
+        return response
+
+    except Exception as e:
+        logging.error(f"Error dalam prediksi: {str(e)}")
+        return error_response(f'Terjadi kesalahan saat memproses data: {str(e)}', 500, 'internal')
+
+# =========================
+# Endpoint Prediksi Streaming (NDJSON)
+# =========================
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', 10000))
+
+
+def score_chunk(transactions, bundle, adjustment, timer=None, endpoint='stream'):
+    """Preprocess dan skor satu chunk transaksi (list dict atau DataFrame).
+
+    `adjustment` adalah keputusan skala amount untuk seluruh input
+    (sample_amount_adjustment), sama untuk semua chunk. Return (df, errors, index
+    baris yang baru diskor).
+    """
+    timer = timer or StageTimer(STAGE_SECONDS, endpoint=endpoint)
+    with timer.stage('parse'):
+        df = transactions if isinstance(transactions, pd.DataFrame) else pd.DataFrame(transactions)
+    with timer.stage('feature_fill'):
+        df = prepare_features(df, adjustment)
+    errors, fresh = score_features(
+        df, bundle, timer, endpoint=endpoint,
+        score=lambda bundle, X: bundle.backend.reconstruction_errors(X))
+    return df, errors, fresh
+
+
+def stream_single_pass(chunks, bundle, fields, layout):
+    tracker = StreamingThreshold(bundle.threshold, select_threshold,
+                                 DYNAMIC_THRESHOLD_PERCENTILE, bundle.error_distribution)
+    anomalies = cache_hits = 0
+    adjustment, chunks = sample_amount_adjustment(chunks)
+    for transactions in chunks:
+        df, errors, fresh = score_chunk(transactions, bundle, adjustment)
+        cache_hits += len(errors) - len(fresh)
+        threshold = tracker.update(errors)
+        is_anomaly = errors > threshold
+        observe_errors(bundle, errors, fresh, threshold)
+        anomalies += int(is_anomaly.sum())
+        record_batch('stream', len(errors), int(is_anomaly.sum()))
+        columns = build_result_columns(
+            df, is_anomaly, errors, df.get('timestamp', None), fields)
+        yield encode_ndjson(columns, len(df), layout)
+    yield json.dumps({'summary': {'transactions': tracker.total, 'anomalies': anomalies,
+                                  'threshold': tracker.current(), 'mode': 'single-pass',
+                                  'modelVersion': bundle.version,
+                                  'cache': {'hits': cache_hits, 'misses': tracker.total - cache_hits}}}) + '\n'
+
+
+def stream_two_pass(chunks, bundle, fields, layout):
+    spool = ResultSpool()
+    cache_hits = 0
+    fresh_errors = []
+    try:
+        adjustment, chunks = sample_amount_adjustment(chunks)
+        # Pass 1: skor semua chunk, spool hasil ke disk
+        for transactions in chunks:
+            df, errors, fresh = score_chunk(transactions, bundle, adjustment)
+            cache_hits += len(errors) - len(fresh)
+            fresh_errors.append(errors[fresh])
+            spool.append(build_result_columns(
+                df, np.zeros(len(df), dtype=bool), errors, df.get('timestamp', None), fields), errors)
+        all_errors = spool.errors
+        threshold = resolve_batch_threshold(
+            all_errors, bundle) if len(all_errors) else bundle.threshold
+        if fresh_errors:
+            update_error_distribution(bundle, np.concatenate(fresh_errors), threshold)
+
+        # Pass 2: tandai anomali dengan threshold global lalu kirim hasil
+        for columns, errors in spool.replay():
+            if 'isAnomaly' in columns:
+                columns['isAnomaly'] = (errors > threshold).tolist()
+            yield encode_ndjson(columns, len(errors), layout)
+        yield json.dumps({'summary': {'transactions': len(all_errors),
+                                      'anomalies': int((all_errors > threshold).sum()),
+                                      'threshold': float(threshold), 'mode': 'two-pass',
+                                      'modelVersion': bundle.version,
+                                      'cache': {'hits': cache_hits,
+                                                'misses': len(all_errors) - cache_hits}}}) + '\n'
+    finally:
+        spool.close()
+
+
+@app.route('/predict/stream', methods=['POST'])
+def predict_stream():
+    """Skor NDJSON secara streaming; hasil dikirim per chunk sebagai NDJSON.
+
+    Error validasi yang terjadi setelah response dimulai dikirim sebagai
+    baris {"error": ...} terakhir.
+    """
+    bundle = acquire_bundle()
+    if bundle is None:
+        logging.error("Model atau preprocessor tidak tersedia")
+        return error_response('Model atau preprocessor tidak tersedia. Jalankan train.py terlebih dahulu.', 500,
+                              'model_unavailable', endpoint='stream')
+
+    try:
+        fields = parse_fields(request.args.get('fields'))
+        layout = parse_layout(request.args.get('layout'))
+        mode = parse_threshold_mode(request.args.get('threshold'))
+        chunk_size = parse_chunk_size(
+            request.args.get('chunk_size'), STREAM_CHUNK_SIZE)
+    except ValueError as e:
+        logging.error(f"Invalid stream options: {e}")
+        return error_response(str(e), 400, 'validation', endpoint='stream')
+
+    chunks = iter_transaction_chunks(request.stream, chunk_size)
+    scorer = stream_single_pass if mode == 'single-pass' else stream_two_pass
+
+    def generate():
         try:
-            with open(threshold_path, 'r') as f:
-                threshold_data = json.load(f)
-                static_threshold = float(
-                    threshold_data.get('threshold', 0.005))
+            yield from scorer(chunks, bundle, fields, layout)
         except Exception as e:
-            logging.warning(
-                f"Gagal membaca threshold.json, menggunakan default threshold 0.005. Error: {e}")
-            static_threshold = 0.005
-
-        # Check if static threshold results in too many anomalies (> 50%)
-        static_anomalies = (errors > static_threshold).sum()
-        static_anomaly_rate = static_anomalies / len(errors)
-
-        if static_anomaly_rate > 0.5:  # If > 50% anomalies, use dynamic threshold
-            # 95th percentile = ~5% anomalies
-            dynamic_threshold = np.percentile(errors, 95)
-            threshold = dynamic_threshold
-            logging.warning(
-                f"Static threshold ({static_threshold:.6f}) would mark {static_anomaly_rate*100:.1f}% as anomalies.")
-            logging.warning(
-                f"Using dynamic threshold (95th percentile): {threshold:.6f}")
+            logging.error(f"Error dalam prediksi streaming: {str(e)}")
+            ERRORS_TOTAL.inc(endpoint='stream', kind='internal')
+            yield json.dumps({'error': f'Terjadi kesalahan saat memproses data: {str(e)}'}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+# =========================
+# Job Scoring Asinkron (batch besar di background)
+# =========================
+JOBS_PAGE_MAX = int(os.environ.get('JOBS_PAGE_MAX', 10000))
+JOBS_RETRY_AFTER = 5
+
+
+def jobs_input_path(name):
+    """Path file input job, hanya di dalam JOBS_INPUT_DIR."""
+    input_dir = os.environ.get('JOBS_INPUT_DIR')
+    if not input_dir:
+        raise ValueError('Input file tidak didukung: JOBS_INPUT_DIR tidak diset.')
+    root = os.path.realpath(input_dir)
+    path = os.path.realpath(os.path.join(root, str(name)))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        raise ValueError(f'File input tidak ditemukan di JOBS_INPUT_DIR: {name}')
+    if not path.endswith(('.csv', '.parquet')):
+        raise ValueError('File input harus .csv atau .parquet.')
+    return path
+
+
+def parse_job_request():
+    """Return (chunks, total, fields, chunk_size, meta) dari body POST /jobs.
+
+    `total` boleh berupa callable (file CSV): jumlah barisnya dihitung oleh
+    runner di background agar POST /jobs tetap cepat.
+    """
+    body_format = columnar_body_format(request.mimetype)
+    options = {} if body_format is not None else (request.get_json(silent=True) or {})
+    if body_format is None and not isinstance(options, dict):
+        raise ValueError('Body JSON harus berupa object.')
+    fields = parse_fields(request.args.get('fields', options.get('fields')))
+    chunk_size = parse_chunk_size(request.args.get('chunk_size', options.get('chunk_size')),
+                                  STREAM_CHUNK_SIZE)
+
+    if body_format is not None:
+        df = read_frame(request.get_data(), body_format)
+        chunks = (df.iloc[start:start + chunk_size] for start in range(0, len(df), chunk_size))
+        return chunks, len(df), fields, chunk_size, {'source': body_format}
+    if 'file' in options:
+        path = jobs_input_path(options['file'])
+        if path.endswith('.parquet'):
+            total = count_input_rows(path)
         else:
-            threshold = static_threshold
-            logging.info(
-                f"Using static threshold from threshold.json: {threshold:.6f}")
+            def total():
+                return count_input_rows(path, chunk_size)
+        return iter_input_chunks(path, chunk_size), total, fields, chunk_size, \
+            {'source': 'file', 'file': options['file']}
+    transactions = options.get('transactions')
+    if not isinstance(transactions, list) or not transactions:
+        raise ValueError('Body harus memiliki "transactions" (list tidak kosong) atau "file".')
+    chunks = (transactions[start:start + chunk_size]
+              for start in range(0, len(transactions), chunk_size))
+    return chunks, len(transactions), fields, chunk_size, {'source': 'json'}
 
+
+def run_scoring_job(job, chunks, bundle, fields, count_rows=None):
+    """Skor job per chunk dengan threshold kumulatif (sama seperti /predict/stream single-pass)."""
+    if count_rows is not None:
+        job.set_total(count_rows())
+    tracker = StreamingThreshold(bundle.threshold, select_threshold,
+                                 DYNAMIC_THRESHOLD_PERCENTILE, bundle.error_distribution)
+    adjustment, chunks = sample_amount_adjustment(chunks)
+    for transactions in chunks:
+        job.check_cancelled()
+        df, errors, fresh = score_chunk(transactions, bundle, adjustment, endpoint='jobs')
+        threshold = tracker.update(errors)
         is_anomaly = errors > threshold
+        observe_errors(bundle, errors, fresh, threshold)
+        record_batch('jobs', len(errors), int(is_anomaly.sum()))
+        job.add_chunk(build_result_columns(df, is_anomaly, errors, df.get('timestamp', None), fields),
+                      len(df), int(is_anomaly.sum()), threshold=float(threshold))
 
-        # =========================
-        # Analisis threshold dan distribusi error untuk evaluasi deteksi anomali
-        # =========================
-        logging.info("=== THRESHOLD ANALYSIS ===")
-        logging.info(f"Loaded threshold: {threshold:.6f}")
-        logging.info(
-            f"Errors above threshold: {(errors > threshold).sum()}/{len(errors)} ({100*(errors > threshold).sum()/len(errors):.1f}%)")
-        logging.info(
-            f"Errors below threshold: {(errors <= threshold).sum()}/{len(errors)} ({100*(errors <= threshold).sum()/len(errors):.1f}%)")
 
-        # =========================
-        # Bandingkan hasil deteksi anomali dengan threshold dinamis (percentile)
-        # =========================
-        dynamic_95 = np.percentile(errors, 95)
-        dynamic_97 = np.percentile(errors, 97)
-        dynamic_99 = np.percentile(errors, 99)
-        logging.info(
-            f"If using 95th percentile threshold ({dynamic_95:.6f}): {(errors > dynamic_95).sum()}/{len(errors)} anomalies")
-        logging.info(
-            f"If using 97th percentile threshold ({dynamic_97:.6f}): {(errors > dynamic_97).sum()}/{len(errors)} anomalies")
-        logging.info(
-            f"If using 99th percentile threshold ({dynamic_99:.6f}): {(errors > dynamic_99).sum()}/{len(errors)} anomalies")
-
-        logging.info(
-            f"Reconstruction errors - min: {errors.min():.6f}, max: {errors.max():.6f}, mean: {errors.mean():.6f}")
-        logging.info(f"Loaded threshold from threshold.json: {threshold:.6f}")
-        logging.info(
-            f"Anomalies detected: {is_anomaly.sum()}/{len(is_anomaly)}")
+def jobs_guard():
+    if job_manager is None:
+        return error_response('Job API tidak aktif (JOBS_ENABLED=0).', 404, 'jobs_disabled',
+                              endpoint='jobs')
+    return None
 
-        # =========================
-        # Susun hasil prediksi untuk setiap transaksi
-        # =========================
-        for i in range(len(df)):
-            timestamp_value = original_timestamps.iloc[i] if original_timestamps is not None else None
-            results.append({
-                'id': str(df.iloc[i].get('id', i)),
-                'timestamp': str(timestamp_value) if timestamp_value is not None else None,
-                'merchant': str(df.iloc[i].get('merchant', '')),
-                'location': str(df.iloc[i].get('location', '')),
-                'amount': float(df.iloc[i]['amount']),
-                'hour': int(df.iloc[i].get('hour', 12)),
-                'user_id': str(df.iloc[i].get('user_id', 0)),
-                'transaction_type': str(df.iloc[i].get('transaction_type', '')),
-                'channel': str(df.iloc[i].get('channel', '')),
-                'device_type': str(df.iloc[i].get('device_type', '')),
-                'isAnomaly': bool(is_anomaly[i]),
-                'anomalyScore': float(errors[i])
-            })
 
-        # =========================
-        # Logging akhir: jumlah transaksi yang berhasil diproses
-        # =========================
-        # =========================
-        # Return hasil prediksi dalam format JSON
-        # =========================
-        return jsonify(results)
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Daftarkan batch untuk diskor di background; langsung return job id (202)."""
+    denied = jobs_guard()
+    if denied is not None:
+        return denied
+    bundle = acquire_bundle()
+    if bundle is None:
+        return error_response('Model atau preprocessor tidak tersedia.', 503, 'model_unavailable',
+                              endpoint='jobs')
+    try:
+        chunks, total, fields, chunk_size, meta = parse_job_request()
+    except UnsupportedBodyError as e:
+        return error_response(str(e), 415, 'unsupported_media_type', endpoint='jobs')
+    except (ValueError, FileNotFoundError) as e:
+        logging.error(f"Invalid job request: {e}")
+        return error_response(str(e), 400, 'validation', endpoint='jobs')
 
-    except Exception as e:
-        logging.error(f"Error dalam prediksi: {str(e)}")
-        return jsonify({'error': f'Terjadi kesalahan saat memproses data: {str(e)}'}), 500
+    meta.update(model_version=bundle.version, chunk_size=chunk_size, fields=fields)
+    count_rows = total if callable(total) else None
+    try:
+        status = job_manager.submit(
+            lambda job: run_scoring_job(job, chunks, bundle, fields, count_rows),
+            total=None if count_rows else total, meta=meta)
+    except JobQueueFull as e:
+        response, code = error_response(str(e), 429, 'queue_full', endpoint='jobs')
+        response.headers['Retry-After'] = str(JOBS_RETRY_AFTER)
+        return response, code
+    response = jsonify(status)
+    response.headers['Location'] = f"/jobs/{status['id']}"
+    return response, 202
+
+
+@app.route('/jobs', methods=['GET'])
+def jobs_stats():
+    denied = jobs_guard()
+    if denied is not None:
+        return denied
+    return jsonify(job_manager.stats())
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    denied = jobs_guard()
+    if denied is not None:
+        return denied
+    status = job_manager.status(job_id)
+    if status is None:
+        return error_response('Job tidak ditemukan atau sudah kedaluwarsa.', 404, 'not_found',
+                              endpoint='jobs')
+    return jsonify(status)
+
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def delete_job(job_id):
+    """Batalkan job aktif, atau hapus hasil job yang sudah selesai."""
+    denied = jobs_guard()
+    if denied is not None:
+        return denied
+    status = job_manager.cancel(job_id)
+    if status is None:
+        return error_response('Job tidak ditemukan atau sudah kedaluwarsa.', 404, 'not_found',
+                              endpoint='jobs')
+    if status['cancel_requested'] and status['state'] in ('queued', 'running'):
+        return jsonify(status), 202
+    job_manager.delete(job_id)
+    return jsonify(dict(status, deleted=True))
+
+
+@app.route('/jobs/<job_id>/results', methods=['GET'])
+def get_job_results(job_id):
+    """Hasil (parsial) job: halaman `offset`/`limit`, atau semua chunk sebagai NDJSON."""
+    denied = jobs_guard()
+    if denied is not None:
+        return denied
+    status = job_manager.status(job_id)
+    if status is None:
+        return error_response('Job tidak ditemukan atau sudah kedaluwarsa.', 404, 'not_found',
+                              endpoint='jobs')
+    try:
+        layout = parse_layout(request.args.get('layout'))
+        offset = int(request.args.get('offset', 0))
+        limit = min(int(request.args.get('limit', 1000)), JOBS_PAGE_MAX)
+        if offset < 0 or limit <= 0:
+            raise ValueError
+    except ValueError as e:
+        message = str(e) or 'Parameter "offset" dan "limit" harus integer positif.'
+        return error_response(message, 400, 'validation', endpoint='jobs')
+
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        def generate():
+            for columns, count in job_manager.iter_results(job_id):
+                yield encode_ndjson(columns, count, layout)
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    columns = job_manager.read_results(job_id, offset, limit)
+    count = len(next(iter(columns.values()), []))
+    # Selama job masih berjalan, halaman berikutnya mungkin baru akan terisi
+    has_more = offset + count < status['processed'] or status['state'] in ('queued', 'running')
+    return jsonify({
+        'job': {key: status[key] for key in ('id', 'state', 'processed', 'total', 'progress')},
+        'offset': offset,
+        'count': count,
+        'next_offset': offset + count if has_more else None,
+        'results': format_results(columns, count, layout, status['meta'].get('model_version')),
+    })
+
+# =========================
+# Profiling On-demand (PROFILE_SECRET)
+# =========================
+if profiler is not None:
+    app.view_functions['predict'] = profiler.wrap(predict, request)
+
+
+def profiler_guard():
+    """Response error jika profiling nonaktif atau secret salah, None jika boleh lanjut."""
+    if profiler is None:
+        return error_response('Profiling tidak aktif (PROFILE_SECRET tidak diset).', 404,
+                              'profiling_disabled', endpoint='profiles')
+    if not profiler.authorized(request.headers):
+        return error_response('Secret profiling tidak valid.', 401, 'unauthorized', endpoint='profiles')
+    return None
+
+
+@app.route('/profiles', methods=['GET'])
+def list_profiles():
+    denied = profiler_guard()
+    if denied is not None:
+        return denied
+    return jsonify({'armed': profiler.armed(), 'profiles': profiler.entries()})
+
+
+@app.route('/profiles/arm', methods=['POST'])
+def arm_profiles():
+    """Profil N request /predict berikutnya (body: {"modes": "cpu,memory", "count": 1})."""
+    denied = profiler_guard()
+    if denied is not None:
+        return denied
+    body = request.get_json(silent=True) or {}
+    try:
+        modes = parse_modes(body.get('modes', 'cpu'))
+        count = int(body.get('count', 1))
+    except (TypeError, ValueError) as e:
+        return error_response(str(e), 400, 'validation', endpoint='profiles')
+    profiler.arm(modes, count)
+    return jsonify({'armed': profiler.armed()})
+
+
+@app.route('/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """Ringkasan profil; `?format=pstats` mengunduh file cProfile mentah."""
+    denied = profiler_guard()
+    if denied is not None:
+        return denied
+    if request.args.get('format') == 'pstats':
+        path = profiler.stats_path(profile_id)
+        if path is None:
+            return error_response('Profil pstats tidak ditemukan.', 404, 'not_found', endpoint='profiles')
+        return send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                         download_name=f'{profile_id}.prof')
+    summary = profiler.summary(profile_id)
+    if summary is None:
+        return error_response('Profil tidak ditemukan (mungkin sudah tergeser ring buffer).', 404,
+                              'not_found', endpoint='profiles')
+    return jsonify(summary)
 
 # =========================
 # Endpoint Contoh Format Data
@@ -464,6 +1134,10 @@ def test_format():
             "device_type": "Device type",
             "isAnomaly": "Boolean - true if anomalous",
             "anomalyScore": "Float - reconstruction error score"
+        },
+        "response_options": {
+            "fields": "Optional projection (query string atau body), e.g. ?fields=id,isAnomaly,anomalyScore",
+            "layout": "Optional 'records' (default, list of objects) atau 'columnar' ({count, columns: {field: [...]}})"
         }
     })
 
@@ -472,11 +1146,114 @@ def test_format():
 # =========================
 
 
+def warmup():
+    """Jalankan satu inference end-to-end agar cache dan halaman memori siap."""
+    start = time.monotonic()
+    client = app.test_client()
+    sample = client.get('/test-format').get_json()['sample_data']
+    # Request warm-up tidak boleh mengisi feature store perilaku user
+    response = client.post('/predict', json=sample, environ_base={WARMUP_ENVIRON: True})
+    if response.status_code != 200:
+        raise RuntimeError(
+            f"Warm-up gagal ({response.status_code}): {response.get_json()}")
+    app.config['WARMED_UP'] = True
+    STARTUP['warmup_seconds'] = round(time.monotonic() - start, 4)
+    STARTUP['ready_seconds'] = round(time.monotonic() - _process_started, 4)
+    logging.info(f"Service siap dalam {STARTUP['ready_seconds']:.2f} detik sejak start")
+
+
+def wait_until_ready():
+    """Dipakai mode serve: parent menunggu load + warm-up selesai sebelum fork."""
+    start_model_loader().join()
+    if not app.config.get('WARMED_UP', False):
+        raise RuntimeError(
+            f"Model tidak siap: {registry.last_error or 'warm-up gagal'}")
+
+
+def on_worker_start(worker_id, threads_per_worker):
+    limit_native_threads(threads_per_worker)
+    limit_tensorflow_threads(threads_per_worker)
+    registry.after_fork()
+    if batcher is not None:
+        batcher.after_fork()
+    if score_cache is not None:
+        score_cache.after_fork()
+    if job_manager is not None:
+        job_manager.after_fork()
+    if feature_store is not None:
+        feature_store.after_fork(worker_id)
+        feature_store.start_snapshots(float(os.environ.get(
+            'FEATURE_STORE_SNAPSHOT_INTERVAL', DEFAULT_SNAPSHOT_INTERVAL)))
+    if shadow_scorer is not None:
+        shadow_scorer.after_fork()
+    if score_sink is not None:
+        score_sink.after_fork()
+
+
+def on_worker_exit(worker_id):
+    if feature_store is not None:
+        feature_store.stop()
+
+
+# Jumlah worker proses mode serve (diset parent sebelum fork; 1 untuk app.run)
+serve_workers = 1
+USER_FEATURES_SERVE_ERROR = ("Model memakai fitur perilaku user, tetapi state per user ada di memory "
+                             "masing-masing worker: fitur akan bergantung pada worker yang melayani "
+                             "request. Jalankan serve dengan --workers 1 (scale out dengan beberapa "
+                             "instance dan routing sticky per user_id).")
+KERAS_SERVE_ERROR = ("Backend keras tidak didukung di mode serve: runtime TensorFlow sudah aktif "
+                     "di parent (load + warm-up) dan tidak aman di-fork. Gunakan "
+                     "INFERENCE_BACKEND=numpy, atau python app.py tanpa serve untuk backend keras.")
+
+
+def serve_command(args):
+    global serve_workers
+    if os.environ.get('INFERENCE_BACKEND', 'numpy').lower() == 'keras':
+        raise SystemExit(KERAS_SERVE_ERROR)
+    wait_until_ready()
+    bundle = registry.current()
+    if bundle is not None and bundle.backend.name == 'keras':
+        # Kompilasi backend numpy gagal dan registry kembali ke Keras
+        raise SystemExit(KERAS_SERVE_ERROR)
+    if args.workers > 1 and bundle is not None and uses_user_features(bundle):
+        raise SystemExit(USER_FEATURES_SERVE_ERROR)
+    serve_workers = args.workers
+    # Watcher parent tidak dipakai; setiap worker menjalankan watcher sendiri
+    registry.stop()
+    if feature_store is not None:
+        # Snapshot ditulis oleh worker, bukan oleh parent
+        feature_store.stop(flush=False)
+    if shadow_scorer is not None:
+        shadow_scorer.stop()
+    threads = args.threads_per_worker or default_threads_per_worker(args.workers)
+    logging.info(f"Thread BLAS/TensorFlow intra-op per worker: {threads}")
+    serve(app, host=args.host, port=args.port, workers=args.workers,
+          on_worker_start=lambda worker_id: on_worker_start(worker_id, threads),
+          on_worker_exit=on_worker_exit)
+
+
 def main():
+    parser = argparse.ArgumentParser(description='Fraud Detection AI Service')
+    subparsers = parser.add_subparsers(dest='command')
+    serve_parser = subparsers.add_parser(
+        'serve', help='Production serving dengan pre-forked workers')
+    serve_parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    serve_parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)))
+    serve_parser.add_argument('--workers', type=int, default=int(os.environ.get('WORKERS', 2)))
+    serve_parser.add_argument('--threads-per-worker', type=int, default=None,
+                              help='Thread BLAS dan TF intra-op per worker (default: cpu_count // workers)')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        serve_command(args)
+        return
+
     port = int(os.environ.get("PORT", 5000))
     debug = bool(os.environ.get("DEBUG", True))
-    app.run(port=port, debug=debug)
+    app.run(port=port, debug=debug, threaded=True)
+
 
+start_model_loader()
 
 if __name__ == '__main__':
     main()
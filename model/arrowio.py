@@ -0,0 +1,86 @@
+# =========================
+# Body Request/Response Arrow IPC & Parquet
+# =========================
+# Alternatif JSON untuk batch besar: body Arrow IPC stream atau Parquet
+# dibaca langsung dari buffer request (tanpa salinan) menjadi DataFrame
+# kolumnar, sehingga tidak ada parsing angka dari teks maupun dict per
+# transaksi. Response Arrow disusun dari kolom hasil apa adanya. pyarrow
+# opsional: tanpa pyarrow hanya JSON yang didukung.
+try:
+    import pyarrow as pa
+    import pyarrow.ipc  # noqa: F401
+    import pyarrow.parquet  # noqa: F401
+except ImportError:
+    pa = None
+
+ARROW_STREAM_TYPE = 'application/vnd.apache.arrow.stream'
+PARQUET_TYPES = ('application/vnd.apache.parquet', 'application/x-parquet', 'application/parquet')
+
+
+class UnsupportedBodyError(ValueError):
+    """Body Arrow/Parquet dikirim tetapi pyarrow tidak terpasang di service."""
+
+
+def columnar_body_format(mimetype):
+    """'arrow', 'parquet', atau None (JSON) dari Content-Type request."""
+    if mimetype == ARROW_STREAM_TYPE:
+        return 'arrow'
+    if mimetype in PARQUET_TYPES:
+        return 'parquet'
+    return None
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise UnsupportedBodyError(
+            'Body Arrow/Parquet membutuhkan pyarrow di service (pip install pyarrow). Gunakan JSON.')
+
+
+def read_frame(data, fmt):
+    """Decode body Arrow IPC stream / Parquet ke DataFrame.
+
+    Buffer request dibungkus tanpa disalin; kolom numerik tanpa null
+    menjadi view ke buffer Arrow (split_blocks), string menjadi object.
+    """
+    _require_pyarrow()
+    buffer = pa.py_buffer(data)
+    try:
+        if fmt == 'arrow':
+            table = pa.ipc.open_stream(buffer).read_all()
+        else:
+            table = pa.parquet.read_table(pa.BufferReader(buffer))
+    except (pa.ArrowInvalid, OSError) as e:
+        raise ValueError(f'Body {fmt} tidak valid: {e}')
+    return table.to_pandas(split_blocks=True)
+
+
+def accepts_arrow(accept_mimetypes):
+    """True jika klien meminta response Arrow (JSON tetap default untuk */*)."""
+    if pa is None:
+        return False
+    return accept_mimetypes.best_match(['application/json', ARROW_STREAM_TYPE]) == ARROW_STREAM_TYPE
+
+
+def _string_array(values):
+    """Cast vektor ke string Arrow; fallback str() per elemen untuk kolom campuran."""
+    try:
+        return pa.array(values, from_pandas=True).cast(pa.string())
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return pa.array([str(value) for value in values], type=pa.string())
+
+
+def encode_arrow_stream(columns, metadata=None, string_fields=()):
+    """Serialisasi dict kolom (array/Series) ke bytes Arrow IPC stream.
+
+    Kolom di `string_fields` di-cast ke string seperti str() pada response JSON.
+    """
+    _require_pyarrow()
+    table = pa.table({name: _string_array(values) if name in string_fields else values
+                      for name, values in columns.items()})
+    if metadata:
+        table = table.replace_schema_metadata(
+            {key: str(value) for key, value in metadata.items()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
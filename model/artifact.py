@@ -0,0 +1,111 @@
+# =========================
+# Serving Artifact (tanpa TensorFlow)
+# =========================
+# train.py mengekspor bobot Dense stack (BatchNorm sudah dilipat) dan tabel
+# encoder (mean/scale numerik + daftar kategori) ke satu file .npz tanpa
+# kompresi dan tanpa pickle. Service bisa start dari file ini tanpa import
+# TensorFlow maupun sklearn; model Keras dan preprocessor joblib hanya
+# dimuat jika artifact tidak ada, basi, atau backend referensi diminta.
+import numpy as np
+
+from features import FastEncoder, verify_encoder
+from inference import DenseLayer, KerasBackend, NumpyBackend, compile_dense_stack, verify_backend
+
+ARTIFACT_FILENAME = 'serving_artifact.npz'
+ARTIFACT_FORMAT_VERSION = 1
+
+
+class ArtifactError(ValueError):
+    """Serving artifact tidak valid atau formatnya tidak dikenal."""
+
+
+def _string_array(values):
+    return np.asarray([str(v) for v in values], dtype=np.str_)
+
+
+def _load_kernel(data, i):
+    kernel = data[f'kernel_{i}']
+    # Artifact lama bisa berisi kernel float16/int8 (varian yang sudah dihapus)
+    if kernel.dtype != np.float32:
+        raise ArtifactError(f"Kernel {kernel.dtype} tidak didukung; ekspor ulang artifact")
+    return kernel
+
+
+def save_artifact(path, layers, encoder):
+    """Tulis DenseLayer list dan FastEncoder ke file .npz (tanpa pickle)."""
+    arrays = {
+        'format_version': np.asarray(ARTIFACT_FORMAT_VERSION),
+        'activations': _string_array(layer.activation for layer in layers),
+        'negative_slopes': np.asarray([layer.negative_slope for layer in layers], dtype=np.float64),
+        'numeric_features': _string_array(encoder.numeric_features),
+        'mean': encoder.mean,
+        'scale': encoder.scale,
+        'categorical_features': _string_array(encoder.categorical_features),
+        'feature_names': _string_array(encoder.feature_names),
+    }
+    for i, layer in enumerate(layers):
+        arrays[f'kernel_{i}'] = np.ascontiguousarray(layer.kernel, dtype=np.float32)
+        arrays[f'bias_{i}'] = np.asarray(layer.bias, dtype=np.float32)
+    for j, categories in enumerate(encoder.categories):
+        # Kategori string disimpan sebagai unicode array agar tidak butuh pickle
+        arrays[f'categories_{j}'] = (_string_array(categories) if categories.dtype.kind == 'O'
+                                     else categories)
+    with open(path, 'wb') as f:
+        np.savez(f, **arrays)
+
+
+def load_artifact(path):
+    """Muat artifact menjadi (NumpyBackend, FastEncoder)."""
+    with np.load(path, allow_pickle=False) as data:
+        format_version = int(data['format_version'])
+        if format_version != ARTIFACT_FORMAT_VERSION:
+            raise ArtifactError(
+                f"Format serving artifact tidak dikenal: {format_version}")
+        activations = data['activations'].tolist()
+        slopes = data['negative_slopes'].tolist()
+        layers = [DenseLayer(kernel=_load_kernel(data, i), bias=data[f'bias_{i}'],
+                             activation=activation, negative_slope=slope)
+                  for i, (activation, slope) in enumerate(zip(activations, slopes))]
+        categorical_features = data['categorical_features'].tolist()
+        categories = []
+        for j in range(len(categorical_features)):
+            values = data[f'categories_{j}']
+            # Kembalikan ke object dtype seperti OneHotEncoder.categories_
+            categories.append(values.astype(object) if values.dtype.kind == 'U' else values)
+        encoder = FastEncoder(data['numeric_features'].tolist(), data['mean'], data['scale'],
+                              categorical_features, categories, data['feature_names'].tolist())
+
+    backend = NumpyBackend(layers)
+    if backend.input_dim != encoder.width:
+        raise ArtifactError(
+            f"Input model ({backend.input_dim}) tidak cocok dengan encoder ({encoder.width})")
+    return backend, encoder
+
+
+def export_artifact(path, model, preprocessor):
+    """Kompilasi model Keras + preprocessor, verifikasi, lalu tulis artifact.
+
+    Return dict ringkasan untuk manifest. Raise ValueError jika hasil
+    kompilasi tidak identik (encoder) atau di luar toleransi (model).
+    """
+    layers = compile_dense_stack(model)
+    backend = NumpyBackend(layers)
+    max_rel_diff = verify_backend(backend, KerasBackend(model), backend.input_dim)
+    encoder = FastEncoder.from_column_transformer(preprocessor)
+    verify_encoder(encoder, preprocessor)
+    save_artifact(path, layers, encoder)
+
+    # Pastikan file yang ditulis bisa dimuat ulang dengan hasil yang sama
+    loaded_backend, loaded_encoder = load_artifact(path)
+    X = np.random.default_rng(0).standard_normal(
+        (16, backend.input_dim)).astype(np.float32)
+    if not np.array_equal(loaded_backend.reconstruction_errors(X), backend.reconstruction_errors(X)):
+        raise ArtifactError("Artifact yang dimuat ulang memberi skor berbeda")
+    verify_encoder(loaded_encoder, preprocessor)
+
+    return {
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'input_dim': backend.input_dim,
+        'layers': len(layers),
+        'max_rel_diff': max_rel_diff,
+    }
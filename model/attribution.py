@@ -0,0 +1,98 @@
+# =========================
+# Atribusi Reconstruction Error per Fitur Asli
+# =========================
+# anomalyScore adalah rata-rata squared error seluruh kolom input model.
+# Untuk menjelaskan "kenapa", squared error per kolom dijumlahkan kembali ke
+# fitur asalnya (kolom one-hot merchant_* -> merchant, dst.) dengan satu
+# np.add.reduceat (kolom satu fitur selalu bersebelahan di output
+# ColumnTransformer). Pemetaan diambil dari struktur FastEncoder (jumlah
+# kategori per fitur), atau dari feature names jika encoder tidak aktif. Hasilnya top-k fitur dengan
+# porsi error terbesar per transaksi anomali, tanpa round trip ke LLM.
+import threading
+
+import numpy as np
+
+DEFAULT_TOP_K = 3
+# Bundle jarang berganti; cache kecil per version model cukup
+_MAX_CACHED = 8
+_cache = {}
+_lock = threading.Lock()
+
+
+class FeatureGroups:
+    """Pemetaan kolom input model -> fitur asli (index awal tiap grup)."""
+
+    def __init__(self, features, starts, width):
+        self.features = list(features)
+        self.starts = np.asarray(starts, dtype=np.intp)
+        self.width = int(width)
+
+    @classmethod
+    def from_feature_names(cls, feature_names, input_features):
+        """Kelompokkan nama output ColumnTransformer ('num__amount', 'cat__merchant_x')."""
+        # Cocokkan prefix terpanjang agar mis. 'user_id' tidak tertukar dengan 'user'
+        candidates = sorted(input_features, key=len, reverse=True)
+        features, starts = [], []
+        for column, name in enumerate(feature_names):
+            name = str(name).split('__', 1)[-1]
+            source = next((feature for feature in candidates
+                           if name == feature or name.startswith(feature + '_')), None)
+            if source is None:
+                raise ValueError(f"Kolom {name!r} tidak bisa dipetakan ke fitur input")
+            if not features or features[-1] != source:
+                if source in features:
+                    raise ValueError(f"Kolom fitur {source!r} tidak bersebelahan")
+                features.append(source)
+                starts.append(column)
+        return cls(features, starts, len(feature_names))
+
+    @classmethod
+    def from_encoder(cls, encoder):
+        """Pemetaan persis dari layout FastEncoder: numerik 1 kolom, kategorikal 1 kolom per kategori."""
+        sizes = [1] * len(encoder.numeric_features) + [len(c) for c in encoder.categories]
+        return cls(encoder.input_features, np.concatenate([[0], np.cumsum(sizes)[:-1]]),
+                   encoder.width)
+
+    def contributions(self, squared_errors):
+        """Squared error per fitur asli (n, n_fitur); jumlah per baris / width = anomalyScore."""
+        return np.add.reduceat(squared_errors, self.starts, axis=1) / self.width
+
+    def top_k(self, squared_errors, k=DEFAULT_TOP_K):
+        """(index fitur, error fitur, porsi dari total) top-k per baris, urut menurun."""
+        contributions = self.contributions(squared_errors)
+        k = min(int(k), len(self.features))
+        top = np.argpartition(-contributions, k - 1, axis=1)[:, :k]
+        values = np.take_along_axis(contributions, top, axis=1)
+        order = np.argsort(-values, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        values = np.take_along_axis(values, order, axis=1)
+        totals = contributions.sum(axis=1, keepdims=True)
+        shares = values / np.where(totals > 0, totals, 1.0)
+        return top, values, shares
+
+    def explain(self, squared_errors, k=DEFAULT_TOP_K):
+        """List per baris: [{'feature', 'error', 'share'}] untuk response JSON."""
+        top, values, shares = self.top_k(squared_errors, k)
+        features = self.features
+        return [[{'feature': features[index], 'error': round(value, 8), 'share': round(share, 4)}
+                 for index, value, share in zip(row_top, row_values, row_shares)]
+                for row_top, row_values, row_shares in zip(top.tolist(), values.tolist(),
+                                                           shares.tolist())]
+
+
+def feature_groups(bundle):
+    """FeatureGroups untuk bundle (di-cache per version model)."""
+    groups = _cache.get(bundle.version)
+    if groups is not None:
+        return groups
+    if bundle.encoder is not None:
+        # Nama kolom one-hot bisa ambigu (fitur 'user' kategori 'id_5' -> 'user_id_5')
+        groups = FeatureGroups.from_encoder(bundle.encoder)
+    else:
+        groups = FeatureGroups.from_feature_names(bundle.preprocessor.get_feature_names_out(),
+                                                  list(bundle.preprocessor.feature_names_in_))
+    with _lock:
+        if len(_cache) >= _MAX_CACHED:
+            _cache.clear()
+        _cache[bundle.version] = groups
+    return groups
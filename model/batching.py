@@ -0,0 +1,195 @@
+# =========================
+# Adaptive Micro-Batching untuk Inference
+# =========================
+# Request /predict kecil yang datang bersamaan dimasukkan ke antrean,
+# digabung menjadi satu matrix (sampai max batch size atau max wait),
+# diskor dalam satu forward pass, lalu hasilnya dipecah kembali ke
+# masing-masing pemanggil. Adaptif: jika tidak ada request lain yang
+# menunggu, batch langsung diproses tanpa menunggu max wait.
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+
+DEFAULT_MAX_BATCH_SIZE = 512
+DEFAULT_MAX_WAIT_MS = 2.0
+
+
+class _PendingRequest:
+    __slots__ = ('backend', 'X', 'future')
+
+    def __init__(self, backend, X):
+        self.backend = backend
+        self.X = X
+        self.future = Future()
+
+
+class MicroBatcher:
+    """Penggabung request inference dengan satu worker thread."""
+
+    def __init__(self, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS):
+        self.max_batch_size = int(max_batch_size)
+        self.max_wait = float(max_wait_ms) / 1000.0
+        self._queue = queue.Queue()
+        self._carry = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        # Metrics
+        self.batches_total = 0
+        self.requests_total = 0
+        self.rows_total = 0
+        self.bypassed_total = 0
+        self.max_queue_depth = 0
+        self.batch_size_histogram = {}
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def queue_depth(self):
+        return self._pending
+
+    def start(self):
+        if self.running:
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def after_fork(self):
+        """Panggil di proses anak setelah fork: buat ulang antrean dan worker thread."""
+        self._queue = queue.Queue()
+        self._carry = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        return self.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def submit(self, backend, X):
+        """Skor X lewat batch gabungan; blok sampai hasil untuk X tersedia."""
+        if len(X) >= self.max_batch_size or not self.running:
+            with self._lock:
+                self.bypassed_total += 1
+            return backend.reconstruction_errors(X)
+
+        item = _PendingRequest(backend, X)
+        with self._lock:
+            self._pending += 1
+            self.max_queue_depth = max(self.max_queue_depth, self._pending)
+        self._queue.put(item)
+        return item.future.result()
+
+    def _take(self, timeout):
+        if self._carry is not None:
+            item, self._carry = self._carry, None
+        else:
+            item = self._queue.get(timeout=timeout)
+        with self._lock:
+            self._pending -= 1
+        return item
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._take(timeout=0.1)
+            except queue.Empty:
+                continue
+            batch, rows = [first], len(first.X)
+            deadline = time.monotonic() + self.max_wait
+            # Tunggu request lain hanya jika memang ada yang sedang antre
+            while rows < self.max_batch_size and self._pending > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._take(timeout=remaining)
+                except queue.Empty:
+                    break
+                if rows + len(item.X) > self.max_batch_size:
+                    with self._lock:
+                        self._pending += 1
+                    self._carry = item
+                    break
+                batch.append(item)
+                rows += len(item.X)
+            self._flush(batch)
+
+    def _flush(self, batch):
+        groups = {}
+        for item in batch:
+            groups.setdefault(id(item.backend), []).append(item)
+        for items in groups.values():
+            n_rows = sum(len(item.X) for item in items)
+            try:
+                X = items[0].X if len(items) == 1 else np.concatenate(
+                    [item.X for item in items])
+                errors = items[0].backend.reconstruction_errors(X)
+                if len(errors) != n_rows:
+                    raise ValueError(
+                        f"Backend mengembalikan {len(errors)} error untuk {n_rows} baris")
+                offset = 0
+                for item in items:
+                    item.future.set_result(errors[offset:offset + len(item.X)])
+                    offset += len(item.X)
+            except Exception as e:
+                logging.error(f"Micro-batch inference error: {e}")
+                if len(items) == 1:
+                    items[0].future.set_exception(e)
+                else:
+                    # Skor ulang satu per satu agar request yang rusak tidak
+                    # menggagalkan request lain di batch yang sama
+                    self._score_each(items)
+            self._record(len(items), n_rows)
+
+    @staticmethod
+    def _score_each(items):
+        for item in items:
+            if item.future.done():
+                continue
+            try:
+                item.future.set_result(item.backend.reconstruction_errors(item.X))
+            except Exception as e:
+                item.future.set_exception(e)
+
+    def _record(self, n_requests, n_rows):
+        bucket = 1
+        while bucket < n_rows:
+            bucket *= 2
+        with self._lock:
+            self.batches_total += 1
+            self.requests_total += n_requests
+            self.rows_total += n_rows
+            self.batch_size_histogram[bucket] = self.batch_size_histogram.get(
+                bucket, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            batches = self.batches_total
+            return {
+                'enabled': self.running,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'queue_depth': self._pending,
+                'max_queue_depth': self.max_queue_depth,
+                'batches_total': batches,
+                'requests_total': self.requests_total,
+                'rows_total': self.rows_total,
+                'bypassed_total': self.bypassed_total,
+                'avg_requests_per_batch': self.requests_total / batches if batches else 0.0,
+                'avg_rows_per_batch': self.rows_total / batches if batches else 0.0,
+                'batch_size_histogram': {f'<={k}': v for k, v in sorted(self.batch_size_histogram.items())},
+            }
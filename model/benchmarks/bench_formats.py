@@ -0,0 +1,71 @@
+# =========================
+# Benchmark: format body /predict (JSON vs Arrow IPC vs Parquet)
+# =========================
+# Memanggil /predict in-process (Flask test client) dengan body dan
+# response dalam tiap format, lalu melaporkan waktu total serta stage
+# parse dan serialize dari histogram latency service. Score cache dan
+# micro-batching dimatikan agar setiap ulangan benar-benar menskor ulang.
+# Jalankan dari folder model/:
+#   python benchmarks/bench_formats.py --rows 10000 100000 1000000
+import os
+import sys
+import time
+import argparse
+
+os.environ.setdefault('SCORE_CACHE_ENABLED', '0')
+os.environ.setdefault('MICROBATCH_ENABLED', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app as service  # noqa: E402
+from synthetic import encode_request, generate_transactions, model_vocabulary  # noqa: E402
+
+FORMATS = ('json', 'arrow', 'parquet')
+
+
+def stage_sums():
+    return {key[1]: value_sum for key, (_, value_sum) in service.STAGE_SECONDS.totals().items()
+            if key[0] == 'predict'}
+
+
+def run_once(client, body, content_type, accept):
+    before = stage_sums()
+    start = time.perf_counter()
+    response = client.post('/predict', data=body, content_type=content_type,
+                           headers={'Accept': accept})
+    total = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(f"/predict gagal ({response.status_code}): {response.data[:200]}")
+    after = stage_sums()
+    stages = {name: after[name] - before.get(name, 0.0) for name in after}
+    return total, stages, len(response.data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bandingkan format body /predict")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=list(FORMATS))
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    service.wait_until_ready()
+    client = service.app.test_client()
+    vocabulary = model_vocabulary(service.registry.current().encoder)
+
+    print(f"{'rows':>8} {'format':>8} {'req MB':>8} {'resp MB':>8} {'total ms':>10} "
+          f"{'parse ms':>10} {'serialize ms':>13}")
+    for n_rows in args.rows:
+        df = generate_transactions(n_rows, vocabulary=vocabulary)
+        for fmt in args.formats:
+            body, content_type, accept = encode_request(df, fmt)
+            best = None
+            for _ in range(args.repeat):
+                result = run_once(client, body, content_type, accept)
+                if best is None or result[0] < best[0]:
+                    best = result
+            total, stages, response_bytes = best
+            print(f"{n_rows:>8} {fmt:>8} {len(body) / 1e6:>8.2f} {response_bytes / 1e6:>8.2f} "
+                  f"{total * 1000:>10.1f} {stages.get('parse', 0) * 1000:>10.1f} "
+                  f"{stages.get('serialize', 0) * 1000:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
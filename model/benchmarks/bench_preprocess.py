@@ -0,0 +1,61 @@
+# =========================
+# Benchmark: preprocessor.transform vs FastEncoder
+# =========================
+# Jalankan dari folder model/:
+#   python benchmarks/bench_preprocess.py --rows 1000 10000 100000
+import os
+import sys
+import time
+import argparse
+
+import joblib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from features import FastEncoder  # noqa: E402
+
+
+def synthetic_frame(encoder, n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    data = {'amount': rng.lognormal(12.5, 0.8, n_rows),
+            'hour': rng.integers(0, 24, n_rows)}
+    for feature, categories in zip(encoder.categorical_features, encoder.categories):
+        data[feature] = categories[rng.integers(0, len(categories), n_rows)]
+    return pd.DataFrame(data)[encoder.input_features]
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Bandingkan preprocessor.transform dengan FastEncoder")
+    parser.add_argument('--preprocessor', default='preprocessor_pipeline.joblib')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1, 100, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    preprocessor = joblib.load(args.preprocessor)
+    encoder = FastEncoder.from_column_transformer(preprocessor)
+
+    print(f"{'rows':>8} {'sklearn ms':>12} {'fast ms':>10} {'speedup':>8}  identical")
+    for n_rows in args.rows:
+        df = synthetic_frame(encoder, n_rows)
+        expected = np.asarray(preprocessor.transform(df)).astype(np.float32)
+        identical = np.array_equal(expected, encoder.transform(df))
+        sklearn_s = best_of(lambda: np.asarray(
+            preprocessor.transform(df)).astype(np.float32), args.repeat)
+        fast_s = best_of(lambda: encoder.transform(df), args.repeat)
+        print(f"{n_rows:>8} {sklearn_s * 1000:>12.3f} {fast_s * 1000:>10.3f} "
+              f"{sklearn_s / fast_s:>7.1f}x  {identical}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# =========================
+# Benchmark: throughput HTTP /predict
+# =========================
+# Bandingkan mode development (python app.py) dengan mode serve
+# (python app.py serve --workers N). Jalankan service terlebih dahulu, lalu:
+#   python benchmarks/bench_serving.py --url http://127.0.0.1:5000 --concurrency 16
+import json
+import time
+import argparse
+import threading
+import urllib.request
+
+import numpy as np
+
+SAMPLE_TRANSACTION = {
+    "amount": 250000.0, "timestamp": "2025-06-29T14:30:00Z", "user_id": 123,
+    "transaction_type": "Bill Payment", "channel": "BCA Mobile", "merchant": "Alfamart",
+    "device_type": "Android", "location": "Jakarta",
+}
+
+
+def run(url, concurrency, total_requests, batch_size):
+    body = json.dumps({"transactions": [dict(SAMPLE_TRANSACTION, id=str(i))
+                                        for i in range(batch_size)]}).encode()
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+    remaining = [total_requests]
+
+    def worker():
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            request = urllib.request.Request(
+                f"{url}/predict?fields=id,isAnomaly,anomalyScore", data=body,
+                headers={'Content-Type': 'application/json'})
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=60) as response:
+                    response.read()
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+            except Exception as e:
+                with lock:
+                    failures.append(str(e))
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'url': url,
+        'concurrency': concurrency,
+        'batch_size': batch_size,
+        'requests': len(latencies),
+        'failures': len(failures),
+        'requests_per_second': len(latencies) / wall,
+        'rows_per_second': len(latencies) * batch_size / wall,
+        'p50_ms': float(np.percentile(latencies_ms, 50)) if len(latencies) else None,
+        'p99_ms': float(np.percentile(latencies_ms, 99)) if len(latencies) else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ukur requests/second /predict via HTTP")
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=1)
+    parser.add_argument('--warmup', type=int, default=50)
+    args = parser.parse_args()
+
+    run(args.url, min(args.concurrency, args.warmup), args.warmup, args.batch_size)
+    print(json.dumps(run(args.url, args.concurrency, args.requests, args.batch_size), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+# =========================
+# Benchmark Suite /predict dengan Baseline
+# =========================
+# Menjalankan pipeline /predict untuk beberapa ukuran batch, in-process
+# (Flask test client) atau lewat HTTP ke service yang sedang berjalan.
+# Latency per stage dibaca dari header Server-Timing, peak RSS dari proses
+# service (in-process: proses ini; HTTP: gauge fraud_process di /metrics).
+# Setiap request memakai transaksi baru agar score cache tidak ikut terukur.
+# Jalankan dari folder model/:
+#   python benchmarks/bench_suite.py --output hasil.json
+#   python benchmarks/bench_suite.py --baseline benchmarks/baseline.json --update-baseline
+#   python benchmarks/bench_suite.py --baseline benchmarks/baseline.json   # gagal jika regresi
+#   python benchmarks/bench_suite.py --mode http --url http://127.0.0.1:5000
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import resource
+import urllib.request
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from synthetic import (encode_request, generate_transactions, load_vocabulary,  # noqa: E402
+                       model_vocabulary, parse_cardinalities)
+
+DEFAULT_BATCH_SIZES = [1, 10, 100, 1000, 10000, 100000, 1000000]
+# Jumlah baris yang diskor per ukuran batch (request = rows / batch, dibatasi)
+ROWS_PER_SIZE = 200000
+MIN_REQUESTS = 3
+MAX_REQUESTS = 200
+WARMUP_REQUESTS = 2
+PERCENTILES = (50, 95, 99)
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_RSS_TOLERANCE = 0.2
+
+
+def parse_server_timing(header):
+    """'parse;dur=1.2, inference;dur=3.4' -> {'parse': 0.0012, ...} (detik)."""
+    stages = {}
+    for item in (header or '').split(','):
+        name, _, params = item.strip().partition(';')
+        if params.startswith('dur='):
+            stages[name] = float(params[4:]) / 1000
+    return stages
+
+
+class InProcessTarget:
+    name = 'inprocess'
+
+    def __init__(self):
+        # Score cache dan micro-batching dimatikan: yang diukur pipeline itu sendiri
+        os.environ.setdefault('SCORE_CACHE_ENABLED', '0')
+        os.environ.setdefault('MICROBATCH_ENABLED', '0')
+        import app as service
+        service.wait_until_ready()
+        self._client = service.app.test_client()
+        self.vocabulary = model_vocabulary(service.registry.current().encoder)
+
+    def predict(self, body, content_type, accept):
+        response = self._client.post('/predict?fields=id,isAnomaly,anomalyScore', data=body,
+                                     content_type=content_type, headers={'Accept': accept})
+        if response.status_code != 200:
+            raise RuntimeError(f"/predict gagal ({response.status_code}): {response.data[:200]}")
+        return response.headers.get('Server-Timing')
+
+    def peak_rss_bytes(self):
+        # Peak sejak proses mulai: mencakup ukuran batch sebelumnya dalam run yang sama
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class HttpTarget:
+    name = 'http'
+
+    def __init__(self, url, model_dir):
+        self.url = url.rstrip('/')
+        self.vocabulary = load_vocabulary(model_dir)
+
+    def predict(self, body, content_type, accept):
+        request = urllib.request.Request(
+            f"{self.url}/predict?fields=id,isAnomaly,anomalyScore", data=body,
+            headers={'Content-Type': content_type, 'Accept': accept})
+        with urllib.request.urlopen(request, timeout=600) as response:
+            response.read()
+            return response.headers.get('Server-Timing')
+
+    def peak_rss_bytes(self):
+        """Peak RSS worker yang menjawab /metrics (None jika tidak tersedia)."""
+        try:
+            with urllib.request.urlopen(f"{self.url}/metrics", timeout=10) as response:
+                for line in response.read().decode().splitlines():
+                    if line.startswith('fraud_process{stat="peak_rss_bytes"}'):
+                        return float(line.rsplit(' ', 1)[1])
+        except OSError:
+            pass
+        return None
+
+
+def summarize(values):
+    values = np.asarray(values, dtype=np.float64) * 1000
+    return {f'p{p}': round(float(np.percentile(values, p)), 3) for p in PERCENTILES}
+
+
+def run_batch_size(target, batch_size, fmt, anomaly_rate, cardinalities, seed):
+    n_requests = max(MIN_REQUESTS, min(MAX_REQUESTS, ROWS_PER_SIZE // batch_size))
+    totals, stages = [], {}
+    scored_seconds = 0.0
+    for i in range(WARMUP_REQUESTS + n_requests):
+        # Data baru per request (di luar pengukuran) agar tidak ada cache hit
+        df = generate_transactions(batch_size, seed=seed + i, cardinalities=cardinalities,
+                                   anomaly_rate=anomaly_rate, vocabulary=target.vocabulary,
+                                   start_id=i * batch_size)
+        body, content_type, accept = encode_request(df, fmt)
+        del df
+        start = time.perf_counter()
+        header = target.predict(body, content_type, accept)
+        elapsed = time.perf_counter() - start
+        if i < WARMUP_REQUESTS:
+            continue
+        totals.append(elapsed)
+        scored_seconds += elapsed
+        for name, seconds in parse_server_timing(header).items():
+            stages.setdefault(name, []).append(seconds)
+
+    peak_rss = target.peak_rss_bytes()
+    return {
+        'mode': target.name,
+        'format': fmt,
+        'batch_size': batch_size,
+        'requests': n_requests,
+        'throughput_rows_per_s': round(batch_size * n_requests / scored_seconds, 1),
+        'latency_ms': dict({'total': summarize(totals)},
+                           **{name: summarize(values) for name, values in stages.items()}),
+        'peak_rss_mb': round(peak_rss / 2 ** 20, 1) if peak_rss is not None else None,
+    }
+
+
+def result_key(result):
+    return f"{result['mode']}/{result['format']}/{result['batch_size']}"
+
+
+def compare(results, baseline, tolerance, rss_tolerance):
+    """Return list pesan regresi terhadap baseline (kosong = lolos)."""
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get('results', {}).get(key)
+        if reference is None:
+            continue
+        checks = [
+            ('latency p50', result['latency_ms']['total']['p50'],
+             reference['latency_ms']['total']['p50'], tolerance, True),
+            ('throughput', result['throughput_rows_per_s'],
+             reference['throughput_rows_per_s'], tolerance, False),
+        ]
+        if result['peak_rss_mb'] is not None and reference.get('peak_rss_mb') is not None:
+            checks.append(('peak RSS', result['peak_rss_mb'], reference['peak_rss_mb'],
+                           rss_tolerance, True))
+        for label, value, expected, limit, higher_is_worse in checks:
+            change = (value - expected) / expected if expected else 0.0
+            if (change if higher_is_worse else -change) > limit:
+                regressions.append(
+                    f"{key}: {label} {value} vs baseline {expected} ({change * 100:+.1f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite /predict dengan baseline JSON")
+    parser.add_argument('--mode', choices=('inprocess', 'http'), default='inprocess')
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--model-dir', default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        help='Sumber vocabulary kategori untuk mode http')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=DEFAULT_BATCH_SIZES)
+    parser.add_argument('--format', choices=('json', 'arrow', 'parquet'), default='json')
+    parser.add_argument('--anomaly-rate', type=float, default=0.01)
+    parser.add_argument('--cardinality', nargs='*', default=[],
+                        help='Cardinality per fitur, mis. user_id=500 merchant=20')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='Tulis hasil run ini ke file JSON')
+    parser.add_argument('--baseline', default=None, help='File baseline JSON untuk cek regresi')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='Gabungkan hasil run ini ke file --baseline alih-alih membandingkan')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Regresi relatif maksimum latency p50 / throughput')
+    parser.add_argument('--rss-tolerance', type=float, default=DEFAULT_RSS_TOLERANCE)
+    args = parser.parse_args()
+
+    cardinalities = parse_cardinalities(args.cardinality)
+    target = InProcessTarget() if args.mode == 'inprocess' else HttpTarget(args.url, args.model_dir)
+
+    results = {}
+    print(f"{'batch':>8} {'req':>5} {'rows/s':>11} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'RSS MB':>8}")
+    for batch_size in args.batch_sizes:
+        result = run_batch_size(target, batch_size, args.format, args.anomaly_rate,
+                                cardinalities, args.seed)
+        results[result_key(result)] = result
+        total = result['latency_ms']['total']
+        print(f"{batch_size:>8} {result['requests']:>5} {result['throughput_rows_per_s']:>11.0f} "
+              f"{total['p50']:>10.2f} {total['p95']:>10.2f} {total['p99']:>10.2f} "
+              f"{result['peak_rss_mb'] if result['peak_rss_mb'] is not None else '-':>8}")
+
+    report = {
+        'meta': {'python': platform.python_version(), 'machine': platform.machine(),
+                 'cpu_count': os.cpu_count(), 'created': time.strftime('%Y-%m-%dT%H:%M:%S')},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if not args.baseline:
+        return 0
+    if args.update_baseline:
+        baseline = {'results': {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline['meta'] = report['meta']
+        baseline.setdefault('results', {}).update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline diperbarui: {args.baseline}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance, args.rss_tolerance)
+    for message in regressions:
+        print(f"REGRESI {message}")
+    if regressions:
+        return 1
+    print(f"Tidak ada regresi terhadap {args.baseline} (toleransi {args.tolerance * 100:.0f}%)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+# =========================
+# Generator Transaksi Sintetis
+# =========================
+# Transaksi dengan skema yang sama seperti input train.py / /predict
+# (amount, hour, user_id, transaction_type, channel, merchant,
+# device_type, location), cardinality per fitur yang bisa diatur, dan
+# sebagian baris anomali (amount jauh lebih besar di jam dini hari).
+# Nilai kategori diambil dari vocabulary model jika tersedia sehingga
+# skor realistis; cardinality di atas vocabulary menambah kategori asing.
+# Jalankan dari folder model/:
+#   python benchmarks/synthetic.py --rows 100000 --output transaksi.csv
+#   python benchmarks/synthetic.py --rows 100000 --training-schema --output data/sintetis.csv
+import io
+import os
+import sys
+import json
+import argparse
+
+import numpy as np
+import pandas as pd
+
+CATEGORICAL_FEATURES = ['user_id', 'transaction_type', 'channel', 'merchant', 'device_type', 'location']
+DEFAULT_CARDINALITIES = {'user_id': 1000, 'transaction_type': 5, 'channel': 10,
+                         'merchant': 50, 'device_type': 5, 'location': 30}
+DEFAULT_ANOMALY_RATE = 0.01
+# Kebalikan rename kolom di train.prepare_frame
+TRAINING_COLUMNS = {'amount': 'TransactionAmount', 'user_id': 'UserID', 'merchant': 'MerchantName',
+                    'transaction_type': 'TransactionType', 'channel': 'Channel',
+                    'device_type': 'DeviceType', 'location': 'City',
+                    'timestamp': 'Timestamp', 'is_anomaly': 'IsAnomaly'}
+ARROW_STREAM_TYPE = 'application/vnd.apache.arrow.stream'
+
+
+def model_vocabulary(encoder):
+    """{fitur: array kategori} dari FastEncoder model."""
+    return dict(zip(encoder.categorical_features, encoder.categories))
+
+
+def _category_values(feature, cardinality, vocabulary):
+    known = np.asarray(vocabulary.get(feature, []) if vocabulary else [], dtype=object)
+    if cardinality <= len(known):
+        return known[:cardinality]
+    extra = cardinality - len(known)
+    if feature == 'user_id':
+        start = int(max(known, default=0)) + 1
+        unseen = np.arange(start, start + extra)
+    else:
+        unseen = np.asarray([f'{feature}_{i}' for i in range(extra)])
+    return np.concatenate([known, unseen.astype(object)])
+
+
+def generate_transactions(n_rows, seed=0, cardinalities=None, anomaly_rate=DEFAULT_ANOMALY_RATE,
+                          vocabulary=None, start_id=0):
+    """DataFrame transaksi sintetis dengan kolom /predict plus id, timestamp, is_anomaly."""
+    rng = np.random.default_rng(seed)
+    cardinalities = dict(DEFAULT_CARDINALITIES, **(cardinalities or {}))
+    is_anomaly = rng.random(n_rows) < anomaly_rate
+    amount = rng.lognormal(12.5, 0.8, n_rows).round()
+    hour = np.clip(rng.normal(14, 4, n_rows).round(), 0, 23).astype(np.int64)
+    n_anomalies = int(is_anomaly.sum())
+    amount[is_anomaly] *= rng.uniform(20, 100, n_anomalies).round()
+    hour[is_anomaly] = rng.integers(0, 5, n_anomalies)
+    seconds = rng.integers(0, 3600, n_rows)
+    timestamp = (pd.Timestamp('2025-06-01') + pd.to_timedelta(rng.integers(0, 30, n_rows), unit='D')
+                 + pd.to_timedelta(hour * 3600 + seconds, unit='s'))
+
+    data = {'id': np.arange(start_id, start_id + n_rows).astype(str),
+            'timestamp': timestamp.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'amount': amount, 'hour': hour}
+    for feature in CATEGORICAL_FEATURES:
+        values = _category_values(feature, int(cardinalities[feature]), vocabulary)
+        data[feature] = values[rng.integers(0, len(values), n_rows)]
+    data['user_id'] = data['user_id'].astype(np.int64)
+    data['is_anomaly'] = is_anomaly.astype(np.int64)
+    return pd.DataFrame(data)
+
+
+def to_training_schema(df):
+    """Rename kolom ke skema CSV mentah yang dibaca train.py."""
+    return df.drop(columns=['hour']).rename(columns=TRAINING_COLUMNS)
+
+
+def encode_request(df, fmt='json'):
+    """Body /predict untuk satu format. Return (bytes, content type, accept)."""
+    columns = [c for c in df.columns if c != 'is_anomaly']
+    if fmt == 'json':
+        body = json.dumps({'transactions': df[columns].to_dict('records')}).encode()
+        return body, 'application/json', 'application/json'
+    import pyarrow as pa
+    import pyarrow.ipc  # noqa: F401
+    import pyarrow.parquet  # noqa: F401
+
+    table = pa.Table.from_pandas(df[columns], preserve_index=False)
+    if fmt == 'arrow':
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes(), ARROW_STREAM_TYPE, ARROW_STREAM_TYPE
+    if fmt == 'parquet':
+        buffer = io.BytesIO()
+        pa.parquet.write_table(table, buffer)
+        return buffer.getvalue(), 'application/vnd.apache.parquet', ARROW_STREAM_TYPE
+    raise ValueError(f"Format body tidak dikenal: {fmt}")
+
+
+def parse_cardinalities(items):
+    """['user_id=500', 'merchant=20'] -> {'user_id': 500, 'merchant': 20}."""
+    result = {}
+    for item in items or []:
+        feature, _, value = item.partition('=')
+        if feature not in CATEGORICAL_FEATURES or not value.isdigit() or int(value) < 1:
+            raise ValueError(
+                f"Cardinality tidak valid: {item!r} (format fitur=N, fitur: {CATEGORICAL_FEATURES})")
+        result[feature] = int(value)
+    return result
+
+
+def load_vocabulary(model_dir):
+    """Vocabulary dari model di model_dir, atau None jika model tidak bisa dimuat."""
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from registry import load_bundle
+    try:
+        return model_vocabulary(load_bundle(model_dir).encoder)
+    except Exception as e:
+        print(f"Vocabulary model tidak tersedia ({e}); memakai kategori sintetis", file=sys.stderr)
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate transaksi sintetis")
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--anomaly-rate', type=float, default=DEFAULT_ANOMALY_RATE)
+    parser.add_argument('--cardinality', nargs='*', default=[],
+                        help='Cardinality per fitur, mis. user_id=500 merchant=20')
+    parser.add_argument('--model-dir', default=None,
+                        help='Ambil kategori dari vocabulary model ini (default: kategori sintetis)')
+    parser.add_argument('--training-schema', action='store_true',
+                        help='Tulis kolom mentah seperti data training (TransactionAmount, UserID, ...)')
+    parser.add_argument('--output', required=True, help='File output .csv atau .parquet')
+    args = parser.parse_args()
+
+    vocabulary = load_vocabulary(args.model_dir) if args.model_dir else None
+    df = generate_transactions(args.rows, args.seed, parse_cardinalities(args.cardinality),
+                               args.anomaly_rate, vocabulary)
+    if args.training_schema:
+        df = to_training_schema(df)
+    if args.output.endswith('.parquet'):
+        df.to_parquet(args.output, index=False)
+    else:
+        df.to_csv(args.output, index=False)
+    print(f"{len(df)} transaksi ditulis ke {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+# =========================
+# Fast Feature Encoder (serve-time)
+# =========================
+# Dikompilasi dari ColumnTransformer hasil train.py (StandardScaler +
+# OneHotEncoder dense). Kategori dipetakan ke index kolom lewat hash table
+# yang dibangun sekali (pandas Index), scaling numerik dihitung secara
+# vektor, lalu hasilnya ditulis langsung ke buffer float32. Hasilnya identik
+# bit-per-bit dengan preprocessor.transform(...).astype(np.float32).
+import os
+import logging
+
+import numpy as np
+import pandas as pd
+
+ENCODERS = ('fast', 'sklearn')
+DEFAULT_ENCODER = 'fast'
+# Di bawah ukuran ini lookup dict Python lebih murah dari overhead pandas Index
+SMALL_BATCH_ROWS = 256
+
+
+class UnsupportedPreprocessorError(ValueError):
+    """Preprocessor tidak bisa dikompilasi menjadi FastEncoder."""
+
+
+class FastEncoder:
+    """Encoder StandardScaler + OneHotEncoder tanpa overhead ColumnTransformer."""
+
+    def __init__(self, numeric_features, mean, scale, categorical_features, categories,
+                 feature_names):
+        self.numeric_features = list(numeric_features)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.categorical_features = list(categorical_features)
+        self.categories = [np.asarray(c) for c in categories]
+        self.feature_names = list(feature_names)
+        # Hash table kategori -> posisi, dibangun sekali saat kompilasi:
+        # dict untuk batch kecil, pandas Index (hash table C) untuk batch besar
+        self._lookups = [pd.Index(c) for c in self.categories]
+        self._tables = [{value: i for i, value in enumerate(c.tolist())}
+                        for c in self.categories]
+        # Posisi kategori NaN dan None per fitur. OneHotEncoder mencocokkan semua
+        # NaN float ke kategori NaN tetapi None hanya ke kategori None, sedangkan
+        # dict (identitas objek NaN) dan pandas Index (None == NaN) tidak
+        self._nan = [next((i for i, value in enumerate(c.tolist())
+                           if value is not None and pd.isna(value)), -1)
+                     for c in self.categories]
+        self._none = [table.get(None, -1) for table in self._tables]
+        sizes = [len(c) for c in self.categories]
+        self._offsets = len(self.numeric_features) + \
+            np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+        self.width = len(self.numeric_features) + int(sum(sizes))
+
+    @classmethod
+    def from_column_transformer(cls, preprocessor):
+        """Kompilasi ColumnTransformer [('num', StandardScaler), ('cat', OneHotEncoder)]."""
+        numeric = categorical = None
+        for name, transformer, columns in preprocessor.transformers_:
+            if name == 'remainder':
+                if transformer != 'drop':
+                    raise UnsupportedPreprocessorError(
+                        "Remainder selain 'drop' tidak didukung")
+                continue
+            kind = type(transformer).__name__
+            if kind == 'StandardScaler' and numeric is None:
+                numeric = (list(columns), transformer)
+            elif kind == 'OneHotEncoder' and categorical is None:
+                categorical = (list(columns), transformer)
+            else:
+                raise UnsupportedPreprocessorError(
+                    f"Transformer tidak didukung: {name} ({kind})")
+        if numeric is None or categorical is None:
+            raise UnsupportedPreprocessorError(
+                "Preprocessor harus berisi StandardScaler dan OneHotEncoder")
+        if [t[0] for t in preprocessor.transformers_ if t[0] != 'remainder'] != ['num', 'cat']:
+            raise UnsupportedPreprocessorError(
+                "Urutan transformer harus num lalu cat")
+
+        numeric_features, scaler = numeric
+        n_numeric = len(numeric_features)
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(n_numeric)
+        scale = scaler.scale_ if scaler.with_std else np.ones(n_numeric)
+
+        categorical_features, onehot = categorical
+        if getattr(onehot, 'drop_idx_', None) is not None:
+            raise UnsupportedPreprocessorError(
+                "OneHotEncoder dengan drop tidak didukung")
+        if any(c is not None for c in getattr(onehot, 'infrequent_categories_', None) or []):
+            raise UnsupportedPreprocessorError(
+                "OneHotEncoder dengan infrequent categories tidak didukung")
+        if onehot.handle_unknown != 'ignore':
+            raise UnsupportedPreprocessorError(
+                "OneHotEncoder harus memakai handle_unknown='ignore'")
+
+        return cls(numeric_features, mean, scale, categorical_features,
+                   onehot.categories_, preprocessor.get_feature_names_out())
+
+    @property
+    def input_features(self):
+        return self.numeric_features + self.categorical_features
+
+    def encode_numeric(self, df):
+        """Scaling numerik dalam float64 (sama dengan StandardScaler.transform)."""
+        values = np.empty((len(df), len(self.numeric_features)), dtype=np.float64)
+        for j, feature in enumerate(self.numeric_features):
+            values[:, j] = df[feature].to_numpy(dtype=np.float64)
+        values -= self.mean
+        values /= self.scale
+        return values
+
+    def encode_categories(self, df):
+        """Index kolom one-hot per fitur kategorikal, -1 untuk kategori tak dikenal."""
+        codes = np.empty((len(df), len(self.categorical_features)), dtype=np.int64)
+        small = len(df) <= SMALL_BATCH_ROWS
+        for j, feature in enumerate(self.categorical_features):
+            values = df[feature].to_numpy()
+            if small:
+                table = self._tables[j]
+                positions = np.fromiter((table.get(v, -1) for v in values.tolist()),
+                                        dtype=np.int64, count=len(values))
+            else:
+                positions = self._lookups[j].get_indexer(values)
+            missing = pd.isna(values)
+            if missing.any():
+                positions[missing] = [self._none[j] if value is None else self._nan[j]
+                                      for value in values[missing].tolist()]
+            codes[:, j] = np.where(
+                positions >= 0, positions + self._offsets[j], -1)
+        return codes
+
+    def encode(self, df):
+        """Bentuk ringkas input model: (numerik float64 ter-scale, index kolom one-hot)."""
+        return self.encode_numeric(df), self.encode_categories(df)
+
+    def expand(self, numeric, codes, out=None):
+        """Ubah bentuk ringkas hasil encode() ke matrix float32 (n, width)."""
+        n = len(numeric)
+        if out is None:
+            out = np.zeros((n, self.width), dtype=np.float32)
+        else:
+            if out.shape != (n, self.width) or out.dtype != np.float32:
+                raise ValueError(
+                    f"Buffer harus float32 dengan shape {(n, self.width)}")
+            out.fill(0)
+        out[:, :len(self.numeric_features)] = numeric
+        # Scatter one-hot lewat index datar (baris * width + kolom)
+        flat = codes + (np.arange(n, dtype=np.int64) * self.width)[:, None]
+        out.reshape(-1)[flat[codes >= 0]] = 1.0
+        return out
+
+    def transform(self, df, out=None):
+        """Encode DataFrame ke matrix float32 (n, width). `out` boleh buffer yang dipakai ulang."""
+        return self.expand(*self.encode(df), out=out)
+
+    def same_encoding(self, other):
+        """True jika `other` menghasilkan matrix yang identik untuk input yang sama."""
+        if other is self:
+            return True
+        return (other is not None
+                and self.numeric_features == other.numeric_features
+                and self.categorical_features == other.categorical_features
+                and np.array_equal(self.mean, other.mean)
+                and np.array_equal(self.scale, other.scale)
+                and len(self.categories) == len(other.categories)
+                and all(len(a) == len(b) and np.array_equal(a, b)
+                        for a, b in zip(self.categories, other.categories)))
+
+
+def probe_frame(encoder, n_rows=1024, seed=0):
+    """DataFrame sintetis yang mencakup semua kategori (plus kategori asing)."""
+    rng = np.random.default_rng(seed)
+    data = {feature: rng.normal(loc=mean, scale=scale, size=n_rows)
+            for feature, mean, scale in zip(encoder.numeric_features, encoder.mean, encoder.scale)}
+    for feature, categories in zip(encoder.categorical_features, encoder.categories):
+        values = list(categories[np.arange(n_rows) % len(categories)])
+        values[-1] = '__unknown__' if categories.dtype.kind == 'O' else -1
+        data[feature] = pd.Series(values, dtype=categories.dtype)
+    return pd.DataFrame(data)
+
+
+def verify_encoder(encoder, preprocessor, df=None):
+    """Pastikan hasil FastEncoder identik dengan preprocessor.transform."""
+    df = probe_frame(encoder) if df is None else df
+    # Cek jalur batch besar (pandas Index) dan batch kecil (dict)
+    for frame in (df, df.iloc[:16]):
+        expected = np.asarray(preprocessor.transform(
+            frame[encoder.input_features])).astype(np.float32)
+        actual = encoder.transform(frame)
+        if expected.shape != actual.shape or not np.array_equal(expected, actual):
+            raise ValueError("Hasil FastEncoder berbeda dari preprocessor.transform")
+
+
+def create_encoder(preprocessor, name=None, verify=True):
+    """Buat FastEncoder sesuai env FEATURE_ENCODER; None berarti pakai sklearn."""
+    name = (name or os.environ.get('FEATURE_ENCODER', DEFAULT_ENCODER)).lower()
+    if name not in ENCODERS:
+        raise ValueError(
+            f"FEATURE_ENCODER tidak dikenal: {name}. Pilihan: {list(ENCODERS)}")
+    if name == 'sklearn':
+        return None
+    try:
+        encoder = FastEncoder.from_column_transformer(preprocessor)
+        if verify:
+            verify_encoder(encoder, preprocessor)
+        logging.info(f"FastEncoder aktif ({encoder.width} fitur)")
+        return encoder
+    except ValueError as e:
+        logging.warning(
+            f"Gagal menggunakan FastEncoder ({e}), kembali ke preprocessor sklearn.")
+        return None
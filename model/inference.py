@@ -0,0 +1,205 @@
+# =========================
+# Inference Backends untuk AutoEncoder
+# =========================
+# Backend "keras" memanggil model Keras apa adanya (referensi).
+# Backend "numpy" mengkompilasi stack Dense dari train.py menjadi matmul
+# float32 murni saat load: BatchNormalization dilipat ke Dense sebelumnya,
+# Dropout dibuang, dan aktivasi (ReLU/LeakyReLU) diterapkan in-place.
+# Ini menghindari overhead dispatch TensorFlow pada setiap request.
+import os
+import logging
+from dataclasses import dataclass
+
+import numpy as np
+
+BACKENDS = ('numpy', 'keras')
+DEFAULT_BACKEND = 'numpy'
+DEFAULT_VERIFY_TOLERANCE = 1e-4
+
+
+class UnsupportedLayerError(ValueError):
+    """Layer pada model Keras tidak bisa dikompilasi ke backend NumPy."""
+
+
+@dataclass
+class DenseLayer:
+    kernel: np.ndarray
+    bias: np.ndarray
+    activation: str = 'linear'
+    negative_slope: float = 0.0
+
+
+class KerasBackend:
+    """Backend referensi: memanggil model Keras secara langsung."""
+
+    name = 'keras'
+
+    def __init__(self, model):
+        self.model = model
+
+    def reconstruct(self, X):
+        return np.asarray(self.model.predict(X, verbose=0), dtype=np.float32)
+
+    def reconstruction_errors(self, X):
+        return np.mean(np.square(X - self.reconstruct(X)), axis=1)
+
+    def squared_errors(self, X):
+        return np.square(X - self.reconstruct(X))
+
+
+class NumpyBackend:
+    """Forward pass AutoEncoder dengan NumPy float32 murni."""
+
+    name = 'numpy'
+
+    def __init__(self, layers):
+        if not layers:
+            raise ValueError("NumpyBackend membutuhkan minimal satu Dense layer")
+        self.layers = layers
+        self.input_dim = layers[0].kernel.shape[0]
+
+    @classmethod
+    def from_keras(cls, model):
+        return cls(compile_dense_stack(model))
+
+    def reconstruct(self, X):
+        h = np.asarray(X, dtype=np.float32)
+        for layer in self.layers:
+            h = h @ layer.kernel
+            h += layer.bias
+            if layer.activation == 'relu':
+                np.maximum(h, 0, out=h)
+            elif layer.activation == 'leaky_relu':
+                np.maximum(h, h * layer.negative_slope, out=h)
+        return h
+
+    def reconstruction_errors(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        diff = self.reconstruct(X)
+        np.subtract(X, diff, out=diff)
+        np.square(diff, out=diff)
+        return diff.mean(axis=1)
+
+    def squared_errors(self, X):
+        """Squared error per kolom (n, width); rata-ratanya per baris = reconstruction_errors."""
+        X = np.asarray(X, dtype=np.float32)
+        diff = self.reconstruct(X)
+        np.subtract(X, diff, out=diff)
+        np.square(diff, out=diff)
+        return diff
+
+
+# =========================
+# Kompilasi Model Keras -> Dense Stack
+# =========================
+def _activation_name(activation):
+    name = getattr(activation, '__name__', str(activation))
+    if name in ('linear', 'relu'):
+        return name
+    raise UnsupportedLayerError(f"Aktivasi tidak didukung: {name}")
+
+
+def _fold_batch_norm(dense, layer):
+    """Lipat BatchNormalization (mode inference) ke Dense sebelumnya."""
+    variance = np.asarray(layer.moving_variance, dtype=np.float64)
+    mean = np.asarray(layer.moving_mean, dtype=np.float64)
+    gamma = (np.asarray(layer.gamma, dtype=np.float64)
+             if layer.gamma is not None else np.ones_like(variance))
+    beta = (np.asarray(layer.beta, dtype=np.float64)
+            if layer.beta is not None else np.zeros_like(variance))
+    scale = gamma / np.sqrt(variance + layer.epsilon)
+    dense.kernel = (dense.kernel.astype(np.float64) * scale).astype(np.float32)
+    dense.bias = ((dense.bias.astype(np.float64) - mean)
+                  * scale + beta).astype(np.float32)
+
+
+def compile_dense_stack(model):
+    """Ubah AutoEncoder sekuensial dari train.py menjadi list DenseLayer."""
+    layers = []
+    for layer in model.layers:
+        kind = type(layer).__name__
+        if kind in ('InputLayer', 'Dropout'):
+            continue
+        if kind == 'Dense':
+            weights = layer.get_weights()
+            kernel = weights[0]
+            bias = weights[1] if layer.use_bias else np.zeros(kernel.shape[1])
+            layers.append(DenseLayer(
+                kernel=np.ascontiguousarray(kernel, dtype=np.float32),
+                bias=np.asarray(bias, dtype=np.float32),
+                activation=_activation_name(layer.activation)))
+            continue
+
+        # Layer berikut hanya valid setelah Dense tanpa aktivasi non-linear
+        if not layers or layers[-1].activation != 'linear':
+            raise UnsupportedLayerError(
+                f"Layer {layer.name} ({kind}) tidak mengikuti Dense linear")
+        if kind == 'BatchNormalization':
+            if layer.axis not in (-1, [-1], 1, [1]):
+                raise UnsupportedLayerError(
+                    f"BatchNormalization axis tidak didukung: {layer.axis}")
+            _fold_batch_norm(layers[-1], layer)
+        elif kind == 'LeakyReLU':
+            layers[-1].activation = 'leaky_relu'
+            layers[-1].negative_slope = float(layer.negative_slope)
+        elif kind == 'ReLU':
+            custom = (getattr(layer, 'negative_slope', 0.0), getattr(layer, 'threshold', 0.0),
+                      getattr(layer, 'max_value', None))
+            if custom != (0.0, 0.0, None):
+                raise UnsupportedLayerError(
+                    f"ReLU dengan parameter custom tidak didukung: {layer.name}")
+            layers[-1].activation = 'relu'
+        elif kind == 'Activation':
+            layers[-1].activation = _activation_name(layer.activation)
+        else:
+            raise UnsupportedLayerError(
+                f"Layer tidak didukung: {layer.name} ({kind})")
+    return layers
+
+
+def verify_backend(backend, reference, input_dim, tolerance=DEFAULT_VERIFY_TOLERANCE,
+                   n_samples=64, seed=0):
+    """Bandingkan skor backend dengan referensi Keras pada batch sintetis.
+
+    Return selisih relatif maksimum; raise ValueError jika melewati toleransi.
+    """
+    rng = np.random.default_rng(seed)
+    X = rng.standard_normal((n_samples, input_dim)).astype(np.float32)
+    expected = reference.reconstruction_errors(X)
+    actual = backend.reconstruction_errors(X)
+    max_rel_diff = float(np.max(np.abs(actual - expected) /
+                                np.maximum(np.abs(expected), 1e-12)))
+    if not np.allclose(actual, expected, rtol=tolerance, atol=tolerance * 1e-2):
+        raise ValueError(
+            f"Skor backend {backend.name} berbeda dari Keras (max rel diff {max_rel_diff:.2e} > {tolerance:.0e})")
+    return max_rel_diff
+
+
+def create_backend(model, name=None, verify=True):
+    """Buat inference backend sesuai nama atau env INFERENCE_BACKEND.
+
+    Backend NumPy diverifikasi terhadap Keras; jika kompilasi atau verifikasi
+    gagal, otomatis kembali ke backend Keras.
+    """
+    name = (name or os.environ.get('INFERENCE_BACKEND', DEFAULT_BACKEND)).lower()
+    if name not in BACKENDS:
+        raise ValueError(
+            f"INFERENCE_BACKEND tidak dikenal: {name}. Pilihan: {list(BACKENDS)}")
+    reference = KerasBackend(model)
+    if name == 'keras':
+        return reference
+
+    try:
+        backend = NumpyBackend.from_keras(model)
+        if verify:
+            tolerance = float(os.environ.get(
+                'INFERENCE_VERIFY_TOLERANCE', DEFAULT_VERIFY_TOLERANCE))
+            diff = verify_backend(backend, reference,
+                                  backend.input_dim, tolerance)
+            logging.info(
+                f"NumPy backend terverifikasi terhadap Keras (max rel diff {diff:.2e})")
+        return backend
+    except (UnsupportedLayerError, ValueError) as e:
+        logging.warning(
+            f"Gagal menggunakan NumPy backend ({e}), kembali ke Keras backend.")
+        return reference
@@ -0,0 +1,367 @@
+# =========================
+# Job Scoring Asinkron (POST /jobs)
+# =========================
+# Batch besar diskor di background per chunk oleh worker pool berukuran
+# tetap, sehingga klien tidak perlu menahan satu request HTTP sampai
+# selesai. Status dan hasil tiap chunk ditulis ke direktori job di disk:
+# semua worker proses (mode serve) bisa melayani GET status/hasil,
+# memory tidak tumbuh dengan ukuran hasil, dan pembatalan cukup dengan
+# file penanda yang dicek runner di antara chunk. Antrean dibatasi
+# (penuh = 429) dan hasil job yang sudah selesai dihapus setelah TTL.
+# Batas berlaku lintas proses: job hanya berjalan setelah memegang salah
+# satu dari `workers` slot (flock di direktori job), jadi di mode serve
+# dengan N worker proses tetap paling banyak `workers` job yang berjalan.
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows: slot hanya dibatasi per proses
+    fcntl = None
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_QUEUED = 8
+DEFAULT_TTL_SECONDS = 3600
+ACTIVE_STATES = ('queued', 'running')
+TERMINAL_STATES = ('succeeded', 'failed', 'cancelled')
+STATUS_FILENAME = 'status.json'
+CANCEL_FILENAME = 'cancel'
+CHUNK_PATTERN = 'chunk_{:06d}.json'
+SLOTS_DIRNAME = '.slots'
+SUBMIT_LOCK_FILENAME = '.submit.lock'
+SLOT_POLL_SECONDS = 0.1
+# Job kedaluwarsa dihapus paling sering sekali per interval ini (saat submit/status/stats)
+PURGE_INTERVAL_SECONDS = 60.0
+
+
+class JobQueueFull(RuntimeError):
+    """Jumlah job aktif sudah mencapai batas worker + antrean."""
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _write_json(path, data):
+    """Tulis JSON secara atomik (tmp + rename) agar pembaca tidak melihat file setengah jadi."""
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class _FileLock:
+    """Lock eksklusif lintas proses (flock); dilepas otomatis jika proses mati."""
+
+    def __init__(self, path):
+        self.path = path
+        self._handle = None
+
+    def acquire(self, blocking=True):
+        handle = open(self.path, 'a')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            handle.close()
+            return False
+        self._handle = handle
+        return True
+
+    def release(self):
+        fcntl.flock(self._handle, fcntl.LOCK_UN)
+        self._handle.close()
+        self._handle = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobContext:
+    """Handle yang diberikan ke runner: cek pembatalan dan simpan hasil per chunk."""
+
+    def __init__(self, manager, job_id):
+        self._manager = manager
+        self.job_id = job_id
+        self._started = time.perf_counter()
+        self._status = manager._read_status(job_id)
+
+    def cancelled(self):
+        return os.path.exists(self._manager._path(self.job_id, CANCEL_FILENAME))
+
+    def check_cancelled(self):
+        if self.cancelled():
+            raise JobCancelled()
+
+    def set_total(self, total):
+        self._status['total'] = int(total)
+        self._manager._write_status(self.job_id, self._status)
+
+    def add_chunk(self, columns, count, anomalies, **extra):
+        """Simpan hasil satu chunk lalu perbarui progress (hasil parsial langsung terbaca)."""
+        status = self._status
+        index = len(status['chunk_rows'])
+        _write_json(self._manager._path(self.job_id, CHUNK_PATTERN.format(index)),
+                    {'count': count, 'columns': columns})
+        status['chunk_rows'].append(count)
+        status['processed'] += count
+        status['anomalies'] += anomalies
+        elapsed = time.perf_counter() - self._started
+        status['rows_per_second'] = round(status['processed'] / elapsed, 1) if elapsed > 0 else None
+        status.update(extra)
+        self._manager._write_status(self.job_id, status)
+
+
+class JobManager:
+    def __init__(self, directory, workers=DEFAULT_WORKERS, max_queued=DEFAULT_MAX_QUEUED,
+                 ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.directory = directory
+        self.workers = max(1, int(workers))
+        self.max_queued = max(0, int(max_queued))
+        self.ttl_seconds = float(ttl_seconds)
+        self.purge_interval = min(self.ttl_seconds, PURGE_INTERVAL_SECONDS)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        os.makedirs(os.path.join(directory, SLOTS_DIRNAME), exist_ok=True)
+        self._local_slots = threading.BoundedSemaphore(self.workers)
+
+    def after_fork(self):
+        """Panggil di proses anak: thread executor tidak ikut ter-fork."""
+        self._executor = None
+        self._lock = threading.Lock()
+        self._local_slots = threading.BoundedSemaphore(self.workers)
+
+    def _submit_lock(self):
+        if fcntl is None:
+            return self._lock
+        return _FileLock(os.path.join(self.directory, SUBMIT_LOCK_FILENAME))
+
+    def _acquire_slot(self, job_id):
+        """Tunggu slot eksekusi global. Return slot, atau None jika job dibatalkan saat menunggu."""
+        while True:
+            if fcntl is None:
+                if self._local_slots.acquire(timeout=SLOT_POLL_SECONDS):
+                    return self._local_slots
+            else:
+                for index in range(self.workers):
+                    slot = _FileLock(os.path.join(self.directory, SLOTS_DIRNAME, f'slot_{index}.lock'))
+                    if slot.acquire(blocking=False):
+                        return slot
+                time.sleep(SLOT_POLL_SECONDS)
+            if os.path.exists(self._path(job_id, CANCEL_FILENAME)):
+                return None
+
+    # --- Penyimpanan
+    def _path(self, job_id, *parts):
+        return os.path.join(self.directory, job_id, *parts)
+
+    def _valid_id(self, job_id):
+        return len(job_id) == 32 and all(c in '0123456789abcdef' for c in job_id)
+
+    def _read_status(self, job_id):
+        return _read_json(self._path(job_id, STATUS_FILENAME))
+
+    def _write_status(self, job_id, status):
+        _write_json(self._path(job_id, STATUS_FILENAME), status)
+
+    def _job_ids(self):
+        try:
+            return [name for name in os.listdir(self.directory) if self._valid_id(name)]
+        except OSError:
+            return []
+
+    def _refresh(self, job_id, status):
+        """Tandai job aktif yang prosesnya sudah mati sebagai gagal."""
+        if status is not None and status['state'] in ACTIVE_STATES and \
+                status['pid'] != os.getpid() and not _pid_alive(status['pid']):
+            status.update(state='failed', error='Worker yang menjalankan job berhenti',
+                          finished_at=time.time())
+            self._write_status(job_id, status)
+        return status
+
+    def purge_expired(self):
+        now = time.time()
+        self._last_purge = now
+        for job_id in self._job_ids():
+            status = self._read_status(job_id)
+            if status is not None and status['state'] in TERMINAL_STATES and \
+                    now - status['finished_at'] > self.ttl_seconds:
+                shutil.rmtree(self._path(job_id), ignore_errors=True)
+
+    def _maybe_purge(self):
+        if time.time() - self._last_purge >= self.purge_interval:
+            self.purge_expired()
+
+    def active_count(self):
+        statuses = (self._refresh(job_id, self._read_status(job_id)) for job_id in self._job_ids())
+        return sum(1 for status in statuses if status is not None and status['state'] in ACTIVE_STATES)
+
+    # --- Siklus hidup job
+    def submit(self, runner, total=None, meta=None):
+        """Daftarkan job dan jadwalkan `runner(JobContext)`. Raise JobQueueFull jika penuh.
+
+        Batas `workers + max_queued` job aktif dihitung dari semua proses yang
+        berbagi direktori job, sama seperti slot eksekusi.
+        """
+        with self._lock, self._submit_lock():
+            self._maybe_purge()
+            if self.active_count() >= self.workers + self.max_queued:
+                raise JobQueueFull(
+                    f'Antrean job penuh ({self.workers} worker + {self.max_queued} antrean).')
+            job_id = uuid.uuid4().hex
+            os.makedirs(self._path(job_id))
+            status = {
+                'id': job_id, 'state': 'queued', 'pid': os.getpid(),
+                'created_at': time.time(), 'started_at': None, 'finished_at': None,
+                'total': total, 'processed': 0, 'anomalies': 0, 'chunk_rows': [],
+                'rows_per_second': None, 'error': None, 'meta': meta or {},
+            }
+            self._write_status(job_id, status)
+            if self._executor is None:
+                # Satu thread per job aktif yang mungkin: job antre menunggu slot global
+                # (bukan antrean executor) sehingga pembatalannya langsung terlihat
+                self._executor = ThreadPoolExecutor(max_workers=self.workers + self.max_queued,
+                                                    thread_name_prefix='job')
+            self._executor.submit(self._run, job_id, runner)
+        return self.status(job_id)
+
+    def _run(self, job_id, runner):
+        slot = self._acquire_slot(job_id)
+        try:
+            self._run_in_slot(job_id, runner, cancelled=slot is None)
+        finally:
+            if slot is not None:
+                slot.release()
+
+    def _run_in_slot(self, job_id, runner, cancelled):
+        status = self._read_status(job_id)
+        if status is None:
+            return
+        if cancelled or os.path.exists(self._path(job_id, CANCEL_FILENAME)):
+            status.update(state='cancelled', finished_at=time.time())
+            self._write_status(job_id, status)
+            return
+        status.update(state='running', started_at=time.time())
+        self._write_status(job_id, status)
+
+        context = JobContext(self, job_id)
+        try:
+            runner(context)
+            state, error = 'succeeded', None
+        except JobCancelled:
+            state, error = 'cancelled', None
+        except Exception as e:
+            logging.error(f"Job {job_id} gagal: {e}")
+            state, error = 'failed', str(e)
+        status = context._status
+        status.update(state=state, error=error, finished_at=time.time())
+        self._write_status(job_id, status)
+        logging.info(f"Job {job_id} {state}: {status['processed']} baris")
+
+    def status(self, job_id):
+        """Status publik job (tanpa detail internal), None jika tidak ada / kedaluwarsa."""
+        if not self._valid_id(job_id):
+            return None
+        self._maybe_purge()
+        status = self._refresh(job_id, self._read_status(job_id))
+        if status is None:
+            return None
+        public = {key: value for key, value in status.items() if key not in ('pid', 'chunk_rows')}
+        public['chunks'] = len(status['chunk_rows'])
+        public['progress'] = (round(status['processed'] / status['total'], 4)
+                              if status['total'] else None)
+        public['cancel_requested'] = os.path.exists(self._path(job_id, CANCEL_FILENAME))
+        if status['state'] in TERMINAL_STATES:
+            public['expires_at'] = status['finished_at'] + self.ttl_seconds
+        return public
+
+    def cancel(self, job_id):
+        """Minta pembatalan job aktif (berlaku sebelum chunk berikutnya)."""
+        status = self.status(job_id)
+        if status is not None and status['state'] in ACTIVE_STATES:
+            open(self._path(job_id, CANCEL_FILENAME), 'w').close()
+            status['cancel_requested'] = True
+        return status
+
+    def delete(self, job_id):
+        """Hapus hasil job yang sudah selesai. Return False jika job masih aktif / tidak ada."""
+        status = self.status(job_id)
+        if status is None or status['state'] not in TERMINAL_STATES:
+            return False
+        shutil.rmtree(self._path(job_id), ignore_errors=True)
+        return True
+
+    # --- Hasil
+    def read_results(self, job_id, offset, limit):
+        """Kolom hasil baris [offset, offset + limit) dari chunk yang sudah selesai."""
+        status = self._read_status(job_id)
+        if status is None:
+            return None
+        columns = None
+        start = 0
+        for index, rows in enumerate(status['chunk_rows']):
+            end = start + rows
+            if end > offset and start < offset + limit:
+                chunk = _read_json(self._path(job_id, CHUNK_PATTERN.format(index)))
+                lo, hi = max(offset - start, 0), min(offset + limit - start, rows)
+                if columns is None:
+                    columns = {name: [] for name in chunk['columns']}
+                for name, values in chunk['columns'].items():
+                    columns[name].extend(values[lo:hi])
+            if end >= offset + limit:
+                break
+            start = end
+        return columns or {}
+
+    def iter_results(self, job_id):
+        """(columns, count) per chunk yang sudah selesai, berurutan."""
+        status = self._read_status(job_id)
+        for index in range(len(status['chunk_rows']) if status else 0):
+            chunk = _read_json(self._path(job_id, CHUNK_PATTERN.format(index)))
+            if chunk is not None:
+                yield chunk['columns'], chunk['count']
+
+    def stats(self):
+        self._maybe_purge()
+        return {'workers': self.workers, 'max_queued': self.max_queued,
+                'active': self.active_count(), 'ttl_seconds': self.ttl_seconds}
+
+
+def create_job_manager():
+    """JobManager dari env JOBS_*; None jika dinonaktifkan."""
+    if os.environ.get('JOBS_ENABLED', '1').lower() in ('0', 'false', 'no'):
+        return None
+    directory = os.environ.get('JOBS_DIR') or os.path.join(tempfile.gettempdir(), 'fraud_jobs')
+    return JobManager(directory,
+                      workers=int(os.environ.get('JOBS_WORKERS', DEFAULT_WORKERS)),
+                      max_queued=int(os.environ.get('JOBS_MAX_QUEUED', DEFAULT_MAX_QUEUED)),
+                      ttl_seconds=float(os.environ.get('JOBS_TTL_SECONDS', DEFAULT_TTL_SECONDS)))
@@ -0,0 +1,198 @@
+# =========================
+# Metrics (Prometheus text format)
+# =========================
+# Registry metrics minimal tanpa dependency tambahan: Counter, Gauge, dan
+# Histogram dengan label, dirender ke format teks Prometheus untuk endpoint
+# /metrics. Semua operasi thread-safe.
+import time
+import threading
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0)
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000,
+                      20000, 50000, 100000, 200000, 500000, 1000000)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"Metric {self.name} membutuhkan label {self.labelnames}, diberikan {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}',
+                 f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            state[1] += 1
+            state[2] += value
+
+    def observe_counts(self, counts, count, value_sum, **labels):
+        """Tambahkan banyak observasi sekaligus: `counts` per bucket (bukan kumulatif).
+
+        Observasi di atas bucket terakhir cukup dihitung di `count`.
+        """
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            for i, n in enumerate(counts):
+                state[0][i] += int(n)
+            state[1] += int(count)
+            state[2] += float(value_sum)
+
+    def totals(self):
+        """{tuple label: (count, sum)} untuk dibaca langsung tanpa render (benchmark)."""
+        with self._lock:
+            return {key: (state[1], state[2]) for key, state in self._values.items()}
+
+    def _render_sample(self, key, state):
+        counts, total, value_sum = state
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            lines.append(
+                f'{self.name}_bucket{_format_labels(self.labelnames, key, ("le", _format_value(float(bound))))} {cumulative}')
+        lines.append(
+            f'{self.name}_bucket{_format_labels(self.labelnames, key, ("le", "+Inf"))} {total}')
+        lines.append(
+            f'{self.name}_count{_format_labels(self.labelnames, key)} {total}')
+        lines.append(
+            f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(value_sum)}')
+        return lines
+
+
+class MetricsRegistry:
+    """Kumpulan metric plus collector callback yang dipanggil saat render."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, callback):
+        """Callback tanpa argumen untuk memperbarui gauge tepat sebelum render."""
+        self._collectors.append(callback)
+
+    def render(self):
+        for callback in self._collectors:
+            callback()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class StageTimer:
+    """Ukur latency per stage pipeline ke satu Histogram berlabel stage."""
+
+    def __init__(self, histogram, **labels):
+        self._histogram = histogram
+        self._labels = labels
+        self.durations = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.durations[name] = self.durations.get(name, 0.0) + elapsed
+            self._histogram.observe(elapsed, stage=name, **self._labels)
+
+    def server_timing(self):
+        """Durasi stage sebagai nilai header Server-Timing (milidetik)."""
+        return ', '.join(f'{name};dur={seconds * 1000:.3f}'
+                         for name, seconds in self.durations.items())
@@ -0,0 +1,337 @@
+# =========================
+# Pipeline Fitur & Threshold
+# =========================
+# Dipakai bersama oleh service (/predict, /predict/stream) dan scoring
+# offline (score.py): kelengkapan dan normalisasi fitur input, transformasi
+# ke matrix model, serta pemilihan static/dynamic threshold per batch.
+import logging
+import itertools
+
+import numpy as np
+import pandas as pd
+
+# Daftar fitur yang digunakan harus sama persis dengan saat training
+REQUIRED_FEATURES = ['amount', 'hour', 'user_id',
+                     'transaction_type', 'channel', 'merchant', 'device_type', 'location']
+NUMERIC_FEATURES = ['amount', 'hour']
+# Jika > 50% transaksi melewati static threshold, pakai dynamic threshold (percentile)
+DYNAMIC_THRESHOLD_TRIGGER_RATE = 0.5
+DYNAMIC_THRESHOLD_PERCENTILE = 95
+# Batch lebih kecil dari ini tidak punya percentile ke-95 yang bermakna
+# (satu baris tidak akan pernah melewati percentile dirinya sendiri)
+DYNAMIC_THRESHOLD_MIN_ROWS = 20
+
+
+def convert_user_id(user_id):
+    """Bersihkan dan konversi user_id ke format numerik jika memungkinkan.
+
+    OneHotEncoder bisa handle string, tapi lebih baik konsisten.
+    """
+    if pd.isna(user_id) or user_id == '' or user_id is None:
+        return 0
+    try:
+        return int(float(str(user_id)))
+    except (ValueError, TypeError):
+        return str(user_id)
+
+
+def _debug_sample(message, values):
+    """Log contoh nilai hanya di level DEBUG (dipanggil per request, bisa berisi user_id)."""
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug(f"{message}: {values.head().tolist()}")
+
+
+def fill_missing_features(df):
+    """Tambahkan field yang hilang dengan nilai default dan bersihkan nilai kosong."""
+    if 'user_id' not in df.columns:
+        df['user_id'] = 0
+        logging.debug("Added default user_id field (0)")
+    if 'hour' not in df.columns:
+        if 'timestamp' in df.columns:
+            try:
+                temp_timestamps = pd.to_datetime(
+                    df['timestamp'], errors='coerce')
+                if temp_timestamps.isna().any():
+                    logging.warning(
+                        "Some timestamps could not be parsed, using default hour for invalid entries")
+                df['hour'] = temp_timestamps.dt.hour.fillna(12).astype(int)
+                _debug_sample("Extracted hour from timestamp. Sample hours", df['hour'])
+            except Exception as e:
+                df['hour'] = 12
+                logging.warning(
+                    f"Could not extract hour from timestamp ({e}), using default value 12")
+        else:
+            df['hour'] = 12
+            logging.debug(
+                "No timestamp field found, added default hour field (12)")
+    else:
+        df['hour'] = pd.to_numeric(
+            df['hour'], errors='coerce').fillna(12).astype(int)
+        df['hour'] = df['hour'].clip(0, 23)
+        _debug_sample("Using provided hour values. Sample hours", df['hour'])
+
+    # Add default values for all required fields if missing
+    if 'transaction_type' not in df.columns:
+        df['transaction_type'] = 'purchase'
+        logging.debug("Added default transaction_type field (purchase)")
+    if 'channel' not in df.columns:
+        df['channel'] = 'mobile'
+        logging.debug("Added default channel field (mobile)")
+    if 'merchant' not in df.columns:
+        df['merchant'] = 'Unknown'
+        logging.debug("Added default merchant field (Unknown)")
+    if 'device_type' not in df.columns:
+        df['device_type'] = 'Android'
+        logging.debug("Added default device_type field (Android)")
+    if 'location' not in df.columns:
+        df['location'] = 'Unknown'
+        logging.debug("Added default location field (Unknown)")
+
+    # Handle missing values untuk field optional
+    df['user_id'] = df['user_id'].fillna('Unknown')
+    df['transaction_type'] = df['transaction_type'].fillna('Unknown')
+    df['channel'] = df['channel'].fillna('Unknown')
+    df['device_type'] = df['device_type'].fillna('Unknown')
+    df['location'] = df['location'].fillna('Unknown')
+
+    df['user_id'] = df['user_id'].apply(convert_user_id)
+    _debug_sample("Processed user_id. Sample values", df['user_id'])
+    return df
+
+
+# Keputusan heuristik skala/mata uang amount (lihat amount_adjustment)
+AMOUNT_SCALE_DOWN = 'scale_down'
+AMOUNT_USD = 'usd'
+AMOUNT_UNCHANGED = 'none'
+USD_TO_IDR_RATE = 16000
+# Baris awal input ber-chunk (stream/jobs) yang menentukan skala amount
+AMOUNT_SAMPLE_ROWS = 10000
+
+
+def amount_adjustment(amount_mean):
+    """Deteksi otomatis skala amount dan mata uang dari rata-rata amount.
+
+    Jika amount sangat besar, lakukan scaling. Jika amount kemungkinan USD,
+    konversi ke IDR. Return AMOUNT_SCALE_DOWN, AMOUNT_USD, atau AMOUNT_UNCHANGED.
+    """
+    adjustment = AMOUNT_UNCHANGED
+    if amount_mean > 2000000:  # If average amount > 2M, likely needs scaling
+        logging.warning(
+            f"Amount values seem very large (mean: {amount_mean:.0f}). This might cause high reconstruction errors.")
+        logging.warning(
+            "Applying automatic scaling: dividing amount by 1000 to match training data scale.")
+        adjustment = AMOUNT_SCALE_DOWN
+    elif amount_mean > 1000000:  # Warning but no scaling for 1M-2M range
+        logging.warning(
+            f"Amount values are large (mean: {amount_mean:.0f}). Monitor for high reconstruction errors.")
+        logging.info(
+            "No automatic scaling applied (amount < 2M threshold).")
+    # Deteksi mata uang berdasarkan range amount
+    if amount_mean < 100000:  # Kemungkinan USD jika rata-rata < 100K
+        logging.warning(
+            f"Amount values appear to be in USD (mean: {amount_mean:.0f}). Converting to IDR.")
+        adjustment = AMOUNT_USD
+    elif amount_mean > 2000000:  # Warning jika > 2M IDR
+        logging.warning(
+            f"Amount values sangat besar (mean: {amount_mean:.0f}). Ini bisa menyebabkan kesalahan rekonstruksi yang tinggi.")
+        logging.info(
+            "Pertimbangkan untuk menyesuaikan threshold deteksi anomali.")
+    return adjustment
+
+
+def normalize_amount(df, adjustment=None):
+    """Terapkan keputusan skala/mata uang amount.
+
+    Tanpa `adjustment` keputusan diambil dari batch ini sendiri (/predict).
+    Input ber-chunk memakai satu keputusan untuk seluruh input (lihat
+    sample_amount_adjustment) agar skor tidak bergantung pada ukuran chunk.
+    """
+    if adjustment is None:
+        adjustment = amount_adjustment(df['amount'].mean())
+    if adjustment == AMOUNT_SCALE_DOWN:
+        df['amount'] = df['amount'] / 1000  # Scale down by 1000x
+        logging.info(
+            f"Applied automatic scaling. New amount mean: {df['amount'].mean():.2f}")
+    elif adjustment == AMOUNT_USD:
+        # Konversi USD ke IDR (kurs sekitar 16.000)
+        df['amount'] = df['amount'] * USD_TO_IDR_RATE
+        logging.info(
+            f"Converted USD to IDR. New amount mean: {df['amount'].mean():.0f} IDR")
+    return df
+
+
+def chunk_amounts(chunk):
+    """Kolom amount satu chunk (DataFrame atau list dict) sebagai Series."""
+    if isinstance(chunk, pd.DataFrame):
+        return chunk['amount'] if 'amount' in chunk.columns else pd.Series(dtype=float)
+    return pd.Series([t.get('amount') if isinstance(t, dict) else None for t in chunk], dtype=object)
+
+
+def sample_amount_adjustment(chunks, sample_rows=AMOUNT_SAMPLE_ROWS):
+    """Putuskan skala amount sekali dari `sample_rows` baris pertama input ber-chunk.
+
+    Chunk yang terbaca untuk sampel di-buffer lalu diteruskan kembali.
+    Return (adjustment, iterator chunk). Keputusan tidak bergantung pada
+    ukuran chunk, dan sama dengan /predict jika input <= sample_rows baris.
+    """
+    iterator = iter(chunks)
+    buffered, amounts, rows = [], [], 0
+    for chunk in iterator:
+        buffered.append(chunk)
+        amounts.append(chunk_amounts(chunk).iloc[:sample_rows - rows])
+        rows += len(chunk)
+        if rows >= sample_rows:
+            break
+    if not buffered:
+        return None, iter(())
+    mean = pd.to_numeric(pd.concat(amounts, ignore_index=True), errors='coerce').mean()
+    return amount_adjustment(mean), itertools.chain(buffered, iterator)
+
+
+def log_input_analysis(df):
+    """Analisis distribusi data asli sebelum preprocessing (debugging)."""
+    logging.info("=== ORIGINAL DATA ANALYSIS ===")
+    for feature in REQUIRED_FEATURES:
+        if feature in NUMERIC_FEATURES:
+            values = df[feature].astype(float)
+            logging.info(
+                f"{feature} - min: {values.min():.2f}, max: {values.max():.2f}, mean: {values.mean():.2f}, std: {values.std():.2f}")
+        else:  # Categorical features
+            unique_vals = df[feature].unique()
+            logging.info(
+                f"{feature} - unique values: {len(unique_vals)}, samples: {list(unique_vals[:5])}")
+
+
+def log_error_analysis(X, errors):
+    """Logging detail hasil preprocessing dan error rekonstruksi (debugging)."""
+    logging.info("=== DEBUGGING ANALYSIS ===")
+    logging.info(f"Input data shape: {X.shape}")
+    logging.info(f"First 5 samples of preprocessed data:\n{X[:5]}")
+    logging.info(f"Data range - min: {X.min():.6f}, max: {X.max():.6f}")
+
+    # Analysis of reconstruction errors
+    logging.info(f"Reconstruction errors statistics:")
+    logging.info(f"  Min: {errors.min():.6f}")
+    logging.info(f"  Max: {errors.max():.6f}")
+    logging.info(f"  Mean: {errors.mean():.6f}")
+    logging.info(f"  Median: {np.median(errors):.6f}")
+    logging.info(f"  Std: {errors.std():.6f}")
+    logging.info(f"  25th percentile: {np.percentile(errors, 25):.6f}")
+    logging.info(f"  75th percentile: {np.percentile(errors, 75):.6f}")
+    logging.info(f"  95th percentile: {np.percentile(errors, 95):.6f}")
+    logging.info(f"  99th percentile: {np.percentile(errors, 99):.6f}")
+
+    # Sample of individual errors
+    logging.info(f"First 10 reconstruction errors: {errors[:10]}")
+
+
+def log_threshold_analysis(errors, threshold, is_anomaly):
+    """Analisis threshold dan distribusi error untuk evaluasi deteksi anomali."""
+    logging.info("=== THRESHOLD ANALYSIS ===")
+    logging.info(f"Loaded threshold: {threshold:.6f}")
+    logging.info(
+        f"Errors above threshold: {(errors > threshold).sum()}/{len(errors)} ({100*(errors > threshold).sum()/len(errors):.1f}%)")
+    logging.info(
+        f"Errors below threshold: {(errors <= threshold).sum()}/{len(errors)} ({100*(errors <= threshold).sum()/len(errors):.1f}%)")
+
+    # Bandingkan hasil deteksi anomali dengan threshold dinamis (percentile)
+    dynamic_95 = np.percentile(errors, 95)
+    dynamic_97 = np.percentile(errors, 97)
+    dynamic_99 = np.percentile(errors, 99)
+    logging.info(
+        f"If using 95th percentile threshold ({dynamic_95:.6f}): {(errors > dynamic_95).sum()}/{len(errors)} anomalies")
+    logging.info(
+        f"If using 97th percentile threshold ({dynamic_97:.6f}): {(errors > dynamic_97).sum()}/{len(errors)} anomalies")
+    logging.info(
+        f"If using 99th percentile threshold ({dynamic_99:.6f}): {(errors > dynamic_99).sum()}/{len(errors)} anomalies")
+
+    logging.info(
+        f"Reconstruction errors - min: {errors.min():.6f}, max: {errors.max():.6f}, mean: {errors.mean():.6f}")
+    logging.info(f"Loaded threshold from threshold.json: {threshold:.6f}")
+    logging.info(
+        f"Anomalies detected: {is_anomaly.sum()}/{len(is_anomaly)}")
+
+
+def prepare_features(df, adjustment=None):
+    """Lengkapi dan normalisasi DataFrame input. Raise ValueError jika kolom wajib hilang.
+
+    `adjustment` adalah keputusan skala amount (amount_adjustment); None =
+    diputuskan dari batch ini.
+    """
+    df = fill_missing_features(df)
+    missing_cols = set(REQUIRED_FEATURES) - set(df.columns)
+    if missing_cols:
+        raise ValueError(f"Data harus memiliki kolom: {list(missing_cols)}")
+    return normalize_amount(df, adjustment)
+
+
+def transform_features(df, bundle):
+    """Transformasi fitur sesuai pipeline training (preprocessing) ke matrix float32."""
+    if bundle.encoder is not None:
+        return bundle.encoder.transform(df)
+    columns = list(getattr(bundle.preprocessor, 'feature_names_in_', REQUIRED_FEATURES))
+    X = bundle.preprocessor.transform(df[columns])
+    return np.asarray(X).astype(np.float32)
+
+
+def update_error_distribution(bundle, errors, threshold):
+    """Error yang baru diskor (bukan cache hit) memperbarui distribusi global.
+
+    Hanya baris yang tidak ditandai anomali (error <= threshold yang dipakai)
+    yang masuk, sehingga traffic yang seharusnya ditandai tidak menggeser
+    distribusi ke arahnya sendiri.
+    """
+    if bundle.error_distribution is not None and len(errors):
+        errors = np.asarray(errors)
+        bundle.error_distribution.update(errors[errors <= threshold])
+
+
+def select_threshold(static_threshold, exceed_count, total, dynamic_threshold):
+    """Pilih static threshold, atau dynamic threshold jika static terlalu ketat.
+
+    `dynamic_threshold` boleh berupa callable agar percentile hanya dihitung
+    ketika benar-benar dibutuhkan.
+    """
+    static_anomaly_rate = exceed_count / total if total else 0.0
+    if static_anomaly_rate > DYNAMIC_THRESHOLD_TRIGGER_RATE:
+        threshold = float(dynamic_threshold() if callable(
+            dynamic_threshold) else dynamic_threshold)
+        logging.warning(
+            f"Static threshold ({static_threshold:.6f}) would mark {static_anomaly_rate*100:.1f}% as anomalies.")
+        logging.warning(
+            f"Using dynamic threshold ({DYNAMIC_THRESHOLD_PERCENTILE}th percentile): {threshold:.6f}")
+        return threshold
+    logging.debug(
+        f"Using static threshold from threshold.json: {static_threshold:.6f}")
+    return static_threshold
+
+
+def relaxed_threshold(static_threshold, distribution, n_rows, batch_quantile):
+    """Dynamic threshold saat static terlalu ketat; tidak pernah di bawah static.
+
+    Nilainya maksimum dari static threshold, percentile distribusi global
+    (error yang diterima normal, jika sudah cukup data), dan percentile batch
+    (`batch_quantile`, callable) untuk batch minimal DYNAMIC_THRESHOLD_MIN_ROWS
+    baris. Karena tidak pernah di bawah percentile batch, paling banyak
+    (100 - DYNAMIC_THRESHOLD_PERCENTILE)% baris batch tersebut ditandai anomali.
+    Batch yang lebih kecil tidak di-relax dengan percentile dirinya sendiri.
+    """
+    threshold = float(static_threshold)
+    if distribution is not None and distribution.ready:
+        threshold = max(threshold, float(distribution.quantile()))
+    if n_rows >= DYNAMIC_THRESHOLD_MIN_ROWS:
+        threshold = max(threshold, float(batch_quantile()))
+    return threshold
+
+
+def global_dynamic_threshold(bundle, errors):
+    """Dynamic threshold untuk satu batch (lihat relaxed_threshold)."""
+    return relaxed_threshold(bundle.threshold, bundle.error_distribution, len(errors),
+                             lambda: np.percentile(errors, DYNAMIC_THRESHOLD_PERCENTILE))
+
+
+def resolve_batch_threshold(errors, bundle):
+    """Threshold untuk satu batch: static, atau dynamic jika static terlalu ketat."""
+    return select_threshold(
+        bundle.threshold, int((errors > bundle.threshold).sum()), len(errors),
+        lambda: global_dynamic_threshold(bundle, errors))
@@ -0,0 +1,251 @@
+# =========================
+# Profiling On-demand per Request (cProfile / tracemalloc)
+# =========================
+# Opt-in dan dilindungi shared secret (env PROFILE_SECRET). Satu request
+# /predict diprofil jika membawa header X-Profile (cpu, memory, atau
+# cpu,memory) plus X-Profile-Secret, atau jika admin meng-arm profiling
+# untuk N request berikutnya lewat POST /profiles/arm. Hasil (pstats dan
+# ringkasan JSON) disimpan di ring buffer on-disk berukuran tetap. Tanpa
+# PROFILE_SECRET view tidak dibungkus sama sekali (overhead nol).
+import os
+import io
+import hmac
+import json
+import time
+import glob
+import pstats
+import cProfile
+import logging
+import secrets
+import tempfile
+import threading
+import functools
+import tracemalloc
+
+from flask import make_response
+
+PROFILE_HEADER = 'X-Profile'
+SECRET_HEADER = 'X-Profile-Secret'
+PROFILE_MODES = ('cpu', 'memory')
+DEFAULT_MAX_PROFILES = 20
+DEFAULT_TOP = 15
+# Jumlah fungsi teratas yang diringkas di header response
+HEADER_TOP = 3
+
+_state = threading.local()
+
+
+def profiling_active():
+    """True di thread request yang sedang diprofil (mis. untuk melewati micro-batcher)."""
+    return getattr(_state, 'active', False)
+
+
+def parse_modes(raw):
+    modes = [mode.strip().lower() for mode in (raw or '').split(',') if mode.strip()]
+    if not modes or any(mode not in PROFILE_MODES for mode in modes):
+        raise ValueError(f'Mode profiling harus kombinasi dari {list(PROFILE_MODES)}.')
+    return tuple(dict.fromkeys(modes))
+
+
+class RequestProfiler:
+    """Profil request terpilih dan simpan hasilnya di ring buffer on-disk."""
+
+    def __init__(self, secret, directory, max_profiles=DEFAULT_MAX_PROFILES, top=DEFAULT_TOP):
+        self._secret = secret.encode()
+        self.directory = directory
+        self.max_profiles = max(1, int(max_profiles))
+        self.top = int(top)
+        # cProfile/tracemalloc bersifat global; satu request diprofil pada satu waktu
+        self._busy = threading.Lock()
+        self._armed_lock = threading.Lock()
+        self._armed = None
+        os.makedirs(directory, exist_ok=True)
+
+    def authorized(self, headers):
+        supplied = headers.get(SECRET_HEADER, '')
+        return hmac.compare_digest(supplied.encode(), self._secret)
+
+    def arm(self, modes, count):
+        """Profil `count` request /predict berikutnya tanpa perlu header dari klien."""
+        with self._armed_lock:
+            self._armed = (modes, int(count)) if count > 0 else None
+
+    def armed(self):
+        with self._armed_lock:
+            return None if self._armed is None else {'modes': list(self._armed[0]),
+                                                     'remaining': self._armed[1]}
+
+    def _take_armed(self):
+        with self._armed_lock:
+            if self._armed is None:
+                return None
+            modes, remaining = self._armed
+            self._armed = (modes, remaining - 1) if remaining > 1 else None
+            return modes
+
+    def _requested_modes(self, request):
+        """Mode profiling untuk request ini, None jika tidak diprofil."""
+        if PROFILE_HEADER in request.headers:
+            if not self.authorized(request.headers):
+                logging.warning(f"{PROFILE_HEADER} ditolak: secret tidak valid")
+                return None
+            try:
+                return parse_modes(request.headers[PROFILE_HEADER])
+            except ValueError as e:
+                logging.warning(f"{PROFILE_HEADER} diabaikan: {e}")
+                return None
+        return self._take_armed()
+
+    def wrap(self, view, request):
+        """Bungkus view Flask; cek header hanya berupa lookup dict jika tidak diprofil."""
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if PROFILE_HEADER not in request.headers and self._armed is None:
+                return view(*args, **kwargs)
+            modes = self._requested_modes(request)
+            if modes is None:
+                return view(*args, **kwargs)
+            if not self._busy.acquire(blocking=False):
+                response = make_response(view(*args, **kwargs))
+                response.headers['X-Profile-Status'] = 'busy'
+                return response
+            try:
+                return self._profile(view, args, kwargs, modes, request)
+            finally:
+                self._busy.release()
+
+        return wrapper
+
+    def _profile(self, view, args, kwargs, modes, request):
+        profiler = cProfile.Profile() if 'cpu' in modes else None
+        if 'memory' in modes:
+            tracemalloc.start()
+        _state.active = True
+        start = time.perf_counter()
+        try:
+            if profiler is not None:
+                response = profiler.runcall(view, *args, **kwargs)
+            else:
+                response = view(*args, **kwargs)
+            response = make_response(response)
+        finally:
+            elapsed = time.perf_counter() - start
+            _state.active = False
+            snapshot = None
+            traced = None
+            if 'memory' in modes:
+                snapshot = tracemalloc.take_snapshot()
+                traced = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+        profile_id = f"{int(time.time() * 1000):x}-{secrets.token_hex(3)}"
+        summary = {
+            'id': profile_id,
+            'created': time.time(),
+            'path': request.path,
+            'modes': list(modes),
+            'duration_ms': round(elapsed * 1000, 3),
+            'status': response.status_code,
+            'content_length': response.calculate_content_length(),
+        }
+        if profiler is not None:
+            profiler.dump_stats(self._path(profile_id, 'prof'))
+            summary['functions'] = self._top_functions(profiler)
+        if snapshot is not None:
+            summary['memory'] = {
+                'current_bytes': traced[0],
+                'peak_bytes': traced[1],
+                'allocations': self._top_allocations(snapshot),
+            }
+        with open(self._path(profile_id, 'json'), 'w') as f:
+            json.dump(summary, f)
+        self._evict()
+
+        response.headers['X-Profile-Id'] = profile_id
+        response.headers['X-Profile-Summary'] = self._header_summary(summary)
+        logging.info(f"Request {request.path} diprofil ({','.join(modes)}): {profile_id}")
+        return response
+
+    def _top_functions(self, profiler):
+        stats = pstats.Stats(profiler, stream=io.StringIO())
+        rows = []
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+            rows.append({'function': f"{os.path.basename(filename)}:{line}({name})",
+                         'calls': calls, 'tottime_ms': round(tottime * 1000, 3),
+                         'cumtime_ms': round(cumtime * 1000, 3)})
+        # Urut berdasarkan waktu sendiri (tottime): menunjuk langsung ke hotspot
+        rows.sort(key=lambda row: row['tottime_ms'], reverse=True)
+        return rows[:self.top]
+
+    def _top_allocations(self, snapshot):
+        return [{'location': f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                 'size_bytes': stat.size, 'count': stat.count}
+                for stat in snapshot.statistics('lineno')[:self.top]]
+
+    def _header_summary(self, summary):
+        parts = [f"total;dur={summary['duration_ms']}"]
+        for row in summary.get('functions', [])[:HEADER_TOP]:
+            parts.append(f"{row['function']};dur={row['tottime_ms']}")
+        if 'memory' in summary:
+            parts.append(f"peak_bytes={summary['memory']['peak_bytes']}")
+        # Nilai header harus latin-1
+        return ', '.join(parts).encode('latin-1', 'replace').decode('latin-1')
+
+    def _path(self, profile_id, extension):
+        return os.path.join(self.directory, f"{profile_id}.{extension}")
+
+    def _summary_paths(self):
+        # Id diawali timestamp milidetik (hex), sehingga urutan nama = urutan waktu
+        return sorted(glob.glob(os.path.join(self.directory, '*.json')))
+
+    def _evict(self):
+        summaries = self._summary_paths()
+        for path in summaries[:max(0, len(summaries) - self.max_profiles)]:
+            for extension in ('json', 'prof'):
+                stale = os.path.splitext(path)[0] + '.' + extension
+                if os.path.exists(stale):
+                    os.remove(stale)
+
+    def _valid_id(self, profile_id):
+        return all(c in '0123456789abcdef-' for c in profile_id)
+
+    def entries(self):
+        summaries = self._summary_paths()[::-1]
+        result = []
+        for path in summaries:
+            try:
+                with open(path) as f:
+                    summary = json.load(f)
+            except (OSError, ValueError):
+                continue
+            result.append({key: summary.get(key) for key in
+                           ('id', 'created', 'path', 'modes', 'duration_ms', 'status')})
+        return result
+
+    def summary(self, profile_id):
+        """Ringkasan JSON profil, None jika tidak ada (sudah ter-evict)."""
+        if not self._valid_id(profile_id):
+            return None
+        try:
+            with open(self._path(profile_id, 'json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def stats_path(self, profile_id):
+        """Path file pstats (untuk snakeviz / pstats), None jika tidak ada."""
+        path = self._path(profile_id, 'prof')
+        return path if self._valid_id(profile_id) and os.path.exists(path) else None
+
+
+def create_profiler():
+    """RequestProfiler dari env PROFILE_*; None jika PROFILE_SECRET tidak diset."""
+    secret = os.environ.get('PROFILE_SECRET')
+    if not secret:
+        return None
+    directory = os.environ.get('PROFILE_DIR') or os.path.join(tempfile.gettempdir(), 'fraud_profiles')
+    profiler = RequestProfiler(secret, directory,
+                               max_profiles=int(os.environ.get('PROFILE_MAX', DEFAULT_MAX_PROFILES)))
+    logging.info(f"Profiling on-demand aktif (ring buffer {profiler.max_profiles} profil di {directory})")
+    return profiler
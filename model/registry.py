@@ -0,0 +1,366 @@
+# =========================
+# Model Registry (hot-reload)
+# =========================
+# Menyimpan model, preprocessor, dan threshold sebagai satu bundle immutable
+# yang memiliki version tag. Watcher di background memeriksa perubahan
+# artefak (mtime/size, atau model_manifest.json jika ada), memuat versi baru,
+# lalu menukar bundle secara atomik. Request yang sedang berjalan tetap
+# memakai bundle lama yang sudah mereka pegang.
+# Jika manifest menunjuk serving artifact (.npz) yang cocok dengan artefak
+# sumber, bundle dimuat dari artifact tersebut tanpa import TensorFlow.
+# MODEL_VARIANT memilih varian terkompresi (student) yang
+# tercatat di manifest; varian punya artifact dan threshold sendiri.
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, field
+
+import joblib
+
+from artifact import ARTIFACT_FILENAME, load_artifact
+from features import create_encoder
+from inference import create_backend
+from sketch import KLLSketch, OnlineQuantile
+
+MODEL_FILENAME = 'autoencoder_model.keras'
+PREPROCESSOR_FILENAME = 'preprocessor_pipeline.joblib'
+THRESHOLD_FILENAME = 'threshold.json'
+MANIFEST_FILENAME = 'model_manifest.json'
+DEFAULT_STATIC_THRESHOLD = 0.005
+DEFAULT_DYNAMIC_PERCENTILE = 95
+DEFAULT_POLL_INTERVAL = 5.0
+FULL_VARIANT = 'full'
+SOURCE_FILENAMES = (MODEL_FILENAME, PREPROCESSOR_FILENAME, THRESHOLD_FILENAME)
+
+
+@dataclass(frozen=True)
+class ModelBundle:
+    """Satu versi artefak model yang sudah dimuat. Tidak pernah dimutasi."""
+    version: str
+    model: object
+    backend: object
+    preprocessor: object
+    threshold: float
+    loaded_at: float
+    files: dict = field(default_factory=dict)
+    encoder: object = None
+    source: str = 'keras'
+    load_timings: dict = field(default_factory=dict)
+    error_distribution: object = None
+    variant: str = FULL_VARIANT
+
+    def describe(self):
+        return {
+            'version': self.version,
+            'variant': self.variant,
+            'loaded_at': self.loaded_at,
+            'inference_backend': self.backend.name,
+            'feature_encoder': 'fast' if self.encoder is not None else 'sklearn',
+            'threshold': self.threshold,
+            'source': self.source,
+            'error_distribution': (self.error_distribution.describe()
+                                   if self.error_distribution is not None else None),
+            'files': self.files,
+            'load_timings': self.load_timings,
+        }
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_threshold_file(path):
+    """Isi threshold.json (hasil training/validasi), atau dict kosong jika gagal dibaca."""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        logging.warning(
+            f"Gagal membaca {THRESHOLD_FILENAME}, menggunakan default threshold {DEFAULT_STATIC_THRESHOLD}. Error: {e}")
+        return {}
+
+
+def error_distribution_from(threshold_data):
+    """OnlineQuantile dari sketch di threshold.json; sketch kosong jika belum ada."""
+    percentile = float(threshold_data.get('dynamic_percentile', DEFAULT_DYNAMIC_PERCENTILE))
+    sketch_data = threshold_data.get('sketch')
+    if sketch_data:
+        try:
+            return OnlineQuantile(KLLSketch.from_dict(sketch_data), percentile / 100.0)
+        except (KeyError, TypeError, ValueError) as e:
+            logging.warning(f"Sketch error di {THRESHOLD_FILENAME} tidak valid ({e}), mulai dari kosong.")
+    return OnlineQuantile(KLLSketch(), percentile / 100.0, source='online')
+
+
+def read_manifest(model_dir):
+    """Isi model_manifest.json, atau dict kosong jika belum ada."""
+    manifest_path = os.path.join(model_dir, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r') as f:
+        return json.load(f)
+
+
+def source_digests(model_dir):
+    """Digest singkat artefak sumber (model, preprocessor, threshold) yang ada."""
+    return {name: file_digest(os.path.join(model_dir, name))[:12] for name in SOURCE_FILENAMES
+            if os.path.exists(os.path.join(model_dir, name))}
+
+
+def content_version(files):
+    # Version content-addressed: sama persis jika artefak tidak berubah
+    return hashlib.sha256(json.dumps(files, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def write_manifest(model_dir, serving_artifact=None, variants=None):
+    """Tulis model_manifest.json secara atomik. Panggil setelah semua artefak selesai ditulis."""
+    files = source_digests(model_dir)
+    manifest = {
+        'version': content_version(files),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'files': files,
+    }
+    if serving_artifact is not None:
+        manifest['serving_artifact'] = dict(
+            serving_artifact, path=ARTIFACT_FILENAME,
+            sha256=file_digest(os.path.join(model_dir, ARTIFACT_FILENAME))[:12])
+    if variants:
+        manifest['variants'] = {
+            name: dict(info, sha256=file_digest(os.path.join(model_dir, info['path']))[:12],
+                       threshold_sha256=file_digest(
+                           os.path.join(model_dir, info['threshold_path']))[:12])
+            for name, info in variants.items()}
+    manifest_path = os.path.join(model_dir, MANIFEST_FILENAME)
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+    return manifest
+
+
+def usable_artifact(model_dir, manifest, files):
+    """Path serving artifact jika boleh dan aman dipakai, selain itu None."""
+    if os.environ.get('SERVING_ARTIFACT', '1').lower() in ('0', 'false', 'no'):
+        return None
+    # Backend/encoder referensi membutuhkan model Keras dan preprocessor sklearn
+    if (os.environ.get('INFERENCE_BACKEND', 'numpy').lower() == 'keras'
+            or os.environ.get('FEATURE_ENCODER', 'fast').lower() == 'sklearn'):
+        return None
+    info = manifest.get('serving_artifact')
+    if not info:
+        return None
+    path = os.path.join(model_dir, info.get('path', ARTIFACT_FILENAME))
+    if not os.path.exists(path):
+        logging.warning(f"Serving artifact {path} tidak ditemukan, memuat model Keras.")
+        return None
+    recorded = manifest.get('files', {})
+    stale = [name for name in (MODEL_FILENAME, PREPROCESSOR_FILENAME)
+             if recorded.get(name) != files.get(name)]
+    if stale:
+        logging.warning(
+            f"Serving artifact basi ({', '.join(stale)} berubah sejak export), memuat model Keras.")
+        return None
+    if info.get('sha256') != file_digest(path)[:12]:
+        logging.warning("Digest serving artifact tidak cocok dengan manifest, memuat model Keras.")
+        return None
+    return path
+
+
+def usable_variant(model_dir, manifest, files, variant):
+    """(path artifact, path threshold) varian jika tercatat di manifest dan tidak basi."""
+    if os.environ.get('INFERENCE_BACKEND', 'numpy').lower() == 'keras':
+        logging.warning(f"MODEL_VARIANT={variant} diabaikan: backend keras selalu memakai model penuh.")
+        return None
+    info = manifest.get('variants', {}).get(variant)
+    if not info:
+        logging.warning(f"Varian {variant} tidak ada di manifest (train.py --variants {variant}).")
+        return None
+    recorded = manifest.get('files', {})
+    if any(recorded.get(name) != files.get(name) for name in SOURCE_FILENAMES):
+        logging.warning(f"Varian {variant} basi (artefak sumber berubah sejak export).")
+        return None
+    paths = (os.path.join(model_dir, info['path']), os.path.join(model_dir, info['threshold_path']))
+    for path, digest in zip(paths, (info.get('sha256'), info.get('threshold_sha256'))):
+        if not os.path.exists(path) or file_digest(path)[:12] != digest:
+            logging.warning(f"File varian {path} hilang atau digest tidak cocok dengan manifest.")
+            return None
+    return paths
+
+
+def load_variant(model_dir, manifest, files, variant, version, timings):
+    """ModelBundle untuk varian terkompresi, None jika tidak bisa dipakai."""
+    paths = usable_variant(model_dir, manifest, files, variant)
+    if paths is None:
+        return None
+    try:
+        start = time.perf_counter()
+        backend, encoder = load_artifact(paths[0])
+        timings['artifact_load'] = round(time.perf_counter() - start, 4)
+    except (OSError, KeyError, ValueError) as e:
+        logging.warning(f"Gagal memuat varian {variant} ({e}).")
+        return None
+    threshold_data = read_threshold_file(paths[1])
+    files = dict(files, **{os.path.basename(path): file_digest(path)[:12] for path in paths})
+    # Version berbeda per varian: score cache dan header version tidak tercampur
+    return ModelBundle(version=f'{version}-{variant}', model=None, backend=backend,
+                       preprocessor=None,
+                       threshold=float(threshold_data.get('threshold', DEFAULT_STATIC_THRESHOLD)),
+                       loaded_at=time.time(), files=files, encoder=encoder, source='artifact',
+                       load_timings=timings, variant=variant,
+                       error_distribution=error_distribution_from(threshold_data))
+
+
+def _import_keras():
+    from tensorflow import keras
+    return keras
+
+
+def load_bundle(model_dir, variant=None):
+    """Muat model, preprocessor, dan threshold dari direktori menjadi ModelBundle.
+
+    `variant` (default env MODEL_VARIANT) memilih varian terkompresi; jika
+    varian tidak tersedia, model penuh yang dimuat.
+    """
+    variant = (variant or os.environ.get('MODEL_VARIANT', FULL_VARIANT)).lower()
+    timings = {}
+
+    def timed(name, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        timings[name] = round(time.perf_counter() - start, 4)
+        return result
+
+    paths = {name: os.path.join(model_dir, name) for name in SOURCE_FILENAMES}
+    files = timed('digest', source_digests, model_dir)
+    manifest = read_manifest(model_dir)
+    threshold_data = read_threshold_file(paths[THRESHOLD_FILENAME])
+    threshold = float(threshold_data.get('threshold', DEFAULT_STATIC_THRESHOLD))
+    version = manifest.get('version') or content_version(files)
+
+    if variant != FULL_VARIANT:
+        bundle = load_variant(model_dir, manifest, files, variant, version, timings)
+        if bundle is not None:
+            return bundle
+        logging.warning(f"Varian {variant} tidak dipakai, memuat model penuh.")
+
+    artifact_path = usable_artifact(model_dir, manifest, files)
+    if artifact_path is not None:
+        try:
+            backend, encoder = timed('artifact_load', load_artifact, artifact_path)
+            files[ARTIFACT_FILENAME] = manifest['serving_artifact']['sha256']
+            return ModelBundle(version=str(version), model=None, backend=backend,
+                               preprocessor=None, threshold=threshold, loaded_at=time.time(),
+                               files=files, encoder=encoder, source='artifact',
+                               load_timings=timings,
+                               error_distribution=error_distribution_from(threshold_data))
+        except (OSError, KeyError, ValueError) as e:
+            logging.warning(f"Gagal memuat serving artifact ({e}), memuat model Keras.")
+
+    # TensorFlow hanya di-import jika artifact tidak bisa dipakai
+    keras = timed('tensorflow_import', _import_keras)
+    model = timed('keras_load', lambda: keras.models.load_model(
+        paths[MODEL_FILENAME], compile=False))
+    preprocessor = timed('preprocessor_load', joblib.load, paths[PREPROCESSOR_FILENAME])
+    backend = timed('backend_compile', create_backend, model)
+    encoder = timed('encoder_compile', create_encoder, preprocessor)
+
+    return ModelBundle(version=str(version), model=model, backend=backend,
+                       preprocessor=preprocessor, threshold=threshold,
+                       loaded_at=time.time(), files=files, encoder=encoder,
+                       load_timings=timings,
+                       error_distribution=error_distribution_from(threshold_data))
+
+
+class ModelRegistry:
+    """Cache bundle model aktif dan reload otomatis saat artefak berubah."""
+
+    def __init__(self, model_dir, poll_interval=DEFAULT_POLL_INTERVAL, loader=load_bundle):
+        self.model_dir = model_dir
+        self.poll_interval = poll_interval
+        self._loader = loader
+        self._bundle = None
+        self._fingerprint = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_error = None
+
+    def current(self):
+        """Bundle aktif (atau None). Pegang referensinya selama satu request."""
+        return self._bundle
+
+    def fingerprint(self):
+        """Penanda perubahan artefak; manifest (jika ada) menjadi satu-satunya sumber."""
+        manifest_path = os.path.join(self.model_dir, MANIFEST_FILENAME)
+        names = [MANIFEST_FILENAME] if os.path.exists(
+            manifest_path) else list(SOURCE_FILENAMES)
+        result = []
+        for name in names:
+            try:
+                stat = os.stat(os.path.join(self.model_dir, name))
+                result.append((name, stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                result.append((name, None, None))
+        return tuple(result)
+
+    def load(self):
+        """Muat (ulang) bundle secara sinkron. Return True jika bundle ditukar."""
+        with self._lock:
+            fingerprint = self.fingerprint()
+            try:
+                bundle = self._loader(self.model_dir)
+            except Exception as e:
+                self.last_error = str(e)
+                self._fingerprint = fingerprint
+                logging.error(f"Gagal memuat model dari {self.model_dir}: {e}")
+                return False
+            previous = self._bundle
+            self._bundle = bundle
+            self._fingerprint = fingerprint
+            self.last_error = None
+        if previous is None:
+            logging.info(f"Model version {bundle.version} dimuat.")
+        else:
+            logging.info(
+                f"Model di-reload: version {previous.version} -> {bundle.version}")
+        return True
+
+    def reload_if_changed(self):
+        if self.fingerprint() == self._fingerprint:
+            return False
+        return self.load()
+
+    def start_watching(self):
+        """Jalankan watcher di background thread (daemon)."""
+        if self.poll_interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._watch, name='model-registry-watcher', daemon=True)
+        self._thread.start()
+
+    def after_fork(self):
+        """Panggil di proses anak setelah fork: thread watcher tidak ikut ter-fork."""
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.start_watching()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval)
+            self._thread = None
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.reload_if_changed()
+            except Exception as e:
+                logging.error(f"Model registry watcher error: {e}")
@@ -0,0 +1,293 @@
+# =========================
+# Scoring Offline (bulk CSV/Parquet)
+# =========================
+# Skor file transaksi besar tanpa melewati HTTP: file dibaca per chunk,
+# chunk dibagi ke process pool (model dimuat sekali per worker), lalu
+# error disusun kembali sesuai urutan baris asli. Pipeline fitur dan
+# pemilihan threshold sama dengan /predict (lihat pipeline.py); karena
+# threshold bisa relatif terhadap batch, satu file dianggap satu batch dan
+# isAnomaly baru ditulis setelah seluruh error terkumpul. Untuk alasan yang
+# sama keputusan skala/mata uang amount diambil sekali dari rata-rata amount
+# seluruh file (pass ringan yang hanya membaca kolom amount), sehingga skor
+# tidak bergantung pada --chunksize. Jika model
+# memakai fitur perilaku user, fitur dihitung di proses utama dengan
+# satu UserFeatureStore (state kosong) sesuai urutan file sebelum chunk
+# dibagi ke worker, seperti replay di train.py.
+import os
+import time
+import argparse
+import logging
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from pipeline import (amount_adjustment, prepare_features, resolve_batch_threshold, transform_features,
+                      update_error_distribution)
+from registry import load_bundle
+from serving import default_threads_per_worker, limit_native_threads
+from userfeatures import UserFeatureStore, uses_user_features
+
+DEFAULT_CHUNKSIZE = 100000
+# Jumlah chunk yang boleh diproses/menunggu per worker (membatasi RAM)
+INFLIGHT_PER_WORKER = 2
+PROGRESS_INTERVAL = 5.0
+SCORE_DTYPE = np.dtype([('anomalyScore', np.float32), ('isAnomaly', np.bool_)])
+
+# Bundle milik proses worker, dimuat sekali oleh _init_worker
+_worker_bundle = None
+
+
+def _require_pyarrow(purpose):
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        return pyarrow
+    except ImportError:
+        raise RuntimeError(f"pyarrow diperlukan untuk {purpose}: pip install pyarrow")
+
+
+def iter_input_chunks(path, chunksize):
+    """Baca CSV atau Parquet per chunk sebagai DataFrame."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"File input tidak ditemukan: {path}")
+    if path.endswith('.parquet'):
+        pa = _require_pyarrow('membaca input Parquet')
+        for batch in pa.parquet.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+def count_input_rows(path, chunksize=DEFAULT_CHUNKSIZE):
+    """Jumlah baris data file input (Parquet dari metadata, CSV dengan satu pass ringan)."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"File input tidak ditemukan: {path}")
+    if path.endswith('.parquet'):
+        pa = _require_pyarrow('membaca input Parquet')
+        return pa.parquet.ParquetFile(path).metadata.num_rows
+    return sum(len(chunk) for chunk in pd.read_csv(path, usecols=[0], chunksize=chunksize))
+
+
+def input_amount_adjustment(path, chunksize=DEFAULT_CHUNKSIZE):
+    """Keputusan skala amount dari rata-rata kolom amount seluruh file.
+
+    Return None jika file tidak punya kolom amount (prepare_features yang
+    kemudian melaporkan kolom yang hilang).
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"File input tidak ditemukan: {path}")
+    total, count = 0.0, 0
+    try:
+        if path.endswith('.parquet'):
+            pa = _require_pyarrow('membaca input Parquet')
+            batches = (batch.column(0).to_pandas() for batch in pa.parquet.ParquetFile(path)
+                       .iter_batches(batch_size=chunksize, columns=['amount']))
+        else:
+            batches = (chunk['amount'] for chunk in
+                       pd.read_csv(path, usecols=['amount'], chunksize=chunksize))
+        for amount in batches:
+            total += float(amount.sum())
+            count += int(amount.count())
+    except (KeyError, ValueError) as e:
+        logging.warning(f"Rata-rata amount file tidak bisa dihitung ({e}); skala diputuskan per chunk")
+        return None
+    return amount_adjustment(total / count if count else float('nan'))
+
+
+def score_frame(df, bundle, prepared=False, adjustment=None):
+    """Reconstruction error satu chunk (pipeline fitur sama dengan /predict)."""
+    if not prepared:
+        df = prepare_features(df, adjustment)
+    return bundle.backend.reconstruction_errors(transform_features(df, bundle))
+
+
+def _init_worker(model_dir, threads, variant):
+    global _worker_bundle
+    limit_native_threads(threads)
+    _worker_bundle = load_bundle(model_dir, variant)
+
+
+def _score_chunk(index, df, prepared, adjustment):
+    return index, score_frame(df, _worker_bundle, prepared, adjustment)
+
+
+def with_user_features(chunks, adjustment=None):
+    """Prepare setiap chunk lalu tambahkan fitur perilaku user secara berurutan."""
+    store = UserFeatureStore()
+    for df in chunks:
+        yield store.add_features(prepare_features(df, adjustment))
+
+
+class OrderedErrorWriter:
+    """Susun ulang hasil chunk yang selesai tidak berurutan ke file float32 sementara."""
+
+    def __init__(self, directory=None):
+        self._file = tempfile.NamedTemporaryFile(dir=directory, suffix='.f32', delete=False)
+        self.path = self._file.name
+        self._pending = {}
+        self._next = 0
+        self.rows = 0
+
+    def add(self, index, errors):
+        self._pending[index] = errors
+        while self._next in self._pending:
+            errors = np.asarray(self._pending.pop(self._next), dtype=np.float32)
+            self._file.write(errors.tobytes())
+            self.rows += len(errors)
+            self._next += 1
+
+    def close(self):
+        if self._pending:
+            raise RuntimeError(f"Chunk {sorted(self._pending)} belum lengkap")
+        self._file.close()
+        if self.rows == 0:
+            return np.empty(0, dtype=np.float32)
+        return np.memmap(self.path, dtype=np.float32, mode='r', shape=(self.rows,))
+
+    def discard(self):
+        self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Progress:
+    """Log jumlah baris dan throughput secara berkala."""
+
+    def __init__(self, interval=PROGRESS_INTERVAL):
+        self.interval = interval
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.rows = 0
+
+    def advance(self, rows):
+        self.rows += rows
+        now = time.perf_counter()
+        if now - self._last >= self.interval:
+            self._last = now
+            logging.info(f"Progress: {self.rows} baris, {self.rate():.0f} baris/detik")
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def rate(self):
+        elapsed = self.elapsed()
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+
+def _score_serial(chunks, bundle, writer, progress, prepared, adjustment=None):
+    for index, df in enumerate(chunks):
+        errors = score_frame(df, bundle, prepared, adjustment)
+        writer.add(index, errors)
+        progress.advance(len(errors))
+
+
+def _score_parallel(chunks, model_dir, workers, writer, progress, prepared, variant=None,
+                    adjustment=None):
+    threads = default_threads_per_worker(workers)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model_dir, threads, variant)) as pool:
+        inflight = set()
+
+        def collect(done):
+            for future in done:
+                index, errors = future.result()
+                writer.add(index, errors)
+                progress.advance(len(errors))
+
+        for index, df in enumerate(chunks):
+            if len(inflight) >= workers * INFLIGHT_PER_WORKER:
+                done, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                collect(done)
+            inflight.add(pool.submit(_score_chunk, index, df, prepared, adjustment))
+        collect(wait(inflight).done)
+
+
+def write_scores(path, errors, is_anomaly, metadata, chunksize):
+    """Tulis skor sesuai urutan baris input ke .npy (memmap) atau .parquet."""
+    if path.endswith('.parquet'):
+        pa = _require_pyarrow('menulis output Parquet')
+        schema = pa.schema([('anomalyScore', pa.float32()), ('isAnomaly', pa.bool_())],
+                           metadata={key: str(value) for key, value in metadata.items()})
+        with pa.parquet.ParquetWriter(path, schema) as out:
+            for start in range(0, len(errors), chunksize):
+                out.write_table(pa.table({
+                    'anomalyScore': np.asarray(errors[start:start + chunksize]),
+                    'isAnomaly': is_anomaly[start:start + chunksize],
+                }, schema=schema))
+        return
+
+    out = np.lib.format.open_memmap(path, mode='w+', dtype=SCORE_DTYPE, shape=(len(errors),))
+    for start in range(0, len(errors), chunksize):
+        out['anomalyScore'][start:start + chunksize] = errors[start:start + chunksize]
+        out['isAnomaly'][start:start + chunksize] = is_anomaly[start:start + chunksize]
+    out.flush()
+    del out
+
+
+def score_file(input_path, output_path, model_dir, workers=1, chunksize=DEFAULT_CHUNKSIZE,
+               variant=None):
+    """Skor seluruh file; return ringkasan (baris, anomali, threshold, throughput)."""
+    if not output_path.endswith(('.parquet', '.npy')):
+        raise ValueError("Output harus berakhiran .parquet atau .npy")
+    bundle = load_bundle(model_dir, variant)
+    logging.info(f"Model version {bundle.version} ({bundle.source}), {workers} worker")
+
+    adjustment = input_amount_adjustment(input_path, chunksize)
+    chunks = iter_input_chunks(input_path, chunksize)
+    prepared = uses_user_features(bundle)
+    if prepared:
+        chunks = with_user_features(chunks, adjustment)
+    writer = OrderedErrorWriter(os.path.dirname(os.path.abspath(output_path)))
+    progress = Progress()
+    try:
+        if workers > 1:
+            _score_parallel(chunks, model_dir, workers, writer, progress, prepared, variant,
+                            adjustment)
+        else:
+            _score_serial(chunks, bundle, writer, progress, prepared, adjustment)
+        scoring_seconds = progress.elapsed()
+        errors = writer.close()
+        if len(errors) == 0:
+            raise ValueError("File input tidak berisi transaksi")
+
+        # Seluruh file = satu batch, sama seperti satu request /predict
+        threshold = resolve_batch_threshold(errors, bundle)
+        update_error_distribution(bundle, errors, threshold)
+        is_anomaly = errors > threshold
+        write_scores(output_path, errors, is_anomaly,
+                     {'model_version': bundle.version, 'threshold': threshold}, chunksize)
+    finally:
+        writer.discard()
+
+    summary = {
+        'rows': int(len(errors)),
+        'anomalies': int(is_anomaly.sum()),
+        'threshold': float(threshold),
+        'model_version': bundle.version,
+        'seconds': round(progress.elapsed(), 3),
+        'rows_per_second': round(len(errors) / scoring_seconds if scoring_seconds > 0 else 0.0, 1),
+    }
+    logging.info(
+        f"Selesai: {summary['rows']} baris, {summary['anomalies']} anomali "
+        f"(threshold {threshold:.6f}), {summary['rows_per_second']:.0f} baris/detik -> {output_path}")
+    return summary
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    parser = argparse.ArgumentParser(description='Scoring offline file transaksi (CSV/Parquet)')
+    parser.add_argument('input', help='File input .csv atau .parquet (kolom sama dengan /predict)')
+    parser.add_argument('--output', required=True, help='File output .parquet atau .npy')
+    parser.add_argument('--model-dir', default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--variant', default=None,
+                        help='Varian model (full, student); default env MODEL_VARIANT')
+    args = parser.parse_args()
+    score_file(args.input, args.output, args.model_dir, args.workers, args.chunksize, args.variant)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+# =========================
+# Score Cache (content-addressed)
+# =========================
+# Reconstruction error per transaksi di-cache dengan key hash 128-bit dari
+# bentuk ringkas input model (numerik ter-scale + index kolom one-hot hasil
+# FastEncoder.encode) yang di-seed dengan version model. Hanya error yang
+# disimpan; threshold tetap dihitung per request karena bisa relatif
+# terhadap batch. Cache memori dibatasi ukuran (LRU) dan opsional
+# diteruskan ke SQLite lokal agar bertahan antar restart / antar worker.
+import os
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_MAX_MB = 64
+# Perkiraan memori per entry: key bytes(16), float, dan node OrderedDict
+ENTRY_BYTES = 200
+SQLITE_BATCH = 500
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+
+
+def _splitmix64(h, tmp):
+    """Finalizer splitmix64, in-place pada array uint64 (overflow = modulo 2^64)."""
+    h += _GOLDEN
+    for shift, multiplier in ((30, _MIX1), (27, _MIX2)):
+        np.right_shift(h, np.uint64(shift), out=tmp)
+        h ^= tmp
+        h *= multiplier
+    np.right_shift(h, np.uint64(31), out=tmp)
+    h ^= tmp
+
+
+def row_keys(numeric, codes, version):
+    """Key 16 byte per baris, stabil antar proses (dipakai juga oleh disk store)."""
+    n = len(numeric)
+    columns = np.hstack([np.ascontiguousarray(numeric, dtype=np.float64).view(np.uint64),
+                         np.ascontiguousarray(codes, dtype=np.int64).view(np.uint64)])
+    columns = np.asfortranarray(columns)
+    seeds = np.frombuffer(hashlib.blake2b(str(version).encode(), digest_size=16).digest(),
+                          dtype=np.uint64)
+    keys = np.empty((2, n), dtype=np.uint64)
+    tmp = np.empty(n, dtype=np.uint64)
+    for lane, seed in enumerate(seeds):
+        h = keys[lane]
+        h.fill(seed)
+        for j in range(columns.shape[1]):
+            h ^= columns[:, j]
+            h ^= np.uint64(j + 1)
+            _splitmix64(h, tmp)
+    return np.ascontiguousarray(keys.T).view(np.dtype('V16')).ravel().tolist()
+
+
+class ScoreCache:
+    """LRU cache reconstruction error per key, opsional dengan store SQLite."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_MB << 20, path=None):
+        self.max_entries = max(1, int(max_bytes) // ENTRY_BYTES)
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._db_version = None
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        if path:
+            self._open()
+
+    def _open(self):
+        try:
+            self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS scores '
+                             '(key BLOB PRIMARY KEY, error REAL NOT NULL, version TEXT NOT NULL)')
+            self._db.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"Score cache disk store {self.path} tidak bisa dibuka ({e}), hanya memori.")
+            self._db = None
+
+    def after_fork(self):
+        """Panggil di proses anak setelah fork: koneksi SQLite tidak boleh dibagi antar proses."""
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = None
+        if self.path:
+            self._open()
+
+    def lookup(self, keys):
+        """Return (errors float32, mask hit). Error untuk key yang miss bernilai NaN."""
+        errors = np.full(len(keys), np.nan, dtype=np.float32)
+        hit = np.zeros(len(keys), dtype=bool)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                value = self._entries.get(key)
+                if value is None:
+                    missing.append(i)
+                    continue
+                self._entries.move_to_end(key)
+                errors[i] = value
+                hit[i] = True
+
+        if missing and self._db is not None:
+            found = self._disk_get([keys[i] for i in missing])
+            if found:
+                self._remember(found.items())
+                for i in missing:
+                    value = found.get(keys[i])
+                    if value is not None:
+                        errors[i] = value
+                        hit[i] = True
+                with self._lock:
+                    self.disk_hits += len(found)
+
+        n_hits = int(hit.sum())
+        with self._lock:
+            self.hits += n_hits
+            self.misses += len(keys) - n_hits
+        return errors, hit
+
+    def store(self, keys, errors, version):
+        items = list(zip(keys, np.asarray(errors, dtype=np.float64).tolist()))
+        self._remember(items)
+        if self._db is not None:
+            self._disk_put(items, str(version))
+
+    def _remember(self, items):
+        with self._lock:
+            for key, value in items:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _disk_get(self, keys):
+        found = {}
+        try:
+            with self._db_lock:
+                for start in range(0, len(keys), SQLITE_BATCH):
+                    chunk = keys[start:start + SQLITE_BATCH]
+                    rows = self._db.execute(
+                        f"SELECT key, error FROM scores WHERE key IN ({','.join('?' * len(chunk))})",
+                        chunk).fetchall()
+                    found.update((bytes(key), error) for key, error in rows)
+        except sqlite3.Error as e:
+            logging.warning(f"Score cache disk read error: {e}")
+        return found
+
+    def _disk_put(self, items, version):
+        try:
+            with self._db_lock:
+                if version != self._db_version:
+                    # Entry version model lain tidak akan pernah hit lagi
+                    self._db.execute('DELETE FROM scores WHERE version != ?', (version,))
+                    self._db_version = version
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO scores (key, error, version) VALUES (?, ?, ?)',
+                    [(key, value, version) for key, value in items])
+                self._db.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"Score cache disk write error: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'enabled': True,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'disk_hits': self.disk_hits,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0,
+                'disk_store': self.path if self._db is not None else None,
+            }
+
+
+def create_score_cache():
+    """Buat ScoreCache dari env SCORE_CACHE_*; None jika dinonaktifkan."""
+    if os.environ.get('SCORE_CACHE_ENABLED', '1').lower() in ('0', 'false', 'no'):
+        return None
+    max_mb = float(os.environ.get('SCORE_CACHE_MAX_MB', DEFAULT_MAX_MB))
+    path = os.environ.get('SCORE_CACHE_PATH') or None
+    cache = ScoreCache(max_bytes=int(max_mb * (1 << 20)), path=path)
+    logging.info(
+        f"Score cache aktif (maks {cache.max_entries} entry{', disk: ' + path if path else ''})")
+    return cache
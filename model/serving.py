@@ -0,0 +1,166 @@
+# =========================
+# Production Serving (pre-fork)
+# =========================
+# Parent process memuat model sekali, menjalankan warm-up, membuka socket,
+# lalu fork N worker. Bobot model dibagi copy-on-write antar worker. Setiap
+# worker menjalankan WSGI server (werkzeug, threaded) di atas socket yang
+# sama dan membatasi thread BLAS serta intra-op/inter-op TensorFlow agar
+# tidak oversubscription. Backend keras ditolak: runtime TF yang sudah aktif
+# di parent (load + warm-up) tidak aman di-fork.
+# SIGTERM/SIGINT ke parent diteruskan ke worker untuk graceful shutdown.
+import os
+import sys
+import time
+import signal
+import socket
+import logging
+import threading
+
+from werkzeug.serving import make_server
+
+DEFAULT_SHUTDOWN_TIMEOUT = 30.0
+# Inference autoencoder adalah rantai op berurutan; paralelisme ada di intra-op
+TF_INTER_OP_THREADS = 1
+
+
+def default_threads_per_worker(workers):
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def limit_native_threads(n_threads):
+    """Batasi thread BLAS/OpenMP di proses ini (dipanggil di setiap worker)."""
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(limits=n_threads)
+    except ImportError:
+        logging.warning(
+            "threadpoolctl tidak terpasang; jumlah thread BLAS tidak dibatasi")
+
+
+def limit_tensorflow_threads(n_threads, inter_op_threads=TF_INTER_OP_THREADS):
+    """Atur thread intra-op/inter-op TensorFlow di proses ini sebelum runtime TF start.
+
+    Env var dibaca TF saat runtime pertama kali dibuat (mis. registry reload ke
+    model Keras di worker). Jika TF sudah ter-import, setting juga diterapkan
+    lewat tf.config.threading selama runtime belum aktif.
+    """
+    os.environ['TF_NUM_INTRAOP_THREADS'] = str(n_threads)
+    os.environ['TF_NUM_INTEROP_THREADS'] = str(inter_op_threads)
+    tf = sys.modules.get('tensorflow')
+    if tf is None:
+        return
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(n_threads)
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    except RuntimeError as e:
+        # Runtime diwarisi dari parent (TF hanya dipakai untuk kompilasi backend numpy)
+        logging.debug(f"Thread TensorFlow tidak diubah: {e}")
+
+
+def _run_worker(app, sock, host, port, worker_id, on_worker_start, on_worker_exit=None):
+    if on_worker_start is not None:
+        on_worker_start(worker_id)
+    server = make_server(host, port, app, threaded=True, fd=sock.fileno())
+    # Tunggu request yang sedang berjalan selesai saat shutdown
+    server.daemon_threads = False
+    server.block_on_close = True
+
+    def shutdown(signum, frame):
+        logging.info(f"Worker {worker_id} (pid {os.getpid()}) shutting down...")
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    logging.info(f"Worker {worker_id} (pid {os.getpid()}) siap melayani")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        # Worker keluar lewat os._exit (atexit tidak jalan): flush state di sini
+        if on_worker_exit is not None:
+            on_worker_exit(worker_id)
+
+
+def _spawn(app, sock, host, port, worker_id, on_worker_start, on_worker_exit=None):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(app, sock, host, port, worker_id, on_worker_start, on_worker_exit)
+        except Exception as e:
+            logging.error(f"Worker {worker_id} gagal: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def serve(app, host='0.0.0.0', port=5000, workers=2, warmup=None, on_worker_start=None,
+          shutdown_timeout=DEFAULT_SHUTDOWN_TIMEOUT, on_worker_exit=None):
+    """Jalankan app dengan pre-fork workers sampai menerima SIGTERM/SIGINT."""
+    if not hasattr(os, 'fork'):
+        raise RuntimeError("Mode serve membutuhkan os.fork (Linux/macOS)")
+
+    if warmup is not None:
+        start = time.perf_counter()
+        warmup()
+        logging.info(
+            f"Warm-up selesai dalam {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    sock = socket.create_server((host, port), backlog=2048)
+    sock.set_inheritable(True)
+    logging.info(
+        f"Serving on http://{host}:{port} dengan {workers} worker (parent pid {os.getpid()})")
+
+    children = {}
+    stopping = threading.Event()
+
+    def stop(signum, frame):
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for worker_id in range(workers):
+        children[_spawn(app, sock, host, port, worker_id, on_worker_start,
+                         on_worker_exit)] = worker_id
+
+    try:
+        while not stopping.is_set():
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                stopping.wait(0.5)
+                continue
+            worker_id = children.pop(pid, None)
+            if worker_id is not None and not stopping.is_set():
+                logging.warning(
+                    f"Worker {worker_id} (pid {pid}) berhenti (status {status}), menjalankan ulang")
+                children[_spawn(app, sock, host, port,
+                                worker_id, on_worker_start, on_worker_exit)] = worker_id
+    finally:
+        logging.info("Menghentikan worker...")
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + shutdown_timeout
+        while children and time.monotonic() < deadline:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                time.sleep(0.1)
+            else:
+                children.pop(pid, None)
+        for pid in children:
+            logging.warning(f"Worker pid {pid} tidak berhenti, dipaksa kill")
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        sock.close()
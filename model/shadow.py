@@ -0,0 +1,222 @@
+# =========================
+# Shadow Scoring Champion/Challenger
+# =========================
+# Model shadow (env SHADOW_MODELS) menskor traffic /predict yang sama
+# dengan model utama (champion) tanpa memengaruhi response: klien hanya
+# menerima hasil champion. Parsing, pengisian fitur, dan encoding hanya
+# dilakukan sekali; shadow dengan encoder identik (kolom, scaler, dan
+# kategori sama) langsung memakai matrix champion, shadow lain meng-encode
+# ulang dari DataFrame yang sudah dipersiapkan. Scoring berjalan di thread
+# pool background dengan antrean terbatas (batch di-drop jika penuh), jadi
+# latency champion tidak berubah. Distribusi skor dan disagreement flag
+# anomali per model dicatat ke /metrics dan log.
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from pipeline import resolve_batch_threshold, transform_features, update_error_distribution
+from registry import DEFAULT_POLL_INTERVAL, FULL_VARIANT, ModelRegistry, load_bundle
+
+SCORE_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5,
+                 1.0, 2.0, 5.0, 10.0)
+DEFAULT_WORKERS = 1
+DEFAULT_MAX_PENDING = 4
+CHAMPION_LABEL = 'champion'
+
+
+def parse_shadow_models(raw):
+    """'/models/v2,/models/v3@student' -> [('/models/v2', 'full'), ('/models/v3', 'student')]."""
+    models = []
+    for item in (raw or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        model_dir, _, variant = item.partition('@')
+        models.append((model_dir, variant or FULL_VARIANT))
+    return models
+
+
+class ShadowModel:
+    """Satu model challenger dengan registry (hot-reload) dan statistik kumulatifnya."""
+
+    def __init__(self, model_dir, variant=FULL_VARIANT, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.model_dir = model_dir
+        self.variant = variant
+        self.name = os.path.basename(os.path.normpath(model_dir)) + \
+            (f'@{variant}' if variant != FULL_VARIANT else '')
+        self.registry = ModelRegistry(model_dir, poll_interval,
+                                      loader=lambda directory: load_bundle(directory, variant))
+        self.rows = 0
+        self.anomalies = 0
+        self.disagreements = 0
+        self.shared_batches = 0
+        self.encoded_batches = 0
+        self.last_error = None
+
+    def stats(self):
+        bundle = self.registry.current()
+        return {
+            'model_dir': self.model_dir,
+            'version': bundle.version if bundle is not None else None,
+            'rows': self.rows,
+            'anomaly_rate': round(self.anomalies / self.rows, 6) if self.rows else None,
+            'disagreement_rate': round(self.disagreements / self.rows, 6) if self.rows else None,
+            # Batch yang memakai matrix champion vs encode ulang (encoder berbeda)
+            'shared_batches': self.shared_batches,
+            'encoded_batches': self.encoded_batches,
+            'last_error': self.last_error or self.registry.last_error,
+        }
+
+
+class ShadowScorer:
+    def __init__(self, models, metrics, workers=DEFAULT_WORKERS, max_pending=DEFAULT_MAX_PENDING):
+        self.models = list(models)
+        self.workers = max(1, int(workers))
+        self.max_pending = max(1, int(max_pending))
+        self.dropped = 0
+        self._pending = 0
+        self._executor = None
+        self._lock = threading.Lock()
+        self._scores = metrics.histogram(
+            'fraud_shadow_score', 'Distribusi reconstruction error per model (champion dan shadow).',
+            ('model',), SCORE_BUCKETS)
+        self._seconds = metrics.histogram(
+            'fraud_shadow_seconds', 'Waktu scoring satu batch oleh model shadow.', ('model',))
+        self._rows = metrics.counter(
+            'fraud_shadow_rows_total', 'Transaksi yang diskor model shadow.', ('model',))
+        self._anomalies = metrics.counter(
+            'fraud_shadow_anomalies_total', 'Transaksi yang ditandai anomali per model.', ('model',))
+        self._disagreements = metrics.counter(
+            'fraud_shadow_disagreements_total',
+            'Transaksi dengan flag anomali shadow berbeda dari champion.', ('model',))
+        self._dropped = metrics.counter(
+            'fraud_shadow_dropped_total', 'Batch/model shadow yang dilewati per alasan.',
+            ('model', 'reason'))
+
+    def load(self):
+        for model in self.models:
+            model.registry.load()
+            model.registry.start_watching()
+
+    def stop(self):
+        for model in self.models:
+            model.registry.stop()
+
+    def after_fork(self):
+        """Panggil di proses anak: executor dan watcher registry tidak ikut ter-fork."""
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        for model in self.models:
+            model.registry.after_fork()
+
+    def submit(self, champion, df, features, errors, is_anomaly):
+        """Jadwalkan scoring shadow untuk satu batch. Return False jika batch di-drop.
+
+        `features` berupa matrix champion (n, width) atau bentuk ringkas
+        (numeric, codes) dari FastEncoder.encode.
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.dropped += 1
+                self._dropped.inc(1, model='*', reason='queue_full')
+                return False
+            self._pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix='shadow')
+        self._executor.submit(self._run, champion, df, features, errors, is_anomaly)
+        return True
+
+    def _run(self, champion, df, features, errors, is_anomaly):
+        try:
+            self._observe_scores(CHAMPION_LABEL, errors)
+            shared = None
+            for model in self.models:
+                bundle = model.registry.current()
+                if bundle is None:
+                    self._dropped.inc(1, model=model.name, reason='not_loaded')
+                    continue
+                try:
+                    if champion.encoder is not None and champion.encoder.same_encoding(bundle.encoder):
+                        if shared is None:
+                            shared = (features if isinstance(features, np.ndarray)
+                                      else champion.encoder.expand(*features))
+                        self._score(model, bundle, shared, errors, is_anomaly, shared=True)
+                    elif self._missing_columns(bundle, df):
+                        # Mis. shadow dilatih dengan fitur perilaku user sedangkan champion tidak
+                        self._dropped.inc(1, model=model.name, reason='incompatible')
+                    else:
+                        self._score(model, bundle, None, errors, is_anomaly, df=df)
+                except Exception as e:
+                    model.last_error = str(e)
+                    self._dropped.inc(1, model=model.name, reason='error')
+                    logging.error(f"Shadow {model.name} gagal: {e}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _missing_columns(self, bundle, df):
+        if bundle.encoder is not None:
+            names = bundle.encoder.input_features
+        else:
+            names = getattr(bundle.preprocessor, 'feature_names_in_', [])
+        return [name for name in names if name not in df.columns]
+
+    def _score(self, model, bundle, X, champion_errors, champion_flags, shared=False, df=None):
+        start = time.perf_counter()
+        if X is None:
+            X = transform_features(df, bundle)
+        errors = bundle.backend.reconstruction_errors(X)
+        threshold = resolve_batch_threshold(errors, bundle)
+        update_error_distribution(bundle, errors, threshold)
+        flags = errors > threshold
+        self._seconds.observe(time.perf_counter() - start, model=model.name)
+
+        n_rows, n_anomalies = len(errors), int(flags.sum())
+        disagreements = int(np.count_nonzero(flags != champion_flags))
+        model.rows += n_rows
+        model.anomalies += n_anomalies
+        model.disagreements += disagreements
+        if shared:
+            model.shared_batches += 1
+        else:
+            model.encoded_batches += 1
+        model.last_error = None
+        self._rows.inc(n_rows, model=model.name)
+        self._anomalies.inc(n_anomalies, model=model.name)
+        self._disagreements.inc(disagreements, model=model.name)
+        self._observe_scores(model.name, errors)
+        logging.info(
+            f"Shadow {model.name} ({bundle.version}): {n_rows} baris, anomali {n_anomalies} vs "
+            f"champion {int(champion_flags.sum())}, disagreement {disagreements / n_rows:.2%}, "
+            f"mean score {float(errors.mean()):.6f} vs {float(champion_errors.mean()):.6f}")
+
+    def _observe_scores(self, label, errors):
+        # Hitung bucket secara vektor; observe() per baris terlalu mahal untuk batch besar
+        positions = np.searchsorted(SCORE_BUCKETS, errors, side='left')
+        counts = np.bincount(positions, minlength=len(SCORE_BUCKETS) + 1)[:len(SCORE_BUCKETS)]
+        self._scores.observe_counts(counts.tolist(), len(errors), float(np.sum(errors)), model=label)
+
+    def stats(self):
+        return {'workers': self.workers, 'max_pending': self.max_pending, 'pending': self._pending,
+                'dropped_batches': self.dropped,
+                'models': {model.name: model.stats() for model in self.models}}
+
+
+def create_shadow_scorer(metrics):
+    """ShadowScorer dari env SHADOW_*; None jika SHADOW_MODELS kosong."""
+    models = parse_shadow_models(os.environ.get('SHADOW_MODELS'))
+    if not models:
+        return None
+    poll_interval = float(os.environ.get('MODEL_RELOAD_INTERVAL', DEFAULT_POLL_INTERVAL))
+    scorer = ShadowScorer([ShadowModel(model_dir, variant, poll_interval) for model_dir, variant in models],
+                          metrics,
+                          workers=int(os.environ.get('SHADOW_WORKERS', DEFAULT_WORKERS)),
+                          max_pending=int(os.environ.get('SHADOW_MAX_PENDING', DEFAULT_MAX_PENDING)))
+    logging.info(f"Shadow scoring aktif: {[model.name for model in scorer.models]}")
+    return scorer
@@ -0,0 +1,247 @@
+# =========================
+# Out-of-core Training Data (chunked CSV -> memory-mapped shards)
+# =========================
+# Pass 1 membaca CSV per chunk untuk fit StandardScaler (partial_fit) dan
+# vocabulary kategori. Pass 2 meng-encode setiap chunk ke bentuk ringkas
+# FastEncoder (numerik float32 + index kolom one-hot int32) dan menulisnya
+# sebagai shard .npy yang dibuka dengan mmap. Matrix one-hot dense hanya
+# dibentuk per mini-batch saat training, sehingga RAM puncak tidak
+# bergantung pada jumlah baris dataset.
+# Dengan --shard-dir yang persisten, shard menjadi cache untuk retraining
+# incremental: baris baru di-append sebagai shard baru, dan jika vocabulary
+# kategori bertambah, index kolom one-hot di shard lama dipetakan ulang
+# (cache_state.json mencatat feature names dan file data yang sudah masuk).
+import os
+import copy
+import glob
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+SHARD_PATTERN = 'shard_{:05d}_{}.npy'
+SCALER_STATE = ('mean_', 'var_', 'scale_', 'n_samples_seen_')
+CACHE_STATE_FILENAME = 'cache_state.json'
+# Snapshot UserFeatureStore di akhir data cache, dilanjutkan oleh append berikutnya
+USER_STATE_FILENAME = 'user_state.npz'
+
+
+class StreamingPreprocessorFit:
+    """Akumulasi statistik scaler dan vocabulary kategori dari banyak chunk."""
+
+    def __init__(self, numerical, categorical):
+        self.numerical = list(numerical)
+        self.categorical = list(categorical)
+        self.scaler = StandardScaler()
+        self.vocabularies = {feature: set() for feature in self.categorical}
+        self.rows = 0
+
+    @classmethod
+    def from_preprocessor(cls, preprocessor):
+        """Lanjutkan dari ColumnTransformer ter-fit (scaler dan vocabulary lama)."""
+        _, scaler, numerical = next(t for t in preprocessor.transformers_ if t[0] == 'num')
+        _, onehot, categorical = next(t for t in preprocessor.transformers_ if t[0] == 'cat')
+        fitter = cls(numerical, categorical)
+        fitter.scaler = copy.deepcopy(scaler)
+        fitter.vocabularies = {feature: set(categories.tolist())
+                               for feature, categories in zip(categorical, onehot.categories_)}
+        fitter.rows = int(np.max(scaler.n_samples_seen_))
+        return fitter
+
+    def update_vocabulary(self, X):
+        """Tambah kategori baru saja; statistik scaler dibekukan (skala input model tetap)."""
+        added = 0
+        for feature in self.categorical:
+            vocabulary = self.vocabularies[feature]
+            before = len(vocabulary)
+            vocabulary.update(X[feature].unique().tolist())
+            added += len(vocabulary) - before
+        return added
+
+    def update(self, X):
+        self.scaler.partial_fit(X[self.numerical])
+        for feature in self.categorical:
+            self.vocabularies[feature].update(X[feature].unique().tolist())
+        self.rows += len(X)
+
+    def finalize(self, sample):
+        """Bangun ColumnTransformer ter-fit yang setara dengan fit_transform pada seluruh data.
+
+        `sample` (mis. chunk pertama) hanya dipakai agar ColumnTransformer
+        tercatat ter-fit; kategori dan statistik scaler berasal dari
+        seluruh chunk.
+        """
+        if self.rows == 0:
+            raise ValueError("Tidak ada data untuk fit preprocessor")
+        categories = [np.unique(np.asarray(list(self.vocabularies[feature])))
+                      for feature in self.categorical]
+        preprocessor = ColumnTransformer([
+            ('num', StandardScaler(), self.numerical),
+            ('cat', OneHotEncoder(categories=categories, handle_unknown='ignore',
+                                  sparse_output=False), self.categorical)
+        ])
+        preprocessor.fit(sample[self.numerical + self.categorical])
+        fitted_scaler = preprocessor.named_transformers_['num']
+        for attr in SCALER_STATE:
+            setattr(fitted_scaler, attr, getattr(self.scaler, attr))
+        return preprocessor
+
+
+class ShardWriter:
+    """Tulis bentuk ringkas hasil FastEncoder.encode ke shard .npy berurutan.
+
+    Dengan `append=True` shard lama dipertahankan dan penomoran dilanjutkan.
+    """
+
+    def __init__(self, shard_dir, append=False):
+        self.shard_dir = shard_dir
+        os.makedirs(shard_dir, exist_ok=True)
+        self.shards = 0
+        self.rows = 0
+        if append:
+            self.shards = count_shards(shard_dir)
+            return
+        for path in glob.glob(os.path.join(shard_dir, 'shard_*.npy')):
+            os.remove(path)
+
+    def write(self, numeric, codes):
+        if len(numeric) == 0:
+            return
+        np.save(os.path.join(self.shard_dir, SHARD_PATTERN.format(self.shards, 'numeric')),
+                np.asarray(numeric, dtype=np.float32))
+        np.save(os.path.join(self.shard_dir, SHARD_PATTERN.format(self.shards, 'codes')),
+                np.asarray(codes, dtype=np.int32))
+        self.shards += 1
+        self.rows += len(numeric)
+
+
+def count_shards(shard_dir):
+    index = 0
+    while os.path.exists(os.path.join(shard_dir, SHARD_PATTERN.format(index, 'numeric'))):
+        index += 1
+    return index
+
+
+def column_mapping(old_encoder, new_encoder):
+    """Index kolom lama -> index kolom baru setelah vocabulary kategori bertambah."""
+    if old_encoder.numeric_features != new_encoder.numeric_features or \
+            old_encoder.categorical_features != new_encoder.categorical_features:
+        raise ValueError("Fitur input berubah; cache shard harus dibangun ulang")
+    offset = len(old_encoder.numeric_features)
+    mapping = [np.arange(offset, dtype=np.int64)]
+    for feature, old, new in zip(old_encoder.categorical_features, old_encoder.categories,
+                                 new_encoder.categories):
+        positions = pd.Index(new).get_indexer(old)
+        if (positions < 0).any():
+            raise ValueError(f"Kategori lama hilang dari vocabulary baru ({feature})")
+        mapping.append(positions + offset)
+        offset += len(new)
+    return np.concatenate(mapping).astype(np.int64)
+
+
+def remap_shards(shard_dir, mapping):
+    """Tulis ulang index kolom one-hot semua shard sesuai `mapping` (tmp + rename)."""
+    for index in range(count_shards(shard_dir)):
+        path = os.path.join(shard_dir, SHARD_PATTERN.format(index, 'codes'))
+        codes = np.load(path)
+        remapped = np.where(codes >= 0, mapping[np.maximum(codes, 0)], -1).astype(np.int32)
+        tmp = path + '.tmp.npy'
+        np.save(tmp, remapped)
+        os.replace(tmp, path)
+
+
+def read_cache_state(shard_dir):
+    """Isi cache_state.json, None jika direktori bukan cache shard."""
+    try:
+        with open(os.path.join(shard_dir, CACHE_STATE_FILENAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_cache_state(shard_dir, state):
+    path = os.path.join(shard_dir, CACHE_STATE_FILENAME)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+class ShardDataset:
+    """Mini-batch dense dari shard mmap, di-expand per batch oleh FastEncoder.
+
+    `shard_indices` membatasi dataset ke sebagian shard (mis. shard baru plus
+    sampel shard lama saat fine-tuning incremental).
+    """
+
+    def __init__(self, shard_dir, encoder, batch_size=128, validation_split=0.1, seed=0,
+                 shard_indices=None):
+        self.encoder = encoder
+        self.batch_size = int(batch_size)
+        self.seed = seed
+        self._epoch = 0
+        self.shards = []
+        indices = range(count_shards(shard_dir)) if shard_indices is None else shard_indices
+        for index in indices:
+            numeric = np.load(os.path.join(shard_dir, SHARD_PATTERN.format(index, 'numeric')),
+                              mmap_mode='r')
+            codes = np.load(os.path.join(shard_dir, SHARD_PATTERN.format(index, 'codes')),
+                            mmap_mode='r')
+            # Ekor setiap shard menjadi data validasi (seperti validation_split Keras)
+            n_train = len(numeric) - int(len(numeric) * validation_split)
+            self.shards.append((numeric, codes, n_train))
+        if not self.shards:
+            raise ValueError(f"Tidak ada shard di {shard_dir}")
+        self.train_rows = sum(n_train for _, _, n_train in self.shards)
+        self.validation_rows = sum(len(numeric) - n_train for numeric, _, n_train in self.shards)
+
+    def _batch_count(self, shard_rows):
+        return sum(-(-rows // self.batch_size) for rows in shard_rows)
+
+    def _expand(self, numeric, codes):
+        return self.encoder.expand(np.asarray(numeric, dtype=np.float64), np.asarray(codes, dtype=np.int64))
+
+    def train_batches(self):
+        """Satu epoch: urutan shard dan baris dalam shard diacak, satu shard dibaca sekaligus."""
+        rng = np.random.default_rng(self.seed + self._epoch)
+        self._epoch += 1
+        for shard_index in rng.permutation(len(self.shards)):
+            numeric, codes, n_train = self.shards[shard_index]
+            order = rng.permutation(n_train)
+            shard_numeric = np.asarray(numeric[:n_train])
+            shard_codes = np.asarray(codes[:n_train])
+            for start in range(0, n_train, self.batch_size):
+                rows = order[start:start + self.batch_size]
+                X = self._expand(shard_numeric[rows], shard_codes[rows])
+                yield X, X
+
+    def validation_batches(self):
+        for numeric, codes, n_train in self.shards:
+            for start in range(n_train, len(numeric), self.batch_size):
+                X = self._expand(numeric[start:start + self.batch_size],
+                                 codes[start:start + self.batch_size])
+                yield X, X
+
+    def as_tf_datasets(self):
+        """(train, validation) tf.data.Dataset dengan prefetch di background."""
+        import tensorflow as tf
+
+        signature = (tf.TensorSpec(shape=(None, self.encoder.width), dtype=tf.float32),
+                     tf.TensorSpec(shape=(None, self.encoder.width), dtype=tf.float32))
+        train = tf.data.Dataset.from_generator(self.train_batches, output_signature=signature)
+        # Cardinality eksplisit agar Keras tahu panjang epoch (progress bar, tanpa warning)
+        train = train.apply(tf.data.experimental.assert_cardinality(
+            self._batch_count(n_train for _, _, n_train in self.shards)))
+        train = train.prefetch(tf.data.AUTOTUNE)
+        logging.info(
+            f"Shard dataset: {len(self.shards)} shard, {self.train_rows} baris train, "
+            f"{self.validation_rows} baris validasi")
+        if self.validation_rows == 0:
+            return train, None
+        validation = tf.data.Dataset.from_generator(
+            self.validation_batches, output_signature=signature)
+        validation = validation.apply(tf.data.experimental.assert_cardinality(
+            self._batch_count(len(numeric) - n_train for numeric, _, n_train in self.shards)))
+        return train, validation.prefetch(tf.data.AUTOTUNE)
@@ -0,0 +1,182 @@
+# =========================
+# Quantile Sketch (KLL) untuk Threshold
+# =========================
+# Sketch KLL (Karnin-Lang-Liberty) yang mergeable: distribusi
+# reconstruction error dirangkum dalam beberapa compactor berukuran
+# ~k item, sehingga quantile bisa diestimasi dari jutaan error tanpa
+# menyimpan atau men-sort semuanya. train.py membangun sketch dari error
+# data validasi dan menyimpannya di threshold.json; service melanjutkan
+# update secara online dan mengambil dynamic threshold dari sketch ini.
+import math
+import threading
+
+import numpy as np
+
+DEFAULT_K = 200
+# Rasio kapasitas compactor antar level (nilai standar KLL)
+CAPACITY_DECAY = 2.0 / 3.0
+DEFAULT_MIN_COUNT = 1000
+# Quantile dihitung ulang jika jumlah data bertambah lebih dari fraksi ini
+DEFAULT_REFRESH_FRACTION = 0.01
+
+
+class KLLSketch:
+    """Sketch quantile KLL; update dan merge secara vektor dengan NumPy."""
+
+    def __init__(self, k=DEFAULT_K, seed=0):
+        self.k = int(k)
+        self.n = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.levels = [np.empty(0, dtype=np.float64)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * CAPACITY_DECAY ** depth)))
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        self.n += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """Gabungkan sketch lain ke sketch ini (in-place)."""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0, dtype=np.float64))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0, dtype=np.float64))
+                items = np.sort(items)
+                # Jumlah ganjil: satu item tetap di level ini
+                keep = items[:1] if len(items) % 2 else items[:0]
+                paired = items[len(keep):]
+                promoted = paired[int(self._rng.integers(0, 2))::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def _weighted(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items_), 2.0 ** level)
+                                  for level, items_ in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], np.cumsum(weights[order])
+
+    def quantile(self, q):
+        """Estimasi quantile q (0..1). NaN jika sketch kosong."""
+        if self.n == 0:
+            return math.nan
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        items, cumulative = self._weighted()
+        index = int(np.searchsorted(cumulative, q * cumulative[-1], side='left'))
+        return float(items[min(index, len(items) - 1)])
+
+    def rank(self, value):
+        """Estimasi fraksi data <= value."""
+        if self.n == 0:
+            return math.nan
+        items, cumulative = self._weighted()
+        index = int(np.searchsorted(items, value, side='right'))
+        return float(cumulative[index - 1] / cumulative[-1]) if index else 0.0
+
+    @property
+    def retained(self):
+        return int(sum(len(items) for items in self.levels))
+
+    def to_dict(self):
+        return {
+            'type': 'kll',
+            'k': self.k,
+            'n': self.n,
+            'min': self.min if self.n else None,
+            'max': self.max if self.n else None,
+            'levels': [items.tolist() for items in self.levels],
+        }
+
+    @classmethod
+    def from_dict(cls, data, seed=0):
+        if data.get('type') != 'kll':
+            raise ValueError(f"Tipe sketch tidak dikenal: {data.get('type')}")
+        sketch = cls(k=data['k'], seed=seed)
+        sketch.n = int(data['n'])
+        if sketch.n:
+            sketch.min = float(data['min'])
+            sketch.max = float(data['max'])
+        sketch.levels = [np.asarray(items, dtype=np.float64) for items in data['levels']] or \
+            [np.empty(0, dtype=np.float64)]
+        return sketch
+
+    def copy(self):
+        return KLLSketch.from_dict(self.to_dict())
+
+
+class OnlineQuantile:
+    """Sketch global yang di-update tiap request, dengan quantile ter-cache.
+
+    quantile() O(1) per request: nilai hanya dihitung ulang setelah jumlah
+    data bertambah lebih dari `refresh_fraction` sejak perhitungan terakhir.
+    """
+
+    def __init__(self, sketch, q, min_count=DEFAULT_MIN_COUNT,
+                 refresh_fraction=DEFAULT_REFRESH_FRACTION, source='training'):
+        self.sketch = sketch
+        self.q = q
+        self.min_count = min_count
+        self.refresh_fraction = refresh_fraction
+        self.source = source
+        self.initial_count = sketch.n
+        self._lock = threading.Lock()
+        self._cached = None
+        self._cached_at = -1
+
+    @property
+    def ready(self):
+        return self.sketch.n >= self.min_count
+
+    def update(self, errors):
+        with self._lock:
+            self.sketch.update(errors)
+
+    def quantile(self):
+        with self._lock:
+            n = self.sketch.n
+            if self._cached is None or n - self._cached_at > self.refresh_fraction * max(self._cached_at, 1):
+                self._cached = self.sketch.quantile(self.q)
+                self._cached_at = n
+            return self._cached
+
+    def describe(self):
+        with self._lock:
+            n = self.sketch.n
+        return {
+            'source': self.source,
+            'percentile': self.q * 100,
+            'count': n,
+            'training_count': self.initial_count,
+            'online_count': n - self.initial_count,
+            'ready': n >= self.min_count,
+            'value': self.quantile() if n else None,
+        }
@@ -0,0 +1,130 @@
+# =========================
+# Utilitas Streaming untuk /predict/stream
+# =========================
+# Input NDJSON dibaca baris per baris dan dikelompokkan menjadi chunk
+# berukuran tetap, sehingga memory puncak bergantung pada ukuran chunk,
+# bukan ukuran batch. Threshold dinamis dihitung dalam satu pass dari
+# distribusi error global / sketch KLL, atau dengan opsi two-pass (spool ke disk).
+import json
+import pickle
+import tempfile
+
+import numpy as np
+
+from pipeline import relaxed_threshold
+from sketch import KLLSketch
+
+THRESHOLD_MODES = ('single-pass', 'two-pass')
+
+
+def parse_threshold_mode(raw):
+    mode = (raw or 'single-pass').lower()
+    if mode not in THRESHOLD_MODES:
+        raise ValueError(
+            f'Parameter "threshold" harus salah satu dari {list(THRESHOLD_MODES)}.')
+    return mode
+
+
+def parse_chunk_size(raw, default):
+    try:
+        chunk_size = int(raw) if raw not in (None, '') else int(default)
+    except (TypeError, ValueError):
+        raise ValueError('Parameter "chunk_size" harus berupa integer.')
+    if chunk_size <= 0:
+        raise ValueError('Parameter "chunk_size" harus lebih dari 0.')
+    return chunk_size
+
+
+def iter_transaction_chunks(stream, chunk_size):
+    """Baca NDJSON (satu transaksi atau satu JSON array per baris) per chunk."""
+    chunk = []
+    for line_no, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Baris {line_no} bukan JSON yang valid: {e}")
+        for transaction in item if isinstance(item, list) else [item]:
+            if not isinstance(transaction, dict):
+                raise ValueError(
+                    f"Baris {line_no}: setiap transaksi harus berupa object JSON.")
+            chunk.append(transaction)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def encode_ndjson(columns, count, layout='records'):
+    """Serialisasi hasil satu chunk: satu baris per record, atau satu baris columnar."""
+    if layout == 'columnar':
+        return json.dumps({'count': count, 'columns': columns}) + '\n'
+    keys = list(columns.keys())
+    return ''.join(json.dumps(dict(zip(keys, row))) + '\n'
+                   for row in zip(*columns.values()))
+
+
+class StreamingThreshold:
+    """Aturan static/dynamic threshold /predict, diterapkan kumulatif per chunk.
+
+    Laju anomali static dihitung dari semua chunk yang sudah diproses; jika
+    dynamic threshold dibutuhkan, nilainya dihitung seperti relaxed_threshold
+    dengan percentile batch diambil dari sketch KLL stream ini.
+    """
+
+    def __init__(self, static_threshold, select_threshold, percentile, distribution=None):
+        self.static_threshold = static_threshold
+        self.total = 0
+        self.exceed = 0
+        self._select = select_threshold
+        self._percentile = percentile
+        self._distribution = distribution
+        self._sketch = KLLSketch()
+
+    def update(self, errors):
+        self.total += len(errors)
+        self.exceed += int((errors > self.static_threshold).sum())
+        self._sketch.update(errors)
+        return self.current()
+
+    def _dynamic_threshold(self):
+        return relaxed_threshold(self.static_threshold, self._distribution, self.total,
+                                 lambda: self._sketch.quantile(self._percentile / 100.0))
+
+    def current(self):
+        return self._select(self.static_threshold, self.exceed, self.total,
+                            self._dynamic_threshold)
+
+
+class ResultSpool:
+    """Spool hasil per chunk ke file sementara untuk mode two-pass.
+
+    Di memory hanya tersisa array error float32 (4 byte per baris) yang
+    dibutuhkan untuk menghitung percentile exact di akhir pass pertama.
+    """
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile()
+        self._errors = []
+
+    def append(self, columns, errors):
+        pickle.dump(columns, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._errors.append(np.asarray(errors, dtype=np.float32))
+
+    @property
+    def errors(self):
+        if not self._errors:
+            return np.empty(0, dtype=np.float32)
+        return np.concatenate(self._errors)
+
+    def replay(self):
+        """Yield (columns, errors) per chunk sesuai urutan semula."""
+        self._file.seek(0)
+        for errors in self._errors:
+            yield pickle.load(self._file), errors
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,169 @@
+# =========================
+# Test Atribusi Error per Fitur (topFeatures)
+# =========================
+# Jalankan dari direktori model/:
+#   python -m unittest discover -s tests
+# Hasil np.add.reduceat dibandingkan dengan penjumlahan brute-force per
+# kolom, memakai pemetaan kolom -> fitur asli yang dibangun dari struktur
+# ColumnTransformer (bukan dari nama kolom), dan jumlah kontribusi harus
+# sama dengan anomalyScore.
+import os
+import sys
+import types
+import unittest
+import dataclasses
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import attribution  # noqa: E402
+from attribution import FeatureGroups, feature_groups  # noqa: E402
+from features import FastEncoder  # noqa: E402
+
+MODEL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NUMERIC = ['amount', 'hour']
+# 'user' dan 'user_id' berbagi prefix, dan kategori 'id_5' membuat nama kolom
+# one-hot 'user_id_5' yang terlihat seperti milik 'user_id'
+CATEGORICAL = ['merchant', 'user', 'user_id']
+
+
+def column_sources(preprocessor):
+    """Fitur asli tiap kolom output, dari transformers_ dan categories_."""
+    sources = []
+    for name, transformer, columns in preprocessor.transformers_:
+        if name == 'remainder':
+            continue
+        if isinstance(transformer, OneHotEncoder):
+            for column, categories in zip(columns, transformer.categories_):
+                sources.extend([column] * len(categories))
+        else:
+            sources.extend(columns)
+    return sources
+
+
+def brute_force_contributions(squared_errors, sources, features):
+    width = squared_errors.shape[1]
+    result = np.zeros((len(squared_errors), len(features)))
+    for column, source in enumerate(sources):
+        result[:, features.index(source)] += squared_errors[:, column]
+    return result / width
+
+
+class FeatureGroupsTest(unittest.TestCase):
+    def setUp(self):
+        train = pd.DataFrame({
+            'amount': [10.0, 250.0, 3000.0, 45.0],
+            'hour': [1.0, 13.0, 22.0, 8.0],
+            'merchant': ['toko_a', 'toko_b', 'user_x', 'toko_a'],
+            'user': ['web', 'id_5', 'web', 'mobile'],
+            'user_id': ['u1', 'u2', 'u3', 'u1'],
+        })
+        self.preprocessor = ColumnTransformer([
+            ('num', StandardScaler(), NUMERIC),
+            ('cat', OneHotEncoder(handle_unknown='ignore', sparse_output=False), CATEGORICAL),
+        ]).fit(train)
+        self.encoder = FastEncoder.from_column_transformer(self.preprocessor)
+        self.sources = column_sources(self.preprocessor)
+        self.squared = np.random.default_rng(0).random((6, len(self.sources)))
+
+    def test_encoder_groups_match_brute_force(self):
+        groups = FeatureGroups.from_encoder(self.encoder)
+        self.assertEqual(groups.features, NUMERIC + CATEGORICAL)
+        self.assertEqual(groups.width, len(self.sources))
+        expected = brute_force_contributions(self.squared, self.sources, groups.features)
+        np.testing.assert_allclose(groups.contributions(self.squared), expected, rtol=1e-12)
+
+    def test_contributions_sum_to_score(self):
+        groups = FeatureGroups.from_encoder(self.encoder)
+        np.testing.assert_allclose(groups.contributions(self.squared).sum(axis=1),
+                                   self.squared.mean(axis=1), rtol=1e-12)
+
+    def test_ambiguous_names_rejected_by_name_mapping(self):
+        # Pemetaan dari nama tidak bisa membedakan 'user' + 'id_5' dari 'user_id'
+        with self.assertRaisesRegex(ValueError, 'bersebelahan'):
+            FeatureGroups.from_feature_names(self.preprocessor.get_feature_names_out(),
+                                             NUMERIC + CATEGORICAL)
+
+    def test_name_mapping_matches_brute_force_for_unambiguous_names(self):
+        train = pd.DataFrame({'amount': [1.0, 2.0, 3.0], 'hour': [1.0, 2.0, 3.0],
+                              'merchant': ['toko_a', 'user_id_x', 'toko_b'],
+                              'user_id': ['u1', 'u2', 'u1']})
+        preprocessor = ColumnTransformer([
+            ('num', StandardScaler(), NUMERIC),
+            ('cat', OneHotEncoder(handle_unknown='ignore', sparse_output=False),
+             ['merchant', 'user_id']),
+        ]).fit(train)
+        sources = column_sources(preprocessor)
+        groups = FeatureGroups.from_feature_names(preprocessor.get_feature_names_out(),
+                                                  list(preprocessor.feature_names_in_))
+        self.assertEqual(groups.features, NUMERIC + ['merchant', 'user_id'])
+        squared = np.random.default_rng(1).random((4, len(sources)))
+        np.testing.assert_allclose(groups.contributions(squared),
+                                   brute_force_contributions(squared, sources, groups.features),
+                                   rtol=1e-12)
+
+    def test_top_k_order_and_shares(self):
+        groups = FeatureGroups.from_encoder(self.encoder)
+        contributions = groups.contributions(self.squared)
+        top, values, shares = groups.top_k(self.squared, k=3)
+        for row in range(len(self.squared)):
+            expected = np.argsort(-contributions[row], kind='stable')[:3]
+            self.assertEqual(top[row].tolist(), expected.tolist())
+            np.testing.assert_allclose(shares[row], values[row] / contributions[row].sum())
+
+    def test_feature_groups_prefers_encoder_layout(self):
+        attribution._cache.clear()
+        bundle = types.SimpleNamespace(version='attribution-test', encoder=self.encoder,
+                                       preprocessor=self.preprocessor)
+        self.assertEqual(feature_groups(bundle).starts.tolist(),
+                         FeatureGroups.from_encoder(self.encoder).starts.tolist())
+
+
+@unittest.skipUnless(os.path.exists(os.path.join(MODEL_DIR, 'threshold.json')),
+                     'artefak model tidak tersedia')
+class ExplainPredictTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        import app as service
+        service.wait_until_ready()
+        cls.service = service
+        cls.client = service.app.test_client()
+        cls.bundle = service.registry.current()
+
+    def tearDown(self):
+        self.service.registry._bundle = self.bundle
+
+    def test_top_features_sum_to_anomaly_score(self):
+        rng = np.random.default_rng(3)
+        transactions = [{'id': f'x{i}', 'amount': float(rng.integers(20000, 90000000)),
+                         'merchant': 'Tokopedia', 'channel': 'mobile',
+                         'hour': int(rng.integers(0, 24)), 'user_id': int(rng.integers(1, 50))}
+                        for i in range(16)]
+        groups = feature_groups(self.bundle)
+        first = self.client.post('/predict', json={'transactions': transactions}).get_json()
+        scores = np.array([row['anomalyScore'] for row in first])
+        # Seperempat baris teratas anomali (di bawah 50% agar dynamic threshold tidak aktif)
+        self.service.registry._bundle = dataclasses.replace(
+            self.bundle, threshold=float(np.percentile(scores, 75)))
+        k = min(len(groups.features), self.service.MAX_EXPLAIN_TOP_K)
+        response = self.client.post(f'/predict?explain={k}', json={'transactions': transactions})
+        self.assertEqual(response.status_code, 200)
+        rows = [row for row in response.get_json() if row['isAnomaly']]
+        self.assertTrue(rows)
+        for row in rows:
+            errors = [entry['error'] for entry in row['topFeatures']]
+            self.assertEqual(errors, sorted(errors, reverse=True))
+            if k == len(groups.features):
+                self.assertAlmostEqual(sum(errors), row['anomalyScore'], places=6)
+                self.assertAlmostEqual(sum(entry['share'] for entry in row['topFeatures']), 1.0,
+                                       places=3)
+            else:
+                self.assertLessEqual(sum(errors), row['anomalyScore'] + 1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
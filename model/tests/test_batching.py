@@ -0,0 +1,102 @@
+# =========================
+# Test Micro-Batcher
+# =========================
+# Jalankan dari direktori model/:
+#   python -m unittest discover -s tests
+# Backend palsu menahan inference pertama sampai request lain sudah antre,
+# sehingga request berikutnya pasti digabung menjadi satu batch.
+import os
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batching import MicroBatcher  # noqa: E402
+
+
+class GatedBackend:
+    """Error per baris = jumlah kolom; NaN di input membuat inference gagal."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.entered = threading.Event()
+        self.calls = []
+
+    def reconstruction_errors(self, X):
+        self.entered.set()
+        self.gate.wait(timeout=5)
+        self.calls.append(len(X))
+        if np.isnan(X).any():
+            raise ValueError('input NaN')
+        return X.sum(axis=1)
+
+
+class MicroBatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.backend = GatedBackend()
+        self.batcher = MicroBatcher(max_batch_size=64, max_wait_ms=50).start()
+        self.pool = ThreadPoolExecutor(max_workers=8)
+
+    def tearDown(self):
+        self.backend.gate.set()
+        self.batcher.stop()
+        self.pool.shutdown(wait=True)
+
+    def submit_queued(self, inputs):
+        """Submit request pertama (tertahan di backend), lalu sisanya sampai semua antre."""
+        futures = [self.pool.submit(self.batcher.submit, self.backend, inputs[0])]
+        self.wait_for(self.backend.entered.is_set)
+        for X in inputs[1:]:
+            futures.append(self.pool.submit(self.batcher.submit, self.backend, X))
+        self.wait_for(lambda: self.batcher.queue_depth == len(inputs) - 1)
+        self.backend.gate.set()
+        return futures
+
+    def wait_for(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail('timeout menunggu antrean micro-batcher')
+            time.sleep(0.001)
+
+    def test_results_split_back_to_callers_in_order(self):
+        # Ukuran request berbeda-beda agar offset pemecahan ikut teruji
+        inputs = [np.arange(n * 3, dtype=np.float32).reshape(n, 3) + 100 * i
+                  for i, n in enumerate([1, 2, 5, 1, 3])]
+        futures = self.submit_queued(inputs)
+        for X, future in zip(inputs, futures):
+            np.testing.assert_array_equal(future.result(timeout=5), X.sum(axis=1))
+        # Request pertama sendirian, empat sisanya satu forward pass
+        self.assertEqual(self.backend.calls, [1, 11])
+        # Statistik dicatat setelah future terisi
+        self.wait_for(lambda: self.batcher.stats()['batches_total'] == 2)
+        stats = self.batcher.stats()
+        self.assertEqual((stats['batches_total'], stats['requests_total'], stats['rows_total']),
+                         (2, 5, 12))
+
+    def test_failing_request_does_not_fail_batch(self):
+        inputs = [np.ones((2, 3), dtype=np.float32) * i for i in range(1, 5)]
+        inputs[2] = inputs[2].copy()
+        inputs[2][1, 0] = np.nan
+        with self.assertLogs(level='ERROR'):
+            futures = self.submit_queued(inputs)
+            self.wait_for(lambda: all(future.done() for future in futures))
+        for i in (0, 1, 3):
+            np.testing.assert_array_equal(futures[i].result(), inputs[i].sum(axis=1))
+        with self.assertRaisesRegex(ValueError, 'input NaN'):
+            futures[2].result()
+
+    def test_large_request_bypasses_queue(self):
+        self.backend.gate.set()
+        X = np.ones((64, 2), dtype=np.float32)
+        np.testing.assert_array_equal(self.batcher.submit(self.backend, X), np.full(64, 2.0))
+        self.assertEqual(self.batcher.stats()['bypassed_total'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
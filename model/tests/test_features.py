@@ -0,0 +1,129 @@
+# =========================
+# Test FastEncoder vs ColumnTransformer
+# =========================
+# Jalankan dari direktori model/:
+#   python -m unittest discover -s tests
+# Setiap kasus dibandingkan bit-per-bit dengan preprocessor.transform(...)
+# .astype(np.float32), di jalur batch kecil (dict) dan batch besar (pandas Index).
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from features import (SMALL_BATCH_ROWS, FastEncoder, UnsupportedPreprocessorError,  # noqa: E402
+                      create_encoder, verify_encoder)
+
+NUMERIC = ['amount', 'hour']
+CATEGORICAL = ['merchant', 'user_id']
+
+
+def fit_preprocessor(df):
+    # Sama dengan build_preprocessor di train.py
+    return ColumnTransformer([
+        ('num', StandardScaler(), NUMERIC),
+        ('cat', OneHotEncoder(handle_unknown='ignore', sparse_output=False), CATEGORICAL),
+    ]).fit(df)
+
+
+def object_frame(merchants, users):
+    n = len(merchants)
+    return pd.DataFrame({
+        'amount': np.linspace(10.0, 5000.0, n),
+        'hour': np.arange(n, dtype=np.float64) % 24,
+        'merchant': pd.Series(merchants, dtype=object),
+        'user_id': pd.Series(users, dtype=object),
+    })
+
+
+class FastEncoderTest(unittest.TestCase):
+    def setUp(self):
+        self.train = object_frame(['toko_a', 'toko_b', 'toko_c', 'toko_a', 'toko_b'],
+                                  ['u1', 'u2', 'u3', 'u1', 'u4'])
+        self.preprocessor = fit_preprocessor(self.train)
+        self.encoder = FastEncoder.from_column_transformer(self.preprocessor)
+
+    def assertSameAsSklearn(self, df, preprocessor=None, encoder=None):
+        preprocessor = preprocessor or self.preprocessor
+        encoder = encoder or self.encoder
+        # Ulang frame agar jalur batch besar (pandas Index) ikut teruji
+        repeats = SMALL_BATCH_ROWS // len(df) + 1
+        for frame in (df, pd.concat([df] * repeats, ignore_index=True)):
+            expected = np.asarray(preprocessor.transform(frame)).astype(np.float32)
+            actual = encoder.transform(frame)
+            self.assertEqual(actual.dtype, np.float32)
+            self.assertEqual(actual.shape, expected.shape)
+            self.assertTrue(np.array_equal(actual, expected),
+                            f"berbeda pada {len(frame)} baris:\n{actual - expected}")
+
+    def test_known_categories(self):
+        self.assertSameAsSklearn(self.train)
+        self.assertEqual(self.encoder.feature_names,
+                         list(self.preprocessor.get_feature_names_out()))
+
+    def test_unknown_categories_encode_as_zero(self):
+        df = object_frame(['toko_a', 'toko_baru', 'toko_c'], ['u9', 'u2', 'u99'])
+        self.assertSameAsSklearn(df)
+        onehot = self.encoder.transform(df)[:, len(NUMERIC):]
+        # Satu kolom aktif per fitur yang dikenal, nol untuk yang tidak
+        self.assertEqual(onehot.sum(axis=1).tolist(), [1.0, 1.0, 1.0])
+
+    def test_missing_categoricals_without_missing_category(self):
+        df = object_frame([None, np.nan, float('nan'), 'toko_b'], ['u1', None, np.nan, 'u2'])
+        self.assertSameAsSklearn(df)
+
+    def test_missing_categoricals_with_nan_category(self):
+        train = object_frame(['toko_a', np.nan, 'toko_b'], ['u1', 'u2', np.nan])
+        preprocessor = fit_preprocessor(train)
+        encoder = FastEncoder.from_column_transformer(preprocessor)
+        # NaN float apa pun (bukan hanya objek np.nan) masuk kategori NaN; None tidak
+        df = object_frame([float('nan'), None, np.nan, 'toko_a'],
+                          [None, float('nan'), 'u1', np.nan])
+        self.assertSameAsSklearn(df, preprocessor, encoder)
+
+    def test_missing_categoricals_with_none_category(self):
+        train = object_frame(['toko_a', None, 'toko_b'], ['u1', 'u2', None])
+        preprocessor = fit_preprocessor(train)
+        encoder = FastEncoder.from_column_transformer(preprocessor)
+        df = object_frame([None, float('nan'), 'toko_b'], [np.nan, None, 'u2'])
+        self.assertSameAsSklearn(df, preprocessor, encoder)
+
+    def test_column_order_and_extra_columns(self):
+        df = object_frame(['toko_c', 'toko_a', 'asing'], ['u3', 'u1', 'u2'])
+        df['transaction_id'] = ['t1', 't2', 't3']
+        shuffled = df[['user_id', 'transaction_id', 'hour', 'merchant', 'amount']]
+        expected = np.asarray(self.preprocessor.transform(df)).astype(np.float32)
+        self.assertTrue(np.array_equal(self.encoder.transform(shuffled), expected))
+        self.assertEqual(self.encoder.input_features, NUMERIC + CATEGORICAL)
+
+    def test_reused_buffer(self):
+        df = object_frame(['toko_a', 'toko_b'], ['u1', 'u2'])
+        out = np.full((2, self.encoder.width), 7.0, dtype=np.float32)
+        self.assertIs(self.encoder.transform(df, out=out), out)
+        self.assertSameAsSklearn(df)
+        self.assertTrue(np.array_equal(out, self.encoder.transform(df)))
+        with self.assertRaises(ValueError):
+            self.encoder.transform(df, out=np.zeros((3, self.encoder.width), dtype=np.float32))
+
+    def test_verify_encoder_probe(self):
+        verify_encoder(self.encoder, self.preprocessor)
+
+    def test_unsupported_preprocessor(self):
+        preprocessor = ColumnTransformer([
+            ('num', StandardScaler(), NUMERIC),
+            ('cat', OneHotEncoder(handle_unknown='error', sparse_output=False), CATEGORICAL),
+        ]).fit(self.train)
+        with self.assertRaises(UnsupportedPreprocessorError):
+            FastEncoder.from_column_transformer(preprocessor)
+        with self.assertLogs(level='WARNING'):
+            self.assertIsNone(create_encoder(preprocessor, name='fast'))
+        self.assertIsNone(create_encoder(self.preprocessor, name='sklearn'))
+
+
+if __name__ == '__main__':
+    unittest.main()
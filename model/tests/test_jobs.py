@@ -0,0 +1,220 @@
+# =========================
+# Test Job API (JobManager)
+# =========================
+# Jalankan dari direktori model/:
+#   python -m unittest discover -s tests
+# Runner palsu menulis chunk berisi nomor baris dan bisa ditahan dengan
+# Event, sehingga antrean penuh, pembatalan di tengah job, dan slot
+# eksekusi lintas manager (= lintas worker proses) bisa diuji deterministik.
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jobs import JobManager, JobQueueFull  # noqa: E402
+
+MODEL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def numbered_runner(total, chunk_size, gate=None):
+    """Runner yang menulis baris 0..total-1 per chunk; tertahan di `gate` setelah tiap chunk."""
+    def run(job):
+        for start in range(0, total, chunk_size):
+            job.check_cancelled()
+            rows = list(range(start, min(start + chunk_size, total)))
+            job.add_chunk({'row': rows}, len(rows), 0)
+            if gate is not None:
+                gate.wait(timeout=5)
+    return run
+
+
+class JobManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.gate = threading.Event()
+
+    def tearDown(self):
+        self.gate.set()
+        self.directory.cleanup()
+
+    def manager(self, **kwargs):
+        return JobManager(self.directory.name, **kwargs)
+
+    def wait_state(self, manager, job_id, states, timeout=5):
+        deadline = time.monotonic() + timeout
+        while True:
+            status = manager.status(job_id)
+            if status is not None and status['state'] in states:
+                return status
+            if time.monotonic() > deadline:
+                self.fail(f'timeout menunggu job {job_id} ({status and status["state"]})')
+            time.sleep(0.01)
+
+    def test_pagination_across_chunks(self):
+        manager = self.manager()
+        job_id = manager.submit(numbered_runner(25, 4), total=25)['id']
+        status = self.wait_state(manager, job_id, ('succeeded',))
+        self.assertEqual((status['processed'], status['progress'], status['chunks']), (25, 1.0, 7))
+
+        rows, offset = [], 0
+        while offset < 25:
+            page = manager.read_results(job_id, offset, 7)['row']
+            self.assertLessEqual(len(page), 7)
+            rows.extend(page)
+            offset += len(page)
+        self.assertEqual(rows, list(range(25)))
+        self.assertEqual(manager.read_results(job_id, 25, 7), {})
+        self.assertEqual([count for _, count in manager.iter_results(job_id)], [4] * 6 + [1])
+
+    def test_cancel_keeps_partial_results(self):
+        manager = self.manager()
+        job_id = manager.submit(numbered_runner(20, 5, self.gate), total=20)['id']
+        status = self.wait_state(manager, job_id, ('running',))
+        # Job aktif tidak bisa dihapus
+        self.assertFalse(manager.delete(job_id))
+        while manager.status(job_id)['processed'] < 5:
+            time.sleep(0.01)
+        self.assertTrue(manager.cancel(job_id)['cancel_requested'])
+        self.gate.set()
+        status = self.wait_state(manager, job_id, ('cancelled',))
+        # Berhenti sebelum chunk kedua; hasil parsial tetap terbaca
+        self.assertEqual((status['processed'], status['progress']), (5, 0.25))
+        self.assertEqual(manager.read_results(job_id, 0, 100)['row'], list(range(5)))
+        self.assertTrue(manager.delete(job_id))
+        self.assertIsNone(manager.status(job_id))
+
+    def test_cancel_queued_job_never_runs(self):
+        manager = self.manager(workers=1, max_queued=1)
+        first = manager.submit(numbered_runner(5, 5, self.gate), total=5)['id']
+        self.wait_state(manager, first, ('running',))
+        ran = threading.Event()
+        second = manager.submit(lambda job: ran.set())['id']
+        manager.cancel(second)
+        self.wait_state(manager, second, ('cancelled',))
+        self.assertFalse(ran.is_set())
+        self.gate.set()
+        self.wait_state(manager, first, ('succeeded',))
+
+    def test_queue_full_raises(self):
+        manager = self.manager(workers=1, max_queued=1)
+        ids = [manager.submit(numbered_runner(5, 5, self.gate), total=5)['id'] for _ in range(2)]
+        with self.assertRaises(JobQueueFull):
+            manager.submit(numbered_runner(5, 5), total=5)
+        self.gate.set()
+        for job_id in ids:
+            self.wait_state(manager, job_id, ('succeeded',))
+        # Setelah antrean kosong job baru diterima lagi
+        job_id = manager.submit(numbered_runner(5, 5), total=5)['id']
+        self.wait_state(manager, job_id, ('succeeded',))
+
+    def test_concurrency_limit_shared_between_managers(self):
+        # Dua manager di direktori yang sama = dua worker `serve`: total tetap `workers` job berjalan
+        first, second = self.manager(workers=1, max_queued=1), self.manager(workers=1, max_queued=1)
+        a = first.submit(numbered_runner(5, 5, self.gate), total=5)['id']
+        self.wait_state(first, a, ('running',))
+        b = second.submit(numbered_runner(5, 5, self.gate), total=5)['id']
+        time.sleep(0.3)
+        self.assertEqual(second.status(b)['state'], 'queued')
+        # Batas antrean juga dihitung dari job kedua manager
+        with self.assertRaises(JobQueueFull):
+            first.submit(numbered_runner(5, 5), total=5)
+        self.gate.set()
+        self.wait_state(first, a, ('succeeded',))
+        self.wait_state(second, b, ('succeeded',))
+
+    def test_expired_jobs_purged_on_status_read(self):
+        manager = self.manager(ttl_seconds=0.05)
+        job_id = manager.submit(numbered_runner(3, 3), total=3)['id']
+        self.wait_state(manager, job_id, ('succeeded',))
+        time.sleep(0.1)
+        manager.stats()
+        self.assertFalse(os.path.exists(os.path.join(self.directory.name, job_id)))
+
+
+@unittest.skipUnless(os.path.exists(os.path.join(MODEL_DIR, 'threshold.json')),
+                     'artefak model tidak tersedia')
+class JobRoutesTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        import app as service
+        service.wait_until_ready()
+        if service.job_manager is None:
+            raise unittest.SkipTest('Job API tidak aktif')
+        cls.service = service
+        cls.client = service.app.test_client()
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.original_manager = self.service.job_manager
+
+    def tearDown(self):
+        self.service.job_manager = self.original_manager
+        self.directory.cleanup()
+
+    def transactions(self, n):
+        rng = np.random.default_rng(0)
+        return [{'id': f't{i}', 'amount': float(rng.integers(20000, 900000)),
+                 'merchant': 'Tokopedia', 'channel': 'mobile', 'hour': int(rng.integers(0, 24)),
+                 'user_id': int(rng.integers(1, 50))} for i in range(n)]
+
+    def wait_done(self, job_id):
+        deadline = time.monotonic() + 30
+        while True:
+            status = self.client.get(f'/jobs/{job_id}').get_json()
+            if status['state'] not in ('queued', 'running'):
+                return status
+            if time.monotonic() > deadline:
+                self.fail('timeout menunggu job')
+            time.sleep(0.05)
+
+    def test_results_pagination(self):
+        self.service.job_manager = JobManager(self.directory.name)
+        transactions = self.transactions(23)
+        response = self.client.post('/jobs', json={'transactions': transactions, 'chunk_size': 5})
+        self.assertEqual(response.status_code, 202)
+        status = self.wait_done(response.get_json()['id'])
+        self.assertEqual(status['state'], 'succeeded')
+
+        ids, offset = [], 0
+        while offset is not None:
+            page = self.client.get(f"/jobs/{status['id']}/results?offset={offset}&limit=7").get_json()
+            ids.extend(row['id'] for row in page['results'])
+            offset = page['next_offset']
+        self.assertEqual(ids, [t['id'] for t in transactions])
+
+    def test_queue_full_returns_429(self):
+        manager = JobManager(self.directory.name, workers=1, max_queued=0)
+        self.service.job_manager = manager
+        gate = threading.Event()
+        job_id = manager.submit(numbered_runner(1, 1, gate))['id']
+        try:
+            response = self.client.post('/jobs', json={'transactions': self.transactions(3)})
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response.headers['Retry-After'], str(self.service.JOBS_RETRY_AFTER))
+        finally:
+            gate.set()
+        self.assertEqual(self.wait_done(job_id)['state'], 'succeeded')
+
+    def test_csv_file_job_reports_progress(self):
+        self.service.job_manager = JobManager(self.directory.name)
+        path = os.path.join(self.directory.name, 'input.csv')
+        pd.DataFrame(self.transactions(12)).to_csv(path, index=False)
+        os.environ['JOBS_INPUT_DIR'] = self.directory.name
+        try:
+            response = self.client.post('/jobs', json={'file': 'input.csv', 'chunk_size': 5})
+        finally:
+            os.environ.pop('JOBS_INPUT_DIR')
+        self.assertEqual(response.status_code, 202)
+        status = self.wait_done(response.get_json()['id'])
+        self.assertEqual((status['state'], status['total'], status['progress']), ('succeeded', 12, 1.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
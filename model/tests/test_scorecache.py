@@ -0,0 +1,192 @@
+# =========================
+# Test Score Cache (content-hash key)
+# =========================
+# Jalankan dari direktori model/:
+#   python -m unittest discover -s tests
+# Key cache yang salah mengembalikan skor basi tanpa error, jadi yang diuji:
+# key berubah untuk input/version berbeda, LRU, persistensi SQLite antar
+# restart, dan /predict yang tetap memakai threshold terbaru saat cache hit.
+import os
+import sys
+import dataclasses
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scorecache import ENTRY_BYTES, ScoreCache, row_keys  # noqa: E402
+
+MODEL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def encoded_rows(n=4):
+    numeric = np.arange(n * 2, dtype=np.float64).reshape(n, 2) / 3.0
+    codes = np.stack([np.arange(n) + 2, np.full(n, 9), np.arange(n) % 2 + 10], axis=1)
+    return numeric, codes.astype(np.int64)
+
+
+class RowKeysTest(unittest.TestCase):
+    def test_deterministic_16_byte_keys(self):
+        numeric, codes = encoded_rows()
+        keys = row_keys(numeric, codes, 'v1')
+        self.assertEqual(keys, row_keys(numeric.copy(), codes.copy(), 'v1'))
+        self.assertTrue(all(isinstance(key, bytes) and len(key) == 16 for key in keys))
+        self.assertEqual(len(set(keys)), len(keys))
+
+    def test_key_depends_on_version_and_every_value(self):
+        numeric, codes = encoded_rows()
+        keys = row_keys(numeric, codes, 'v1')
+        self.assertTrue(set(keys).isdisjoint(row_keys(numeric, codes, 'v2')))
+
+        changed = numeric.copy()
+        changed[1, 1] = np.nextafter(changed[1, 1], np.inf)
+        changed_keys = row_keys(changed, codes, 'v1')
+        self.assertNotEqual(changed_keys[1], keys[1])
+        self.assertEqual(changed_keys[:1] + changed_keys[2:], keys[:1] + keys[2:])
+
+        # Kategori tak dikenal (-1) dan kategori lain tidak berbagi key
+        unknown = codes.copy()
+        unknown[2, 0] = -1
+        self.assertNotEqual(row_keys(numeric, unknown, 'v1')[2], keys[2])
+
+    def test_key_depends_on_column_position(self):
+        numeric = np.array([[1.0, 2.0]])
+        codes = np.array([[5, 7]], dtype=np.int64)
+        self.assertNotEqual(row_keys(numeric, codes, 'v1'),
+                            row_keys(numeric[:, ::-1], codes, 'v1'))
+        self.assertNotEqual(row_keys(numeric, codes, 'v1'),
+                            row_keys(numeric, codes[:, ::-1], 'v1'))
+
+
+class ScoreCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'scores.db')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_hit_and_miss(self):
+        cache = ScoreCache()
+        numeric, codes = encoded_rows()
+        keys = row_keys(numeric, codes, 'v1')
+        cache.store(keys[:2], [0.5, 0.25], 'v1')
+        errors, hit = cache.lookup(keys)
+        self.assertEqual(hit.tolist(), [True, True, False, False])
+        self.assertEqual(errors[:2].tolist(), [0.5, 0.25])
+        self.assertTrue(np.isnan(errors[2:]).all())
+        self.assertEqual((cache.stats()['hits'], cache.stats()['misses']), (2, 2))
+
+    def test_new_model_version_misses(self):
+        cache = ScoreCache()
+        numeric, codes = encoded_rows()
+        cache.store(row_keys(numeric, codes, 'v1'), np.ones(4), 'v1')
+        _, hit = cache.lookup(row_keys(numeric, codes, 'v2'))
+        self.assertFalse(hit.any())
+
+    def test_lru_eviction(self):
+        cache = ScoreCache(max_bytes=3 * ENTRY_BYTES)
+        self.assertEqual(cache.max_entries, 3)
+        keys = [bytes([i]) * 16 for i in range(4)]
+        cache.store(keys[:3], [0.0, 1.0, 2.0], 'v1')
+        # Akses key 0 membuatnya paling baru; key 1 yang dibuang saat key 3 masuk
+        cache.lookup(keys[:1])
+        cache.store(keys[3:], [3.0], 'v1')
+        _, hit = cache.lookup(keys)
+        self.assertEqual(hit.tolist(), [True, False, True, True])
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.stats()['entries'], 3)
+
+    def test_sqlite_persists_across_restart(self):
+        numeric, codes = encoded_rows()
+        keys = row_keys(numeric, codes, 'v1')
+        ScoreCache(path=self.path).store(keys, [0.1, 0.2, 0.3, 0.4], 'v1')
+
+        restarted = ScoreCache(path=self.path)
+        errors, hit = restarted.lookup(keys)
+        self.assertTrue(hit.all())
+        np.testing.assert_allclose(errors, [0.1, 0.2, 0.3, 0.4], rtol=1e-6)
+        self.assertEqual(restarted.stats()['disk_hits'], 4)
+        # Setelah dimuat dari disk, hit berikutnya dari memori
+        restarted.lookup(keys)
+        self.assertEqual(restarted.stats()['disk_hits'], 4)
+
+    def test_sqlite_prunes_old_version(self):
+        numeric, codes = encoded_rows()
+        old_keys = row_keys(numeric, codes, 'v1')
+        ScoreCache(path=self.path).store(old_keys, np.ones(4), 'v1')
+        ScoreCache(path=self.path).store(row_keys(numeric, codes, 'v2'), np.zeros(4), 'v2')
+        _, hit = ScoreCache(path=self.path).lookup(old_keys)
+        self.assertFalse(hit.any())
+
+    def test_after_fork_reopens_store(self):
+        cache = ScoreCache(path=self.path)
+        keys = [b'k' * 16]
+        cache.store(keys, [0.7], 'v1')
+        cache.clear()
+        cache.after_fork()
+        errors, hit = cache.lookup(keys)
+        self.assertTrue(hit.all())
+        self.assertAlmostEqual(float(errors[0]), 0.7, places=6)
+
+
+@unittest.skipUnless(os.path.exists(os.path.join(MODEL_DIR, 'threshold.json')),
+                     'artefak model tidak tersedia')
+class PredictCacheTest(unittest.TestCase):
+    """Cache hanya menyimpan reconstruction error; flag selalu dari threshold bundle aktif."""
+
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault('SCORE_CACHE_ENABLED', '1')
+        os.environ.pop('SCORE_CACHE_PATH', None)
+        import app as service
+        service.wait_until_ready()
+        cls.service = service
+        cls.client = service.app.test_client()
+        cls.bundle = service.registry.current()
+        if service.score_cache is None or cls.bundle.encoder is None:
+            raise unittest.SkipTest('score cache atau FastEncoder tidak aktif')
+
+    def tearDown(self):
+        self.service.registry._bundle = self.bundle
+
+    def predict(self, transactions):
+        response = self.client.post('/predict', json={'transactions': transactions})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def transactions(self, seed):
+        rng = np.random.default_rng(seed)
+        return [{'id': f't{seed}-{i}', 'amount': float(rng.integers(20000, 900000)),
+                 'merchant': 'Tokopedia', 'channel': 'mobile', 'hour': int(rng.integers(0, 24)),
+                 'user_id': int(rng.integers(1, 50))} for i in range(12)]
+
+    def test_threshold_change_reflagged_from_cached_errors(self):
+        transactions = self.transactions(1)
+        first = self.predict(transactions)
+        scores = [row['anomalyScore'] for row in first.get_json()]
+
+        # Reload yang hanya mengubah threshold: skor dari cache, flag ikut threshold baru
+        # (di bawah 50% baris agar dynamic threshold tidak aktif)
+        threshold = float(np.percentile(scores, 75))
+        self.service.registry._bundle = dataclasses.replace(self.bundle, threshold=threshold)
+        second = self.predict(transactions)
+        self.assertEqual(second.headers['X-Score-Cache-Hits'], str(len(transactions)))
+        rows = second.get_json()
+        self.assertEqual([row['anomalyScore'] for row in rows], scores)
+        self.assertEqual([row['isAnomaly'] for row in rows], [s > threshold for s in scores])
+
+    def test_model_version_change_rescored(self):
+        transactions = self.transactions(2)
+        self.predict(transactions)
+        self.assertEqual(self.predict(transactions).headers['X-Score-Cache-Misses'], '0')
+        self.service.registry._bundle = dataclasses.replace(self.bundle, version='v-baru')
+        response = self.predict(transactions)
+        self.assertEqual(response.headers['X-Score-Cache-Misses'], str(len(transactions)))
+        self.assertEqual(response.headers['X-Model-Version'], 'v-baru')
+
+
+if __name__ == '__main__':
+    unittest.main()
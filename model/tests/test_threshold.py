@@ -0,0 +1,110 @@
+# =========================
+# Test Static/Dynamic Threshold
+# =========================
+# Jalankan dari direktori model/:
+#   python -m unittest discover -s tests
+# Distribusi global di-seed dari error validasi seperti train.py, sehingga
+# percentile-nya hampir sama dengan static threshold. Fallback harus tetap
+# membatasi laju anomali batch, dan traffic anomali tidak boleh menggeser
+# distribusi global.
+import os
+import sys
+import types
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline import (DYNAMIC_THRESHOLD_MIN_ROWS, DYNAMIC_THRESHOLD_PERCENTILE,  # noqa: E402
+                      relaxed_threshold, resolve_batch_threshold, select_threshold,
+                      update_error_distribution)
+from sketch import KLLSketch, OnlineQuantile  # noqa: E402
+from streaming import StreamingThreshold  # noqa: E402
+
+MAX_ANOMALY_RATE = 1 - DYNAMIC_THRESHOLD_PERCENTILE / 100.0
+
+
+def calibrated_bundle(seed=0):
+    """Bundle dengan threshold dan sketch hasil kalibrasi 20000 error validasi."""
+    validation = np.random.default_rng(seed).lognormal(-6.0, 0.5, 20000)
+    sketch = KLLSketch().update(validation)
+    threshold = sketch.quantile(DYNAMIC_THRESHOLD_PERCENTILE / 100.0)
+    return types.SimpleNamespace(
+        threshold=threshold,
+        error_distribution=OnlineQuantile(sketch, DYNAMIC_THRESHOLD_PERCENTILE / 100.0))
+
+
+def shifted_errors(bundle, n, seed=1):
+    """Batch yang seluruhnya di atas static threshold (mis. skala amount salah)."""
+    return bundle.threshold * np.random.default_rng(seed).uniform(2.0, 50.0, n)
+
+
+class DynamicThresholdTest(unittest.TestCase):
+    def setUp(self):
+        self.bundle = calibrated_bundle()
+
+    def test_static_threshold_when_few_rows_exceed(self):
+        errors = np.full(100, self.bundle.threshold / 2)
+        errors[:10] = self.bundle.threshold * 3
+        with self.assertNoLogs(level='WARNING'):
+            self.assertEqual(resolve_batch_threshold(errors, self.bundle), self.bundle.threshold)
+
+    def test_fallback_bounds_anomaly_rate_of_shifted_batch(self):
+        for n in (DYNAMIC_THRESHOLD_MIN_ROWS, 200, 5000):
+            errors = shifted_errors(self.bundle, n)
+            with self.assertLogs(level='WARNING'):
+                threshold = resolve_batch_threshold(errors, self.bundle)
+            # Distribusi global ~ static threshold; fallback tetap harus me-relax
+            self.assertGreater(threshold, self.bundle.error_distribution.quantile() * 2)
+            self.assertLessEqual((errors > threshold).mean(), MAX_ANOMALY_RATE)
+
+    def test_small_batch_not_relaxed_by_its_own_percentile(self):
+        errors = shifted_errors(self.bundle, 3)
+        with self.assertLogs(level='WARNING'):
+            threshold = resolve_batch_threshold(errors, self.bundle)
+        self.assertEqual(threshold, self.bundle.threshold)
+        self.assertTrue((errors > threshold).all())
+
+    def test_relaxed_threshold_never_below_static(self):
+        low = np.full(50, 1e-9)
+        self.assertEqual(relaxed_threshold(0.5, None, len(low), lambda: low.max()), 0.5)
+        self.assertEqual(select_threshold(0.5, 40, 50, lambda: 0.1), 0.1)
+
+    def test_only_accepted_rows_update_distribution(self):
+        distribution = self.bundle.error_distribution
+        count = distribution.sketch.n
+        for seed in range(5):
+            errors = shifted_errors(self.bundle, 500, seed)
+            threshold = resolve_batch_threshold(errors, self.bundle)
+            update_error_distribution(self.bundle, errors, threshold)
+            count += int((errors <= threshold).sum())
+            self.assertEqual(distribution.sketch.n, count)
+
+    def test_flagged_batches_do_not_shift_distribution(self):
+        distribution = self.bundle.error_distribution
+        before = (distribution.sketch.n, distribution.quantile())
+        # Batch kecil yang seluruhnya anomali: semua ditandai, tidak ada yang masuk
+        for seed in range(50):
+            errors = shifted_errors(self.bundle, 3, seed)
+            threshold = resolve_batch_threshold(errors, self.bundle)
+            self.assertTrue((errors > threshold).all())
+            update_error_distribution(self.bundle, errors, threshold)
+        self.assertEqual((distribution.sketch.n, distribution.quantile()), before)
+
+    def test_streaming_threshold_bounds_cumulative_rate(self):
+        tracker = StreamingThreshold(self.bundle.threshold, select_threshold,
+                                     DYNAMIC_THRESHOLD_PERCENTILE, self.bundle.error_distribution)
+        flagged = total = 0
+        for seed in range(10):
+            errors = shifted_errors(self.bundle, 1000, seed)
+            threshold = tracker.update(errors)
+            flagged += int((errors > threshold).sum())
+            total += len(errors)
+        # Percentile stream dari sketch KLL: toleransi error estimasi sketch
+        self.assertLessEqual(flagged / total, MAX_ANOMALY_RATE + 0.02)
+        self.assertGreater(flagged, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+# =========================
+# Test Feature Store Perilaku User
+# =========================
+# Jalankan dari direktori model/:
+#   python -m unittest discover -s tests
+# Fitur user hanya konsisten jika semua transaksi seorang user melewati
+# store yang sama. Yang diuji: hasil tidak bergantung pada cara request
+# dipecah, store hasil fork memang berbeda (alasan serve menolak lebih dari
+# satu worker), dan serve/hot-reload menolak model fitur user multi-worker.
+import os
+import sys
+import tempfile
+import types
+import argparse
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from userfeatures import (LEGACY_FEATURE_NAMES, USER_FEATURES, UserFeatureStore,  # noqa: E402
+                          uses_user_features)
+
+MODEL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def transactions(ids, user='u1', start='2024-01-01T10:00:00Z', minutes=7):
+    times = pd.date_range(start, periods=len(ids), freq=f'{minutes}min')
+    return pd.DataFrame({
+        'id': ids, 'user_id': user, 'amount': np.linspace(50000, 250000, len(ids)),
+        'channel': ['mobile', 'web'] * (len(ids) // 2) + ['mobile'] * (len(ids) % 2),
+        'device_type': 'android', 'location': 'Jakarta',
+        'timestamp': times.strftime('%Y-%m-%dT%H:%M:%SZ'),
+    })
+
+
+class UserFeatureStoreTest(unittest.TestCase):
+    def test_features_independent_of_request_split(self):
+        df = transactions([f't{i}' for i in range(6)])
+        whole = UserFeatureStore(max_seen=100).add_features(df.copy())[USER_FEATURES]
+
+        store = UserFeatureStore(max_seen=100)
+        first = store.add_features(df.iloc[:3].copy())[USER_FEATURES]
+        second = store.add_features(df.iloc[3:].copy())[USER_FEATURES]
+        pd.testing.assert_frame_equal(pd.concat([first, second]), whole)
+        # Request kedua melihat histori request pertama
+        self.assertEqual(second['user_is_new'].tolist(), [0.0, 0.0, 0.0])
+
+    def test_repeated_request_gets_same_features(self):
+        store = UserFeatureStore(max_seen=100)
+        df = transactions(['a', 'b', 'c'])
+        first = store.add_features(df.copy())[USER_FEATURES]
+        pd.testing.assert_frame_equal(store.add_features(df.copy())[USER_FEATURES], first)
+
+    def test_legacy_rate_feature_names(self):
+        df = UserFeatureStore().add_features(transactions(['a', 'b']))
+        for legacy, name in LEGACY_FEATURE_NAMES.items():
+            self.assertEqual(df[legacy].tolist(), df[name].tolist())
+        # Transaksi kedua 7 menit setelah yang pertama: laju meluruh, bukan hitungan 1
+        self.assertAlmostEqual(df['user_txn_rate_1h_decay'].iloc[1], np.exp(-420 / 3600))
+        legacy_bundle = types.SimpleNamespace(
+            encoder=None, preprocessor=types.SimpleNamespace(feature_names_in_=['user_txn_count_1h']))
+        self.assertTrue(uses_user_features(legacy_bundle))
+
+    def test_forked_stores_diverge(self):
+        # Dua worker dengan state awal sama (fork/snapshot): fitur request berikutnya
+        # bergantung pada worker yang melayaninya
+        parent = UserFeatureStore(max_seen=100)
+        parent.add_features(transactions(['p'], user='u0'))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'state.npz')
+            parent.snapshot(path)
+            workers = [UserFeatureStore(max_seen=100), UserFeatureStore(max_seen=100)]
+            for worker in workers:
+                worker.load([path])
+        workers[0].add_features(transactions(['a', 'b']))
+        later = transactions(['c'], start='2024-01-01T10:30:00Z')
+        features = [worker.add_features(later.copy())[USER_FEATURES] for worker in workers]
+        self.assertEqual(features[0]['user_is_new'].tolist(), [0.0])
+        self.assertEqual(features[1]['user_is_new'].tolist(), [1.0])
+
+
+@unittest.skipUnless(os.path.exists(os.path.join(MODEL_DIR, 'threshold.json')),
+                     'artefak model tidak tersedia')
+class ServeUserFeaturesTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        import app as service
+        service.wait_until_ready()
+        if service.feature_store is None:
+            raise unittest.SkipTest('feature store tidak aktif')
+        cls.service = service
+
+    def setUp(self):
+        self.bundle = self.service.registry.current()
+        self.user_bundle = types.SimpleNamespace(
+            encoder=None, backend=self.bundle.backend,
+            preprocessor=types.SimpleNamespace(feature_names_in_=['amount'] + USER_FEATURES))
+
+    def tearDown(self):
+        self.service.registry._bundle = self.bundle
+        self.service.serve_workers = 1
+
+    def test_serve_refuses_multiple_workers(self):
+        self.service.registry._bundle = self.user_bundle
+        args = argparse.Namespace(host='127.0.0.1', port=0, workers=2, threads_per_worker=1)
+        with self.assertRaises(SystemExit) as raised:
+            self.service.serve_command(args)
+        self.assertEqual(raised.exception.code, self.service.USER_FEATURES_SERVE_ERROR)
+        self.assertEqual(self.service.serve_workers, 1)
+
+    def test_hot_reloaded_model_refused_in_multi_worker_process(self):
+        timer = self.service.StageTimer(self.service.STAGE_SECONDS, endpoint='predict')
+        df = transactions(['a'])
+        # Satu worker: fitur dihitung seperti biasa
+        self.assertIsNotNone(self.service.add_user_features(df.copy(), self.user_bundle, timer))
+        self.service.serve_workers = 2
+        with self.assertRaisesRegex(RuntimeError, 'worker'):
+            self.service.add_user_features(df.copy(), self.user_bundle, timer)
+        # Model tanpa fitur user tetap dilayani
+        self.assertIsNone(self.service.add_user_features(df.copy(), self.bundle, timer))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,106 +2,559 @@ import pandas as pd
 import numpy as np
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.compose import ColumnTransformer
-from tensorflow.keras.models import Model
-from tensorflow.keras.layers import Input, Dense, Dropout, BatchNormalization, LeakyReLU
-from tensorflow.keras.callbacks import EarlyStopping
 import joblib
 import os
+import json
+import hashlib
+import argparse
+import time
+import random
+import logging
+import tempfile
 
+from artifact import ARTIFACT_FILENAME, export_artifact
+from features import FastEncoder
+from inference import NumpyBackend
+from registry import (DEFAULT_DYNAMIC_PERCENTILE, MODEL_FILENAME, PREPROCESSOR_FILENAME,
+                      THRESHOLD_FILENAME, file_digest, write_manifest)
+from sketch import KLLSketch
+from userfeatures import LEGACY_FEATURE_NAMES, USER_FEATURES, UserFeatureStore
+from variants import export_variants, manifest_entries, parse_variants
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
 
 # =========================
 # 1. Path & Validasi Data
 # =========================
 DATA_PATH = "./data/transactions_normal_only.csv"
-if not os.path.exists(DATA_PATH):
-    raise FileNotFoundError(f"File data tidak ditemukan: {DATA_PATH}")
+# Static threshold = percentile error rekonstruksi data validasi (transaksi normal)
+THRESHOLD_PERCENTILE = 95
+VALIDATION_SPLIT = 0.1
+ERROR_BATCH_SIZE = 8192
+# Fine-tuning incremental: sedikit epoch dengan learning rate kecil dari bobot lama
+INCREMENTAL_EPOCHS = 5
+FINE_TUNE_LEARNING_RATE = 1e-4
+# Baris shard lama yang ikut diputar ulang per baris baru (mencegah model melupakan histori)
+REPLAY_RATIO = 1.0
+
+selected_features = [
+    'amount', 'hour', 'user_id', 'transaction_type', 'channel', 'merchant', 'device_type', 'location'
+]
+numerical = ['amount', 'hour']
+categorical = ['user_id', 'transaction_type',
+               'channel', 'merchant', 'device_type', 'location']
+
 
 # =========================
 # 2. Load Data & Feature Engineering
 # =========================
-data = pd.read_csv(DATA_PATH)
-# Ekstrak jam dari timestamp jika ada
-if 'Timestamp' in data.columns:
-    data['Timestamp'] = pd.to_datetime(data['Timestamp'])
-    data['hour'] = data['Timestamp'].dt.hour
-
-# Rename kolom agar konsisten dengan pipeline prediksi
-data = data.rename(columns={
-    'TransactionAmount': 'amount',
-    'UserID': 'user_id',
-    'MerchantName': 'merchant',
-    'TransactionType': 'transaction_type',
-    'Channel': 'channel',
-    'DeviceType': 'device_type',
-    'City': 'location'
-})
+def prepare_frame(data):
+    """Feature engineering + validasi fitur. Return (X, y_true)."""
+    # Ekstrak jam dari timestamp jika ada
+    if 'Timestamp' in data.columns:
+        data['Timestamp'] = pd.to_datetime(data['Timestamp'])
+        data['hour'] = data['Timestamp'].dt.hour
+
+    # Rename kolom agar konsisten dengan pipeline prediksi
+    data = data.rename(columns={
+        'TransactionAmount': 'amount',
+        'UserID': 'user_id',
+        'MerchantName': 'merchant',
+        'TransactionType': 'transaction_type',
+        'Channel': 'channel',
+        'DeviceType': 'device_type',
+        'City': 'location',
+        'Timestamp': 'timestamp'
+    })
+
+    # --- Validasi Fitur yang Digunakan
+    for feat in selected_features:
+        if feat not in data.columns:
+            raise ValueError(f"Fitur '{feat}' tidak ditemukan di data!")
+
+    # timestamp ikut dibawa untuk fitur perilaku user (bukan input model)
+    X = data[selected_features + (['timestamp'] if 'timestamp' in data.columns else [])]
+    y_true = data['is_true_anomaly'] if 'is_true_anomaly' in data.columns else data['IsAnomaly']
+    return X, y_true
+
+
+def add_user_features(X, store):
+    """Replay transaksi ke UserFeatureStore (kelas yang sama dengan service).
+
+    Fitur tiap transaksi hanya melihat transaksi sebelumnya dari user itu,
+    sehingga CSV besar (mode chunked) sebaiknya sudah urut waktu.
+    """
+    if 'timestamp' not in X.columns:
+        raise ValueError("Fitur perilaku user membutuhkan kolom 'Timestamp' di data training!")
+    return store.add_features(X.copy())
+
+
+def load_data(data_path, user_features=False):
+    if not os.path.exists(data_path):
+        raise FileNotFoundError(f"File data tidak ditemukan: {data_path}")
+    X, y_true = prepare_frame(pd.read_csv(data_path))
+    if user_features:
+        X = add_user_features(X, training_store(True))
+    return X, y_true
+
+
+def iter_chunks(data_path, chunksize, store=None):
+    """Baca CSV per chunk; setiap chunk melewati feature engineering yang sama.
+
+    Jika `store` diberikan, state perilaku user berlanjut antar chunk.
+    """
+    if not os.path.exists(data_path):
+        raise FileNotFoundError(f"File data tidak ditemukan: {data_path}")
+    for chunk in pd.read_csv(data_path, chunksize=chunksize):
+        X, y_true = prepare_frame(chunk)
+        if store is not None:
+            X = add_user_features(X, store)
+        yield X, y_true
+
+
+def model_features(user_features=False):
+    """(numerik, semua input model) termasuk fitur perilaku user jika diaktifkan."""
+    numeric = numerical + (USER_FEATURES if user_features else [])
+    return numeric, selected_features + (USER_FEATURES if user_features else [])
+
+
+def training_store(user_features):
+    # Replay offline tidak dibatasi kapasitas; hanya TTL yang membuang user
+    return UserFeatureStore(max_users=2 ** 62) if user_features else None
+
+
+# --- Preprocessing Pipeline
+def build_preprocessor(numeric=numerical):
+    return ColumnTransformer([
+        ('num', StandardScaler(), numeric),
+        ('cat', OneHotEncoder(handle_unknown='ignore', sparse_output=False), categorical)
+    ])
+
+
+# --- Improved Autoencoder Architecture
+def build_autoencoder(input_dim):
+    from tensorflow.keras.models import Model
+    from tensorflow.keras.layers import Input, Dense, Dropout, BatchNormalization, LeakyReLU
+
+    input_layer = Input(shape=(input_dim,))
+    x = Dense(64)(input_layer)
+    x = BatchNormalization()(x)
+    x = LeakyReLU()(x)
+    x = Dropout(0.2)(x)
+    x = Dense(32)(x)
+    x = BatchNormalization()(x)
+    x = LeakyReLU()(x)
+    x = Dropout(0.1)(x)
+    x = Dense(16, activation="relu")(x)
+    bottleneck = Dense(8, activation="relu")(x)
+    x = Dense(16, activation="relu")(bottleneck)
+    x = Dense(32)(x)
+    x = BatchNormalization()(x)
+    x = LeakyReLU()(x)
+    x = Dense(64, activation="relu")(x)
+    output_layer = Dense(input_dim, activation="linear")(x)
+
+    autoencoder = Model(inputs=input_layer, outputs=output_layer)
+    autoencoder.compile(optimizer="adam", loss="mse")
+    return autoencoder
+
+
+def train(data_path, output_dir, epochs=100, threshold_percentile=THRESHOLD_PERCENTILE,
+          user_features=False, variants=()):
+    from tensorflow.keras.callbacks import EarlyStopping
+
+    numeric, inputs = model_features(user_features)
+    X, y_true = load_data(data_path, user_features)
+    preprocessor = build_preprocessor(numeric)
+    X_processed = preprocessor.fit_transform(X[inputs])
+
+    # --- Split Data
+    y_true_array = y_true.to_numpy()
+    X_train = X_processed[y_true_array == 0]
+
+    autoencoder = build_autoencoder(X_train.shape[1])
+
+    # --- Training Model
+    early_stop = EarlyStopping(monitor="loss", patience=8,
+                               restore_best_weights=True)
+    autoencoder.fit(
+        X_train, X_train,
+        epochs=epochs,            # Lebih banyak epoch, early stopping tetap menjaga overfit
+        batch_size=128,           # Batch size lebih kecil bisa membantu konvergensi
+        shuffle=True,
+        validation_split=VALIDATION_SPLIT,
+        callbacks=[early_stop],
+        verbose=1
+    )
+
+    # validation_split Keras memakai ekor data (sebelum shuffle)
+    X_val = X_train[len(X_train) - int(len(X_train) * VALIDATION_SPLIT):]
+
+    def validation_batches():
+        return ((X_val[start:start + ERROR_BATCH_SIZE],)
+                for start in range(0, len(X_val), ERROR_BATCH_SIZE))
+
+    threshold_data = calibrate_threshold(autoencoder, validation_batches(), threshold_percentile)
+
+    save_model(autoencoder, preprocessor, output_dir, threshold_data)
+    if variants:
+        export_variants(output_dir, autoencoder, preprocessor, variants, validation_batches,
+                        lambda backend, batches: calibrate_threshold(backend, batches, threshold_percentile),
+                        threshold_data['threshold'], train_data=X_train, epochs=epochs)
+    return autoencoder, preprocessor
+
+
+def train_chunked(data_path, output_dir, chunksize=100000, shard_dir=None, epochs=100,
+                  batch_size=128, threshold_percentile=THRESHOLD_PERCENTILE, user_features=False,
+                  variants=()):
+    """Training out-of-core: RAM puncak bergantung pada chunksize, bukan ukuran dataset."""
+    from tensorflow.keras.callbacks import EarlyStopping
+    from shards import ShardDataset, ShardWriter, StreamingPreprocessorFit
+
+    # --shard-dir eksplisit = cache persisten untuk retraining incremental
+    persistent = shard_dir is not None
+
+    # --- Pass 1: statistik scaler + vocabulary kategori
+    numeric, _ = model_features(user_features)
+    fitter = StreamingPreprocessorFit(numeric, categorical)
+    sample = None
+    for X, _ in iter_chunks(data_path, chunksize, training_store(user_features)):
+        fitter.update(X)
+        sample = X if sample is None else sample
+    preprocessor = fitter.finalize(sample)
+    encoder = FastEncoder.from_column_transformer(preprocessor)
+    logging.info(f"Pass 1 selesai: {fitter.rows} baris, {encoder.width} fitur")
+
+    with tempfile.TemporaryDirectory(prefix='train_shards_') as tmp_dir:
+        shard_dir = shard_dir or tmp_dir
+
+        # --- Pass 2: encode ringkas transaksi normal ke shard mmap
+        writer = ShardWriter(shard_dir)
+        # Replay ulang dari state kosong: fitur identik dengan pass 1
+        store = training_store(user_features)
+        for X, y_true in iter_chunks(data_path, chunksize, store):
+            numeric, codes = encoder.encode(X[(y_true == 0).to_numpy()])
+            writer.write(numeric, codes)
+        logging.info(f"Pass 2 selesai: {writer.rows} baris normal dalam {writer.shards} shard")
+
+        # --- Training dari shard lewat tf.data (prefetch)
+        dataset = ShardDataset(shard_dir, encoder, batch_size=batch_size,
+                               validation_split=VALIDATION_SPLIT)
+        train_data, validation_data = dataset.as_tf_datasets()
+        autoencoder = build_autoencoder(encoder.width)
+        early_stop = EarlyStopping(monitor="loss", patience=8,
+                                   restore_best_weights=True)
+        autoencoder.fit(
+            train_data,
+            epochs=epochs,
+            shuffle=False,            # Shard dan baris sudah diacak per epoch oleh ShardDataset
+            validation_data=validation_data,
+            callbacks=[early_stop],
+            verbose=1
+        )
+        threshold_data = calibrate_threshold(
+            autoencoder, dataset.validation_batches(), threshold_percentile)
+        save_model(autoencoder, preprocessor, output_dir, threshold_data)
+        if variants:
+            # Varian dibangun selagi shard masih ada (student dilatih dari shard yang sama)
+            export_variants(output_dir, autoencoder, preprocessor, variants,
+                            dataset.validation_batches,
+                            lambda backend, batches: calibrate_threshold(
+                                backend, batches, threshold_percentile),
+                            threshold_data['threshold'], train_data=train_data,
+                            validation_data=validation_data, epochs=epochs, batch_size=batch_size)
+        if persistent:
+            save_shard_cache(shard_dir, preprocessor, store,
+                             [source_entry(data_path, writer.rows, 0, writer.shards)])
+    return autoencoder, preprocessor
+
+
+# =========================
+# Retraining Incremental (warm start dari cache shard)
+# =========================
+def source_entry(data_path, rows, first_shard, end_shard):
+    return {'file': os.path.abspath(data_path), 'sha256': file_digest(data_path), 'rows': int(rows),
+            'shards': [int(first_shard), int(end_shard)], 'added_at': time.time()}
+
+
+def feature_digest(preprocessor):
+    """Sidik jari urutan kolom input model; shard hanya valid untuk preprocessor yang sama."""
+    names = json.dumps(preprocessor.get_feature_names_out().tolist())
+    return hashlib.sha256(names.encode()).hexdigest()[:12]
+
+
+def save_shard_cache(shard_dir, preprocessor, store, sources, previous=None):
+    """Catat isi cache shard (cache_state.json) dan state fitur perilaku user."""
+    from shards import USER_STATE_FILENAME, count_shards, write_cache_state
+
+    if store is not None:
+        store.snapshot(os.path.join(shard_dir, USER_STATE_FILENAME))
+    previous = previous or {}
+    sources = previous.get('sources', []) + sources
+    write_cache_state(shard_dir, {
+        'status': 'ready',
+        'width': len(preprocessor.get_feature_names_out()),
+        'feature_digest': feature_digest(preprocessor),
+        'user_features': store is not None,
+        'shards': count_shards(shard_dir),
+        'rows': sum(source['rows'] for source in sources),
+        'sources': sources,
+    })
+
+
+def widen_autoencoder(autoencoder, mapping, width):
+    """Autoencoder dengan input/output `width` kolom yang mewarisi bobot lama.
+
+    Baris kernel Dense pertama dan kolom kernel/bias Dense terakhir dipindah
+    ke posisi baru sesuai `mapping`; kolom kategori baru mulai dari nol,
+    sehingga untuk transaksi tanpa kategori baru output lama tidak berubah.
+    """
+    from tensorflow.keras.layers import Dense
+
+    widened = build_autoencoder(width)
+    old_dense = [layer for layer in autoencoder.layers if isinstance(layer, Dense)]
+    new_dense = [layer for layer in widened.layers if isinstance(layer, Dense)]
+    if len(autoencoder.layers) != len(widened.layers) or len(old_dense) != len(new_dense):
+        raise ValueError("Arsitektur model lama berbeda dari build_autoencoder")
+    for old, new in zip(autoencoder.layers, widened.layers):
+        weights = old.get_weights()
+        if not weights:
+            continue
+        if old is old_dense[0]:
+            kernel, bias = weights
+            widened_kernel = np.zeros((width, kernel.shape[1]), dtype=kernel.dtype)
+            widened_kernel[mapping] = kernel
+            weights = [widened_kernel, bias]
+        elif old is old_dense[-1]:
+            kernel, bias = weights
+            widened_kernel = np.zeros((kernel.shape[0], width), dtype=kernel.dtype)
+            widened_bias = np.zeros(width, dtype=bias.dtype)
+            widened_kernel[:, mapping] = kernel
+            widened_bias[mapping] = bias
+            weights = [widened_kernel, widened_bias]
+        new.set_weights(weights)
+    return widened
+
+
+def replay_shards(first_new, end, ratio, rows_per_shard, seed=0):
+    """Index shard untuk fine-tuning: semua shard baru plus sampel acak shard lama."""
+    new = list(range(first_new, end))
+    old = list(range(first_new))
+    if ratio is None or ratio < 0:
+        return old + new
+    budget = ratio * sum(rows_per_shard[index] for index in new)
+    random.Random(seed).shuffle(old)
+    replay = []
+    for index in old:
+        if budget <= 0:
+            break
+        replay.append(index)
+        budget -= rows_per_shard[index]
+    return sorted(replay) + new
+
+
+def train_incremental(data_path, output_dir, shard_dir, chunksize=100000, epochs=INCREMENTAL_EPOCHS,
+                      batch_size=128, threshold_percentile=THRESHOLD_PERCENTILE,
+                      replay_ratio=REPLAY_RATIO, variants=()):
+    """Tambahkan data baru ke cache shard lalu fine-tune model yang ada.
+
+    Scaler numerik dibekukan; vocabulary kategori diperluas dan index kolom
+    shard lama dipetakan ulang. Threshold dikalibrasi ulang dari validasi
+    seluruh cache (histori + data baru).
+    """
+    from tensorflow import keras
+    from tensorflow.keras.callbacks import EarlyStopping
+    from shards import (USER_STATE_FILENAME, ShardDataset, ShardWriter, StreamingPreprocessorFit,
+                        column_mapping, count_shards, read_cache_state, remap_shards,
+                        write_cache_state)
+
+    state = read_cache_state(shard_dir)
+    if state is None:
+        raise ValueError(f"Cache shard tidak ditemukan di {shard_dir}. Jalankan dulu "
+                         f"train.py --chunked --shard-dir {shard_dir}")
+    if state.get('status') != 'ready':
+        raise ValueError("Cache shard tidak konsisten (retraining incremental sebelumnya gagal). "
+                         "Bangun ulang dengan train.py --chunked --shard-dir")
+    preprocessor = joblib.load(os.path.join(output_dir, PREPROCESSOR_FILENAME))
+    if state['feature_digest'] != feature_digest(preprocessor):
+        raise ValueError(f"Cache shard tidak cocok dengan preprocessor di {output_dir}")
+    digest = file_digest(data_path)
+    if any(source['sha256'] == digest for source in state['sources']):
+        raise ValueError(f"Data {data_path} sudah pernah ditambahkan ke cache shard")
+
+    user_features = state.get('user_features', False)
+    store = training_store(user_features)
+    if store is not None and os.path.exists(os.path.join(shard_dir, USER_STATE_FILENAME)):
+        store.load([os.path.join(shard_dir, USER_STATE_FILENAME)])
+
+    # --- Pass 1: kategori baru (scaler tetap, skala input model tidak berubah)
+    fitter = StreamingPreprocessorFit.from_preprocessor(preprocessor)
+    added = normal_rows = 0
+    sample = None
+    for X, y_true in iter_chunks(data_path, chunksize):
+        added += fitter.update_vocabulary(X)
+        normal_rows += int((y_true == 0).sum())
+        sample = X if sample is None else sample
+    if normal_rows == 0:
+        raise ValueError(f"Tidak ada transaksi normal baru di {data_path}")
+    if user_features:
+        # Sample hanya agar ColumnTransformer tercatat ter-fit; statistik scaler dari model lama
+        # (model lama bisa masih memakai nama fitur laju sebelum rename)
+        sample = sample.assign(**{feature: 0.0 for feature in
+                                  USER_FEATURES + list(LEGACY_FEATURE_NAMES)})
+    old_encoder = FastEncoder.from_column_transformer(preprocessor)
+    autoencoder = keras.models.load_model(os.path.join(output_dir, MODEL_FILENAME), compile=False)
+
+    state['status'] = 'updating'
+    write_cache_state(shard_dir, state)
+    if added:
+        preprocessor = fitter.finalize(sample)
+        encoder = FastEncoder.from_column_transformer(preprocessor)
+        mapping = column_mapping(old_encoder, encoder)
+        remap_shards(shard_dir, mapping)
+        autoencoder = widen_autoencoder(autoencoder, mapping, encoder.width)
+        logging.info(f"{added} kategori baru: input {old_encoder.width} -> {encoder.width} fitur")
+    else:
+        encoder = old_encoder
+
+    # --- Pass 2: append baris normal baru sebagai shard baru
+    writer = ShardWriter(shard_dir, append=True)
+    first_new = writer.shards
+    for X, y_true in iter_chunks(data_path, chunksize, store):
+        numeric, codes = encoder.encode(X[(y_true == 0).to_numpy()])
+        writer.write(numeric, codes)
+    logging.info(f"Append: {writer.rows} baris normal dalam {writer.shards - first_new} shard baru")
+
+    # --- Fine-tuning: shard baru + replay sampel shard lama
+    history = ShardDataset(shard_dir, encoder, batch_size=batch_size,
+                           validation_split=VALIDATION_SPLIT)
+    selected = replay_shards(first_new, writer.shards, replay_ratio,
+                             [len(numeric) for numeric, _, _ in history.shards])
+    dataset = ShardDataset(shard_dir, encoder, batch_size=batch_size,
+                           validation_split=VALIDATION_SPLIT, shard_indices=selected)
+    train_data, validation_data = dataset.as_tf_datasets()
+    autoencoder.compile(optimizer=keras.optimizers.Adam(FINE_TUNE_LEARNING_RATE), loss='mse')
+    early_stop = EarlyStopping(monitor="loss", patience=2, restore_best_weights=True)
+    autoencoder.fit(train_data, epochs=epochs, shuffle=False, validation_data=validation_data,
+                    callbacks=[early_stop], verbose=1)
+
+    # Threshold dari validasi seluruh histori, bukan hanya data baru
+    threshold_data = calibrate_threshold(
+        autoencoder, history.validation_batches(), threshold_percentile)
+    save_model(autoencoder, preprocessor, output_dir, threshold_data)
+    if variants:
+        export_variants(output_dir, autoencoder, preprocessor, variants, history.validation_batches,
+                        lambda backend, batches: calibrate_threshold(
+                            backend, batches, threshold_percentile),
+                        threshold_data['threshold'], train_data=train_data,
+                        validation_data=validation_data, epochs=epochs, batch_size=batch_size)
+    save_shard_cache(shard_dir, preprocessor, store,
+                     [source_entry(data_path, writer.rows, first_new, count_shards(shard_dir))],
+                     previous=state)
+    return autoencoder, preprocessor
+
+
+# --- Kalibrasi Threshold dari Error Validasi
+def calibrate_threshold(autoencoder, validation_batches, percentile=THRESHOLD_PERCENTILE):
+    """Bangun sketch KLL dari error rekonstruksi data validasi (streaming per batch).
+
+    `autoencoder` berupa model Keras atau NumpyBackend (varian terkompresi).
+    Return isi threshold.json: static threshold (percentile sketch) plus
+    sketch itu sendiri agar service bisa melanjutkan update secara online.
+    """
+    backend = (autoencoder if isinstance(autoencoder, NumpyBackend)
+               else NumpyBackend.from_keras(autoencoder))
+    sketch = KLLSketch()
+    for batch in validation_batches:
+        sketch.update(backend.reconstruction_errors(batch[0]))
+    if sketch.n == 0:
+        raise ValueError("Data validasi kosong, threshold tidak bisa dikalibrasi")
+    threshold = sketch.quantile(percentile / 100.0)
+    logging.info(
+        f"Threshold ({percentile}th percentile dari {sketch.n} error validasi): {threshold:.6f}")
+    return {
+        'threshold': threshold,
+        'static_percentile': percentile,
+        'dynamic_percentile': DEFAULT_DYNAMIC_PERCENTILE,
+        'validation_count': sketch.n,
+        'sketch': sketch.to_dict(),
+    }
+
+
+# --- Save Model, Preprocessor & Threshold
+def save_model(autoencoder, preprocessor, output_dir, threshold_data):
+    autoencoder.save(os.path.join(output_dir, MODEL_FILENAME))
+    joblib.dump(preprocessor, os.path.join(output_dir, PREPROCESSOR_FILENAME))
+    with open(os.path.join(output_dir, THRESHOLD_FILENAME), 'w') as f:
+        json.dump(threshold_data, f)
+
 
 # =========================
-# 3. Validasi Fitur yang Digunakan
+# 3. Export Serving Artifact & Manifest
 # =========================
-selected_features = [
-    'amount', 'hour', 'user_id', 'transaction_type', 'channel', 'merchant', 'device_type', 'location'
-]
-for feat in selected_features:
-    if feat not in data.columns:
-        raise ValueError(f"Fitur '{feat}' tidak ditemukan di data!")
+def export_serving(output_dir, model=None, preprocessor=None):
+    """Tulis serving artifact (.npz) lalu model_manifest.json (terakhir, untuk publish atomik)."""
+    if model is None:
+        from tensorflow import keras
+        model = keras.models.load_model(os.path.join(output_dir, MODEL_FILENAME), compile=False)
+    if preprocessor is None:
+        preprocessor = joblib.load(os.path.join(output_dir, PREPROCESSOR_FILENAME))
 
-X = data[selected_features]
-y_true = data['is_true_anomaly'] if 'is_true_anomaly' in data.columns else data['IsAnomaly']
+    info = export_artifact(os.path.join(output_dir, ARTIFACT_FILENAME), model, preprocessor)
+    manifest = write_manifest(output_dir, serving_artifact=info,
+                              variants=manifest_entries(output_dir))
+    logging.info(
+        f"Serving artifact {ARTIFACT_FILENAME} ditulis (version {manifest['version']}, "
+        f"max rel diff {info['max_rel_diff']:.2e})")
+    return manifest
 
-# --- Preprocessing Pipeline
-numerical = ['amount', 'hour']
-categorical = ['user_id', 'transaction_type',
-               'channel', 'merchant', 'device_type', 'location']
 
-preprocessor = ColumnTransformer([
-    ('num', StandardScaler(), numerical),
-    ('cat', OneHotEncoder(handle_unknown='ignore', sparse_output=False), categorical)
-])
+def main():
+    parser = argparse.ArgumentParser(description='Training AutoEncoder fraud detection')
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--output-dir', default='.')
+    parser.add_argument('--export-only', action='store_true',
+                        help='Lewati training; ekspor serving artifact dari model yang sudah ada')
+    parser.add_argument('--chunked', action='store_true',
+                        help='Training out-of-core: CSV dibaca per chunk, fitur di-cache sebagai shard mmap')
+    parser.add_argument('--chunksize', type=int, default=100000)
+    parser.add_argument('--shard-dir', default=None,
+                        help='Direktori shard (default: direktori sementara yang dihapus setelah training)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Append --data ke cache shard (--shard-dir) lalu fine-tune model di --output-dir')
+    parser.add_argument('--replay-ratio', type=float, default=REPLAY_RATIO,
+                        help='Baris shard lama per baris baru saat fine-tuning incremental (negatif = semua)')
+    parser.add_argument('--epochs', type=int, default=None,
+                        help=f'Default 100, atau {INCREMENTAL_EPOCHS} untuk --incremental')
+    parser.add_argument('--batch-size', type=int, default=128)
+    parser.add_argument('--threshold-percentile', type=float, default=THRESHOLD_PERCENTILE,
+                        help='Percentile error validasi yang dipakai sebagai static threshold')
+    parser.add_argument('--variants', type=parse_variants, default=(),
+                        help='Varian terkompresi: student (lihat variant_report.json)')
+    parser.add_argument('--user-features', action='store_true',
+                        help='Tambahkan fitur perilaku per user (velocity, deviasi amount, perubahan device/lokasi)')
+    args = parser.parse_args()
 
-X_processed = preprocessor.fit_transform(X)
+    epochs = args.epochs or (INCREMENTAL_EPOCHS if args.incremental else 100)
+    model = preprocessor = None
+    if args.incremental:
+        if not args.shard_dir:
+            parser.error('--incremental membutuhkan --shard-dir')
+        model, preprocessor = train_incremental(args.data, args.output_dir, args.shard_dir,
+                                                args.chunksize, epochs, args.batch_size,
+                                                args.threshold_percentile, args.replay_ratio,
+                                                args.variants)
+    elif args.chunked:
+        model, preprocessor = train_chunked(args.data, args.output_dir, args.chunksize,
+                                            args.shard_dir, epochs, args.batch_size,
+                                            args.threshold_percentile, args.user_features,
+                                            args.variants)
+    elif not args.export_only:
+        model, preprocessor = train(args.data, args.output_dir, epochs,
+                                    args.threshold_percentile, args.user_features,
+                                    args.variants)
+    export_serving(args.output_dir, model, preprocessor)
 
-# --- Split Data
-y_true_array = y_true.to_numpy()
-X_train = X_processed[y_true_array == 0]
-X_test = X_processed
 
-# --- Improved Autoencoder Architecture
-input_dim = X_train.shape[1]
-input_layer = Input(shape=(input_dim,))
-x = Dense(64)(input_layer)
-x = BatchNormalization()(x)
-x = LeakyReLU()(x)
-x = Dropout(0.2)(x)
-x = Dense(32)(x)
-x = BatchNormalization()(x)
-x = LeakyReLU()(x)
-x = Dropout(0.1)(x)
-x = Dense(16, activation="relu")(x)
-bottleneck = Dense(8, activation="relu")(x)
-x = Dense(16, activation="relu")(bottleneck)
-x = Dense(32)(x)
-x = BatchNormalization()(x)
-x = LeakyReLU()(x)
-x = Dense(64, activation="relu")(x)
-output_layer = Dense(input_dim, activation="linear")(x)
-
-autoencoder = Model(inputs=input_layer, outputs=output_layer)
-autoencoder.compile(optimizer="adam", loss="mse")
-
-# --- Training Model
-early_stop = EarlyStopping(monitor="loss", patience=8,
-                           restore_best_weights=True)
-autoencoder.fit(
-    X_train, X_train,
-    epochs=100,               # Lebih banyak epoch, early stopping tetap menjaga overfit
-    batch_size=128,           # Batch size lebih kecil bisa membantu konvergensi
-    shuffle=True,
-    validation_split=0.1,
-    callbacks=[early_stop],
-    verbose=1
-)
-
-# --- Save Model & Preprocessor
-autoencoder.save("autoencoder_model.keras")
-joblib.dump(preprocessor, "preprocessor_pipeline.joblib")
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+# =========================
+# Feature Store Perilaku per User (in-memory)
+# =========================
+# Model hanya melihat fitur statis per baris dan user_id di-one-hot,
+# sehingga fraud berbasis kecepatan transaksi atau penyimpangan dari
+# kebiasaan user tidak terdeteksi. Store ini menyimpan agregat bergulir
+# per user yang di-update O(1) per transaksi: mean/variance log(amount)
+# dengan peluruhan eksponensial, laju transaksi dengan peluruhan
+# eksponensial (konstanta waktu 1 jam dan 24 jam; bukan jumlah transaksi
+# persis dalam jendela, dan tanpa daftar event), dan channel/device/lokasi
+# terakhir. Fitur selalu dihitung dari state SEBELUM transaksi itu
+# sendiri, lalu state di-update (di service: setelah batch berhasil
+# diskor, dan sekali per id transaksi). Kelas yang sama dipakai train.py
+# (replay data training urut waktu) dan service, jadi tidak ada skew
+# antara training dan serving. Eviction: user yang tidak aktif lebih
+# lama dari STATE_TTL_SECONDS (waktu event) dan LRU jika melewati
+# max_users. State bisa di-snapshot ke disk (.npz) dan dimuat saat start.
+import os
+import glob
+import math
+import time
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+USER_FEATURES = [
+    'user_amount_zscore', 'user_txn_rate_1h_decay', 'user_txn_rate_24h_decay',
+    'user_log_gap_seconds', 'user_is_new', 'user_channel_changed', 'user_device_changed',
+    'user_location_changed',
+]
+# Nama lama fitur laju (sebelum rename); model yang dilatih dengan nama ini tetap dilayani
+LEGACY_FEATURE_NAMES = {
+    'user_txn_count_1h': 'user_txn_rate_1h_decay',
+    'user_txn_count_24h': 'user_txn_rate_24h_decay',
+}
+# Parameter di bawah menentukan arti fitur: training dan serving harus sama,
+# karena itu sengaja tidak bisa diubah lewat env
+AMOUNT_HALF_LIFE_SECONDS = 7 * 86400
+# Konstanta waktu laju transaksi: sum(exp(-umur / tau)) atas transaksi sebelumnya.
+# Hanya sama dengan jumlah transaksi dalam jendela tau jika lajunya konstan.
+COUNT_WINDOWS_SECONDS = (3600, 86400)
+STATE_TTL_SECONDS = 30 * 86400
+# Variance minimum log(amount) agar z-score user dengan sedikit histori tidak meledak
+MIN_VARIANCE = 0.25
+MAX_ABS_ZSCORE = 10.0
+DEFAULT_MAX_USERS = 200000
+# Jumlah id transaksi terakhir yang fiturnya diingat (observasi idempoten)
+DEFAULT_MAX_SEEN = 200000
+DEFAULT_SNAPSHOT_INTERVAL = 300
+CATEGORY_COLUMNS = ('channel', 'device_type', 'location')
+
+# Index field state per user (list; _advance membuat list baru per event)
+_LAST_TS, _WEIGHT, _MEAN, _M2, _COUNT_1H, _COUNT_24H, _CHANNEL, _DEVICE, _LOCATION = range(9)
+_NUMERIC_STATE = slice(_LAST_TS, _COUNT_24H + 1)
+_CATEGORY_STATE = slice(_CHANNEL, _LOCATION + 1)
+NEW_USER_FEATURES = (0.0, 0.0, 0.0, math.log1p(STATE_TTL_SECONDS), 1.0, 0.0, 0.0, 0.0)
+
+
+def _advance(state, t, x, channel, device, location):
+    """(fitur transaksi dari state sebelumnya, state baru). State lama tidak diubah."""
+    if state is None or t - state[_LAST_TS] > STATE_TTL_SECONDS:
+        # User baru (atau kembali setelah TTL): belum ada kebiasaan untuk dibandingkan
+        return NEW_USER_FEATURES, [t, 1.0, x, 0.0, 1.0, 1.0, channel, device, location]
+
+    dt = max(t - state[_LAST_TS], 0.0)
+    decay = 0.5 ** (dt / AMOUNT_HALF_LIFE_SECONDS)
+    mean = state[_MEAN]
+    variance = state[_M2] / state[_WEIGHT]
+    zscore = (x - mean) / math.sqrt(max(variance, MIN_VARIANCE))
+    count_1h = state[_COUNT_1H] * math.exp(-dt / COUNT_WINDOWS_SECONDS[0])
+    count_24h = state[_COUNT_24H] * math.exp(-dt / COUNT_WINDOWS_SECONDS[1])
+    features = (max(-MAX_ABS_ZSCORE, min(MAX_ABS_ZSCORE, zscore)), count_1h, count_24h,
+                math.log1p(dt), 0.0, float(channel != state[_CHANNEL]),
+                float(device != state[_DEVICE]), float(location != state[_LOCATION]))
+
+    # Mean/variance berbobot eksponensial (Welford dengan peluruhan)
+    weight = state[_WEIGHT] * decay + 1.0
+    delta = x - mean
+    mean += delta / weight
+    return features, [t, weight, mean, state[_M2] * decay + delta * (x - mean),
+                      count_1h + 1.0, count_24h + 1.0, channel, device, location]
+
+
+def uses_user_features(bundle):
+    """True jika model di bundle dilatih dengan fitur perilaku user."""
+    if bundle.encoder is not None:
+        names = bundle.encoder.input_features
+    else:
+        names = getattr(bundle.preprocessor, 'feature_names_in_', [])
+    return any(name in USER_FEATURES or name in LEGACY_FEATURE_NAMES for name in names)
+
+
+def event_seconds(df, now=None):
+    """Waktu event (epoch detik) dari kolom timestamp; waktu sekarang jika tidak ada/invalid."""
+    now = time.time() if now is None else now
+    if 'timestamp' not in df.columns:
+        return np.full(len(df), now, dtype=np.float64)
+    parsed = pd.to_datetime(df['timestamp'], errors='coerce', utc=True)
+    seconds = parsed.to_numpy(dtype='datetime64[ns]').astype(np.int64) / 1e9
+    return np.where(parsed.isna().to_numpy(), now, seconds)
+
+
+class UserFeatureStore:
+    """State perilaku per user dengan update O(1), eviction TTL/LRU, dan snapshot .npz."""
+
+    def __init__(self, max_users=DEFAULT_MAX_USERS, snapshot_path=None, max_seen=0):
+        self.max_users = max(1, int(max_users))
+        self.snapshot_path = snapshot_path
+        # 0 = tanpa dedupe (replay training/score.py: setiap baris event baru)
+        self.max_seen = max(0, int(max_seen))
+        self.evicted = 0
+        self._states = OrderedDict()
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._atexit_registered = False
+
+    def __len__(self):
+        return len(self._states)
+
+    def add_features(self, df):
+        """Hitung kolom USER_FEATURES untuk df (in-place) lalu update state user.
+
+        Baris diproses urut waktu event (stabil), sehingga hasil satu batch
+        sama dengan memproses transaksinya satu per satu.
+        """
+        df, update = self.compute_features(df)
+        self.commit(update)
+        return df
+
+    def compute_features(self, df):
+        """Hitung USER_FEATURES (in-place) tanpa mengubah state. Return (df, update).
+
+        Fitur dihitung terhadap salinan state user yang ada di batch; `update`
+        baru diterapkan lewat commit(), jadi scoring yang gagal atau
+        read-only (warm-up) tidak meninggalkan jejak di store. Dengan
+        max_seen > 0 observasi idempoten: transaksi dengan id yang sudah
+        pernah dilihat mendapat fitur yang sama persis, dan event pada atau
+        sebelum waktu terakhir user di store hanya dibaca (tidak di-update).
+        """
+        times = event_seconds(df)
+        values = np.zeros((len(df), len(USER_FEATURES)), dtype=np.float64)
+        order = np.argsort(times, kind='stable')
+        users = df['user_id'].to_numpy()[order].tolist()
+        amounts = np.log1p(np.maximum(df['amount'].to_numpy(dtype=np.float64), 0.0))[order].tolist()
+        categories = [df[column].to_numpy()[order].tolist() for column in CATEGORY_COLUMNS]
+        dedupe = self.max_seen > 0
+        ids = (df['id'].astype(str).to_numpy()[order].tolist() if dedupe and 'id' in df.columns
+               else [None] * len(order))
+        overlay, committed_ts, events, seen = {}, {}, [], {}
+        with self._lock:
+            for row, user, t, x, channel, device, location, key in zip(
+                    order.tolist(), users, times[order].tolist(), amounts, *categories, ids):
+                if key is not None:
+                    cached = seen.get(key) or self._seen.get(key)
+                    if cached is not None:
+                        values[row] = cached
+                        continue
+                user = str(user)
+                if user not in overlay:
+                    state = self._states.get(user)
+                    overlay[user] = state
+                    committed_ts[user] = state[_LAST_TS] if state is not None else None
+                event = (t, x, str(channel), str(device), str(location))
+                features, state = _advance(overlay[user], *event)
+                if not (dedupe and committed_ts[user] is not None and t <= committed_ts[user]):
+                    overlay[user] = state
+                    events.append((user,) + event)
+                values[row] = features
+                if key is not None:
+                    seen[key] = features
+        for j, name in enumerate(USER_FEATURES):
+            df[name] = values[:, j]
+        for legacy, name in LEGACY_FEATURE_NAMES.items():
+            df[legacy] = df[name]
+        return df, (events, seen)
+
+    def commit(self, update):
+        """Terapkan observasi hasil compute_features ke state user."""
+        events, seen = update
+        dedupe = self.max_seen > 0
+        committed_ts = {}
+        with self._lock:
+            for position, (user, t, *event) in enumerate(events):
+                state = self._states.get(user)
+                if user not in committed_ts:
+                    committed_ts[user] = state[_LAST_TS] if state is not None else None
+                # Batch lain bisa sudah meng-commit event yang sama sejak compute
+                if dedupe and committed_ts[user] is not None and t <= committed_ts[user]:
+                    continue
+                _, self._states[user] = _advance(state, t, *event)
+                self._states.move_to_end(user)
+                if position % 1024 == 0:
+                    self._evict(t)
+            if events:
+                self._evict(max(event[1] for event in events))
+            for key, features in seen.items():
+                self._seen[key] = features
+                self._seen.move_to_end(key)
+            while len(self._seen) > self.max_seen:
+                self._seen.popitem(last=False)
+
+    def _evict(self, now):
+        """Buang user LRU melebihi max_users, lalu user terdepan yang sudah lewat TTL."""
+        states = self._states
+        while len(states) > self.max_users:
+            states.popitem(last=False)
+            self.evicted += 1
+        # Urutan OrderedDict = urutan update terakhir, jadi cukup cek dari depan
+        while states:
+            user, state = next(iter(states.items()))
+            if now - state[_LAST_TS] <= STATE_TTL_SECONDS:
+                break
+            del states[user]
+            self.evicted += 1
+
+    # --- Snapshot
+    def snapshot(self, path=None):
+        """Tulis seluruh state ke .npz secara atomik (tmp + rename). Return jumlah user."""
+        path = path or self.snapshot_path
+        with self._lock:
+            users = list(self._states)
+            states = [list(state) for state in self._states.values()]
+        numeric = np.array([state[_NUMERIC_STATE] for state in states],
+                           dtype=np.float64).reshape(len(states), _COUNT_24H + 1)
+        categories = np.array([state[_CATEGORY_STATE] for state in states],
+                              dtype=str).reshape(len(states), len(CATEGORY_COLUMNS))
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, users=np.array(users, dtype=str), numeric=numeric, categories=categories)
+        os.replace(tmp, path)
+        return len(users)
+
+    def load(self, paths):
+        """Gabungkan snapshot (mis. satu file per worker); state terbaru per user menang."""
+        merged = {}
+        for path in paths:
+            with np.load(path, allow_pickle=False) as data:
+                rows = zip(data['users'].tolist(), data['numeric'].tolist(),
+                           data['categories'].tolist())
+                for user, numeric, categories in rows:
+                    current = merged.get(user)
+                    if current is None or numeric[_LAST_TS] > current[_LAST_TS]:
+                        merged[user] = numeric + categories
+        with self._lock:
+            for user, state in sorted(merged.items(), key=lambda item: item[1][_LAST_TS]):
+                self._states[user] = state
+                self._states.move_to_end(user)
+            if self._states:
+                self._evict(max(state[_LAST_TS] for state in self._states.values()))
+        return len(merged)
+
+    def snapshot_paths(self):
+        """Snapshot utama plus snapshot per worker (<path>.w<N>) yang ada di disk."""
+        if not self.snapshot_path:
+            return []
+        candidates = [self.snapshot_path] + glob.glob(f'{glob.escape(self.snapshot_path)}.w*')
+        return [path for path in candidates if os.path.isfile(path) and not path.endswith('.tmp')]
+
+    def start_snapshots(self, interval=DEFAULT_SNAPSHOT_INTERVAL):
+        """Snapshot berkala di background thread; stop() menulis snapshot terakhir."""
+        if not self.snapshot_path or self._thread is not None:
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._snapshot_loop, args=(interval,),
+                                        name='feature-store-snapshot', daemon=True)
+        self._thread.start()
+        if not self._atexit_registered:
+            atexit.register(self.stop)
+            self._atexit_registered = True
+        return self
+
+    def stop(self, flush=True):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+        if flush:
+            self._safe_snapshot()
+
+    def _snapshot_loop(self, interval):
+        while not self._stop.wait(interval):
+            self._safe_snapshot()
+
+    def _safe_snapshot(self):
+        try:
+            count = self.snapshot()
+            logging.info(f"Snapshot feature store: {count} user -> {self.snapshot_path}")
+        except Exception as e:
+            logging.error(f"Snapshot feature store gagal: {e}")
+
+    def after_fork(self, worker_id):
+        """Panggil di proses anak: lock/thread baru dan file snapshot per worker."""
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        if self.snapshot_path:
+            self.snapshot_path = f'{self.snapshot_path}.w{worker_id}'
+
+    def stats(self):
+        return {'users': len(self._states), 'max_users': self.max_users,
+                'evicted': self.evicted, 'seen_ids': len(self._seen),
+                'snapshot_path': self.snapshot_path}
+
+
+def create_feature_store():
+    """UserFeatureStore dari env FEATURE_STORE_*; None jika dinonaktifkan.
+
+    Store hanya dipakai jika model yang dimuat dilatih dengan USER_FEATURES.
+    """
+    if os.environ.get('FEATURE_STORE_ENABLED', '1').lower() in ('0', 'false', 'no'):
+        return None
+    store = UserFeatureStore(
+        max_users=int(os.environ.get('FEATURE_STORE_MAX_USERS', DEFAULT_MAX_USERS)),
+        snapshot_path=os.environ.get('FEATURE_STORE_SNAPSHOT') or None,
+        max_seen=int(os.environ.get('FEATURE_STORE_MAX_SEEN', DEFAULT_MAX_SEEN)))
+    paths = store.snapshot_paths()
+    if paths:
+        try:
+            logging.info(f"Feature store dimuat dari {len(paths)} snapshot: {store.load(paths)} user")
+        except Exception as e:
+            logging.error(f"Snapshot feature store tidak bisa dimuat: {e}")
+    return store
@@ -0,0 +1,226 @@
+# =========================
+# Varian Model Terkompresi (student)
+# =========================
+# Biaya inference CPU didominasi Dense pertama dan terakhir yang
+# terhubung ke input one-hot yang sangat lebar. train.py --variants student
+# menghasilkan autoencoder sempit hasil distilasi (belajar meniru
+# rekonstruksi model penuh) di samping model penuh, untuk throughput per
+# core yang lebih tinggi. Kuantisasi bobot float16/int8 sengaja tidak
+# disediakan: NumPy tidak punya GEMM float16/int8, jadi kernelnya harus
+# dikembalikan ke float32 dan inference justru lebih lambat.
+# Setiap varian punya threshold sendiri (percentile yang sama pada data
+# validasi) dan dievaluasi terhadap model penuh: kesesuaian skor, kesesuaian
+# flag anomali, dan throughput. Service memilih varian lewat MODEL_VARIANT.
+import os
+import json
+import time
+import logging
+
+import numpy as np
+import pandas as pd
+
+from artifact import load_artifact, save_artifact
+from features import FastEncoder
+from inference import NumpyBackend, compile_dense_stack
+from registry import source_digests
+
+VARIANTS = ('student',)
+REPORT_FILENAME = 'variant_report.json'
+STUDENT_HIDDEN = 16
+STUDENT_BOTTLENECK = 8
+BENCHMARK_ROWS = 4096
+BENCHMARK_REPEATS = 20
+
+
+def artifact_filename(variant):
+    return f'serving_artifact.{variant}.npz'
+
+
+def threshold_filename(variant):
+    return f'threshold.{variant}.json'
+
+
+def parse_variants(raw):
+    """'student' -> ('student',). Raise ValueError jika ada yang tidak dikenal."""
+    names = tuple(dict.fromkeys(name.strip().lower() for name in (raw or '').split(',') if name.strip()))
+    unknown = [name for name in names if name not in VARIANTS]
+    if unknown:
+        raise ValueError(f"Varian tidak dikenal: {unknown}. Pilihan: {list(VARIANTS)}")
+    return names
+
+
+# --- Student (distilasi)
+def build_student(input_dim, hidden=STUDENT_HIDDEN, bottleneck=STUDENT_BOTTLENECK):
+    """Autoencoder Dense sempit tanpa BatchNorm/Dropout (langsung bisa dikompilasi ke NumPy)."""
+    from tensorflow.keras.models import Model
+    from tensorflow.keras.layers import Input, Dense
+
+    input_layer = Input(shape=(input_dim,))
+    x = Dense(hidden, activation='relu')(input_layer)
+    x = Dense(bottleneck, activation='relu')(x)
+    x = Dense(hidden, activation='relu')(x)
+    output_layer = Dense(input_dim, activation='linear')(x)
+    student = Model(inputs=input_layer, outputs=output_layer)
+    student.compile(optimizer='adam', loss='mse')
+    return student
+
+
+def distill_student(teacher, train_data, validation_data=None, epochs=100, batch_size=128,
+                    validation_split=0.1):
+    """Latih student agar rekonstruksinya meniru teacher (bukan input asli).
+
+    Dengan target rekonstruksi teacher, error student (X - student(X))^2
+    mendekati error teacher, jadi peringkat dan flag anomali ikut terjaga.
+    `train_data` berupa matrix (mode in-memory) atau tf.data (X, X) (chunked).
+    """
+    from tensorflow.keras.callbacks import EarlyStopping
+
+    input_dim = teacher.input_shape[-1]
+    student = build_student(input_dim)
+    early_stop = EarlyStopping(monitor='loss', patience=5, restore_best_weights=True)
+    if isinstance(train_data, np.ndarray):
+        targets = teacher.predict(train_data, batch_size=8192, verbose=0)
+        student.fit(train_data, targets, epochs=epochs, batch_size=batch_size, shuffle=True,
+                    validation_split=validation_split, callbacks=[early_stop], verbose=1)
+    else:
+        def relabel(x, _):
+            return x, teacher(x, training=False)
+
+        student.fit(train_data.map(relabel), epochs=epochs,
+                    validation_data=validation_data.map(relabel) if validation_data is not None else None,
+                    callbacks=[early_stop], verbose=1)
+    return student
+
+
+# --- Evaluasi
+def backend_errors(backend, batches):
+    return np.concatenate([backend.reconstruction_errors(batch[0]) for batch in batches])
+
+
+def benchmark_sample(batches, rows=BENCHMARK_ROWS):
+    collected, total = [], 0
+    for batch in batches:
+        collected.append(np.asarray(batch[0], dtype=np.float32))
+        total += len(batch[0])
+        if total >= rows:
+            break
+    return np.concatenate(collected)[:rows]
+
+
+def measure_throughput(backend, X, repeats=BENCHMARK_REPEATS):
+    """Baris/detik terbaik dari beberapa ulangan pada batch yang sama."""
+    backend.reconstruction_errors(X)
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        backend.reconstruction_errors(X)
+        best = min(best, time.perf_counter() - start)
+    return len(X) / best
+
+
+def weight_bytes(layers):
+    return int(sum(layer.kernel.nbytes + layer.bias.nbytes for layer in layers))
+
+
+def agreement(reference_errors, reference_threshold, errors, threshold):
+    """Kesesuaian skor dan flag anomali varian terhadap model penuh."""
+    reference_flags = reference_errors > reference_threshold
+    flags = errors > threshold
+    both = int(np.sum(flags & reference_flags))
+    return {
+        'score_pearson': round(float(np.corrcoef(reference_errors, errors)[0, 1]), 6),
+        'score_spearman': round(float(pd.Series(reference_errors).corr(pd.Series(errors),
+                                                                       method='spearman')), 6),
+        'mean_rel_diff': round(float(np.mean(np.abs(errors - reference_errors) /
+                                             np.maximum(reference_errors, 1e-12))), 6),
+        'flag_agreement': round(float(np.mean(flags == reference_flags)), 6),
+        'flag_precision': round(both / max(int(flags.sum()), 1), 6),
+        'flag_recall': round(both / max(int(reference_flags.sum()), 1), 6),
+        'flagged': int(flags.sum()),
+        'reference_flagged': int(reference_flags.sum()),
+    }
+
+
+def export_variants(output_dir, teacher, preprocessor, names, validation_batches, calibrate,
+                    reference_threshold, train_data=None, validation_data=None, epochs=100,
+                    batch_size=128):
+    """Bangun, simpan, kalibrasi, dan evaluasi varian; tulis variant_report.json.
+
+    Panggil setelah model penuh disimpan. `validation_batches` adalah
+    callable yang mengembalikan iterator batch baru (dipakai berulang);
+    `calibrate(backend, batches)` menghasilkan isi threshold.json varian.
+    """
+    encoder = FastEncoder.from_column_transformer(preprocessor)
+    teacher_layers = compile_dense_stack(teacher)
+    reference = NumpyBackend(teacher_layers)
+    reference_errors = backend_errors(reference, validation_batches())
+    sample = benchmark_sample(validation_batches())
+    reference_rate = measure_throughput(reference, sample)
+    report = {
+        'evaluation_rows': int(len(reference_errors)),
+        'reference': {'threshold': reference_threshold,
+                      'rows_per_second': round(reference_rate, 1),
+                      'weight_bytes': weight_bytes(teacher_layers),
+                      'hidden_sizes': [layer.kernel.shape[1] for layer in teacher_layers[:-1]]},
+        'variants': {},
+        # Digest model/preprocessor sumber: varian basi jika model dilatih ulang tanpa --variants
+        'source_files': source_digests(output_dir),
+    }
+
+    for name in names:
+        if train_data is None:
+            raise ValueError("Varian student membutuhkan data training")
+        layers = compile_dense_stack(distill_student(
+            teacher, train_data, validation_data, epochs, batch_size))
+        path = os.path.join(output_dir, artifact_filename(name))
+        save_artifact(path, layers, encoder)
+        # Evaluasi memakai artifact yang dimuat ulang: persis yang dilihat service
+        backend, _ = load_artifact(path)
+        threshold_data = calibrate(backend, validation_batches())
+        threshold_path = os.path.join(output_dir, threshold_filename(name))
+        with open(threshold_path, 'w') as f:
+            json.dump(threshold_data, f)
+
+        errors = backend_errors(backend, validation_batches())
+        rate = measure_throughput(backend, sample)
+        # Referensi diukur ulang tepat sebelumnya agar speedup tidak terdistorsi noise mesin
+        reference_now = measure_throughput(reference, sample)
+        metrics = agreement(reference_errors, reference_threshold, errors, threshold_data['threshold'])
+        metrics.update({
+            'threshold': threshold_data['threshold'],
+            'rows_per_second': round(rate, 1),
+            'speedup': round(rate / reference_now, 3),
+            'weight_bytes': weight_bytes(layers),
+            'hidden_sizes': [layer.kernel.shape[1] for layer in layers[:-1]],
+            'path': artifact_filename(name),
+            'threshold_path': threshold_filename(name),
+        })
+        report['variants'][name] = metrics
+        logging.info(
+            f"Varian {name}: flag agreement {metrics['flag_agreement']:.4f}, spearman "
+            f"{metrics['score_spearman']:.4f}, {metrics['speedup']:.2f}x throughput, "
+            f"bobot {metrics['weight_bytes'] / 2 ** 20:.2f} MB")
+
+    with open(os.path.join(output_dir, REPORT_FILENAME), 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def manifest_entries(model_dir):
+    """Entri `variants` untuk manifest dari variant_report.json, None jika tidak ada/basi."""
+    path = os.path.join(model_dir, REPORT_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        report = json.load(f)
+    if report.get('source_files') != source_digests(model_dir):
+        logging.warning(f"{REPORT_FILENAME} basi (model dilatih ulang), varian tidak dipublikasikan")
+        return None
+    entries = {}
+    for name, metrics in report['variants'].items():
+        # Laporan lama bisa memuat varian float16/int8 yang sudah tidak didukung
+        if name in VARIANTS and os.path.exists(os.path.join(model_dir, metrics['path'])):
+            entries[name] = {key: metrics[key] for key in
+                             ('path', 'threshold_path', 'flag_agreement', 'score_spearman',
+                              'speedup')}
+    return entries or None